@@ -1,6 +1,31 @@
+import os
+import sys
 from django.apps import AppConfig
 
 
+def _is_server_process():
+    """
+    요청을 받는 서버 프로세스인지 확인합니다.
+    manage.py 명령은 runserver만 (자동 재시작을 쓰면 실제로 요청을 받는 자식 프로세스만),
+    gunicorn/uvicorn 등 manage.py 밖에서 실행되면 서버로 봅니다.
+    """
+    program = os.path.basename(sys.argv[0]) if sys.argv else ""
+    if program not in ("manage.py", "django-admin"):
+        return True
+    if len(sys.argv) < 2 or sys.argv[1] != "runserver":
+        return False
+    return "--noreload" in sys.argv or os.environ.get("RUN_MAIN") == "true"
+
+
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    # 작성자: 최준혁
+    # 기능: 챗봇 코퍼스(CHATBOT_PREWARM) 미리 로드 - migrate, shell 등 다른 명령에서는 로드 스레드를 띄우지 않음
+    # 마지막 수정일: 2025-07-07
+    def ready(self):
+        if not _is_server_process():
+            return
+        from api.services.chatbot_gemini_lib import prewarm
+        prewarm()
@@ -0,0 +1,53 @@
+# back/api/management/commands/bench_embeddings.py
+# 임베딩 서비스(api/services/embedding_service.py)의 색인 처리량을 측정합니다.
+#
+# 사용법 (back/ 폴더에서):
+#   python manage.py bench_embeddings                          # 가짜 임베딩, 2000개, 요청당 50ms 지연
+#   python manage.py bench_embeddings --count 5000 --latency 0.2
+#   python manage.py bench_embeddings --backend gemini --count 200   # 실제 API (요금 발생)
+# 임시 캐시 폴더를 쓰므로 실행 환경의 캐시에는 영향이 없습니다.
+# 1) 한 개씩 순서대로 요청 (기존 방식)  2) 묶음 + 동시 요청  3) 같은 입력 다시 (캐시)
+import time
+import shutil
+import tempfile
+from django.core.management.base import BaseCommand
+from api.services.embedding_service import build_embedding_service, EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY
+
+
+class Command(BaseCommand):
+    help = "임베딩 색인 처리량(한 개씩 / 묶음+동시 / 캐시)을 측정합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", default="fake", choices=["fake", "gemini"])
+        parser.add_argument("--count", type=int, default=2000, help="임베딩할 문단 수")
+        parser.add_argument("--latency", type=float, default=0.05, help="가짜 임베딩 요청당 지연(초)")
+        parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+        parser.add_argument("--concurrency", type=int, default=EMBEDDING_CONCURRENCY)
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        texts = [f"{i}번째 문단이에요. 토끼가 숲속 친구들과 반짝이는 돌을 찾아 모험을 떠났어요." for i in range(count)]
+        extra = {"latency": options["latency"]} if options["backend"] == "fake" else {}
+        cache_dir = tempfile.mkdtemp(prefix="bench_embeddings_")
+
+        try:
+            runs = [
+                ("한 개씩", dict(batch_size=1, concurrency=1, use_cache=False)),
+                ("묶음+동시", dict(batch_size=options["batch_size"], concurrency=options["concurrency"], use_cache=True)),
+            ]
+            for label, settings in runs:
+                service = build_embedding_service(options["backend"], cache_dir=cache_dir, **settings, **extra)
+                sample = texts if label != "한 개씩" else texts[:min(count, 200)]   # 기존 방식은 일부만 측정
+                self._measure(label, service, sample)
+                if settings["use_cache"]:
+                    self._measure("캐시", service, texts)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def _measure(self, label, service, texts):
+        started = time.perf_counter()
+        service.embed_documents(texts)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"⏱️ {label}: {len(texts)}개 {round(elapsed, 3)}초 → {round(len(texts) / elapsed, 1)}개/초"
+        )
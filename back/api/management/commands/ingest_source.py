@@ -0,0 +1,49 @@
+# back/api/management/commands/ingest_source.py
+# source/의 PDF·CSV를 챗봇 코퍼스 벡터DB(vectordb/<이름>/)로 스트리밍 색인합니다. (api/services/document_ingest.py)
+#
+# 사용법 (back/ 폴더에서):
+#   python manage.py ingest_source rain2                      # source/rain2.pdf → vectordb/rain2/
+#   python manage.py ingest_source item.csv item2.csv         # 여러 개
+#   python manage.py ingest_source item.csv --name reviews    # 코퍼스 이름 지정 (원본 하나일 때)
+#   python manage.py ingest_source rain2 --no-resume          # 체크포인트를 버리고 처음부터
+# 실행 중인 서버는 다음 질문 때 index.faiss 변경을 보고 새 인덱스로 교체합니다.
+import os
+from django.core.management.base import BaseCommand, CommandError
+from api.services.document_ingest import (
+    SOURCE_ROOT, VECTORDB_ROOT, INGEST_BATCH_SIZE, INGEST_CHECKPOINT_EVERY,
+    ingest_source, resolve_source, corpus_name,
+)
+
+
+class Command(BaseCommand):
+    help = "PDF·CSV 원본을 챗봇 코퍼스 벡터DB로 스트리밍 색인합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="+", help="원본 파일 (source/ 기준, 확장자 생략 시 .pdf → .csv)")
+        parser.add_argument("--name", help="코퍼스 이름 (기본: 확장자를 뺀 파일명)")
+        parser.add_argument("--source-root", default=SOURCE_ROOT)
+        parser.add_argument("--vectordb-root", default=VECTORDB_ROOT)
+        parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+        parser.add_argument("--checkpoint-every", type=int, default=INGEST_CHECKPOINT_EVERY)
+        parser.add_argument("--no-resume", action="store_true", help="체크포인트를 무시하고 처음부터 색인")
+
+    def handle(self, *args, **options):
+        if options["name"] and len(options["sources"]) > 1:
+            raise CommandError("--name은 원본이 하나일 때만 쓸 수 있습니다.")
+
+        for source in options["sources"]:
+            try:
+                path = resolve_source(source, options["source_root"])
+            except FileNotFoundError as e:
+                raise CommandError(str(e))
+            name = options["name"] or corpus_name(source)
+            target = os.path.join(options["vectordb_root"], name)
+
+            stats = ingest_source(
+                path, target, batch_size=options["batch_size"],
+                checkpoint_every=options["checkpoint_every"], resume=not options["no_resume"],
+            )
+            self.stdout.write(
+                f"✅ {path} → {target}: 문서 {stats['documents']}개, 청크 {stats['chunks']}개 "
+                f"(이번에 추가 {stats['new_chunks']}개), {stats['seconds']}초"
+            )
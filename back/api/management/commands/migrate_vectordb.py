@@ -0,0 +1,64 @@
+# back/api/management/commands/migrate_vectordb.py
+# 동화별 벡터DB 폴더(vectordb/story_<id>/)를 샤딩된 통합 저장소(api/services/vector_store.py)로 옮깁니다.
+#
+# 사용법 (back/ 폴더에서):
+#   python manage.py migrate_vectordb                # 아직 옮기지 않은 동화만
+#   python manage.py migrate_vectordb --force        # 이미 옮긴 동화도 다시 (통합 저장소의 문서 삭제 후)
+#   python manage.py migrate_vectordb --remove-old   # 옮긴 뒤 기존 폴더 삭제
+# 임베딩을 다시 계산하지 않고 기존 index.faiss의 벡터를 그대로 옮깁니다.
+# 옮기지 않은 동화도 새 문단을 처음 저장할 때 자동으로 옮겨집니다. (vector_utils.index_paragraphs_to_faiss)
+import os
+import re
+import time
+import shutil
+from django.core.management.base import BaseCommand
+from api.services.vector_utils import VECTORDB_ROOT, migrate_legacy_story, _is_migrated
+from api.services.vector_store import get_vector_store
+
+STORY_DIR_RE = re.compile(r"^story_(\d+)$")
+
+
+class Command(BaseCommand):
+    help = "동화별 FAISS 폴더를 샤딩된 통합 벡터 저장소로 옮깁니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--root", default=VECTORDB_ROOT, help="동화별 폴더가 있는 경로")
+        parser.add_argument("--force", action="store_true", help="이미 옮긴 동화도 다시 옮김")
+        parser.add_argument("--remove-old", action="store_true", help="옮긴 뒤 기존 폴더 삭제")
+
+    def handle(self, *args, **options):
+        root = options["root"]
+        store = get_vector_store()
+        started = time.time()
+        migrated = skipped = failed = documents = 0
+
+        for name in sorted(os.listdir(root)):
+            match = STORY_DIR_RE.match(name)
+            path = os.path.join(root, name)
+            if not match or not os.path.exists(os.path.join(path, "index.faiss")):
+                continue
+            story_id = int(match.group(1))
+
+            if _is_migrated(story_id):
+                if not options["force"]:
+                    skipped += 1
+                    continue
+                store.delete_story(story_id)
+
+            try:
+                count = migrate_legacy_story(story_id, root)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"⚠️ {name} 옮기기 실패: {e}")
+                continue
+
+            migrated += 1
+            documents += count
+            if options["remove_old"]:
+                shutil.rmtree(path)
+
+        store.flush()
+        self.stdout.write(
+            f"✅ 옮김 {migrated}개 (문서 {documents}개), 건너뜀 {skipped}개, 실패 {failed}개 – "
+            f"{round(time.time() - started, 2)}초, 저장소 동화 수 {store.docstore.story_count()}"
+        )
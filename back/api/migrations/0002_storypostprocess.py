@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoryPostProcess",
+            fields=[
+                ("story_id", models.IntegerField(primary_key=True, serialize=False)),
+                ("pending_updates", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "StoryPostProcess",
+            },
+        ),
+    ]
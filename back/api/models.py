@@ -157,3 +157,17 @@ class Userlike(models.Model):
         managed = False
         db_table = 'UserLike'
         unique_together = (('user', 'story'),)
+
+
+# 작성자: 최준혁
+# 기능: 동화별 후처리(등장인물/요약 갱신) 진행 표시
+#       후처리는 각 서버 프로세스 안에서 실행되므로, 다음 턴이 다른 프로세스로 가도 이 값을 보고 기다립니다.
+#       (api 앱에서 유일하게 Django가 관리하는 테이블, python manage.py migrate api)
+# 마지막 수정일: 2025-07-07
+class StoryPostProcess(models.Model):
+    story_id = models.IntegerField(primary_key=True)
+    pending_updates = models.IntegerField(default=0)   # 갱신이 끝나지 않은 후처리 작업 수
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'StoryPostProcess'
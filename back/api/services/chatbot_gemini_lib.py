@@ -1,17 +1,17 @@
 # 라이브러리 불러오기
 import os
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyMuPDFLoader
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
 from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema.runnable import RunnableMap
+from langchain_core.runnables import RunnableLambda
+from langchain_core.messages import AIMessage
 from dotenv import load_dotenv
-
-
-# CSV
-from langchain_community.document_loaders.csv_loader import CSVLoader
+from api.services.embedding_service import get_embeddings
+from api.services.document_ingest import ingest_source, resolve_source, corpus_name
 
 
 # .env가 있는 폴더 경로를 명시적으로 지정
@@ -31,67 +31,168 @@ os.environ["GOOGLE_API_KEY"] = api_key
 SOURCE_PATH     = './source/'
 VECTORDB_PATH   = './vectordb/'
 
-# 인베딩 모델
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/gemini-embedding-exp-03-07"
-)
-# 벡터DB 경로 변수
-vectordb_qa = ''
-retriever = ''
-chain = ''
-
-# 벡터디비 처리 함수
-def vectordb_save(source_file):
-    global embeddings
-
+# 인베딩 모델: get_embeddings() (묶음 요청 + 디스크 캐시, 처음 쓸 때 생성)
+# 같은 청크로 벡터DB를 다시 만들면 임베딩 재요청 없음
+
+# 챗봇 코퍼스 (vectordb/<이름>/)
+# - 처음 질문이 들어올 때 로드 (서버 시작을 막지 않음)
+# - CHATBOT_PREWARM에 적은 코퍼스는 백그라운드 스레드에서 미리 로드 (쉼표 구분, 빈 값이면 끄기)
+# - 코퍼스별 로드 상태(pending / loading / ready / failed / unloaded)를 기록 → /api/health/
+# - 로드한 코퍼스는 CHATBOT_MAX_CORPORA개까지 메모리에 유지 (가장 오래 안 쓴 코퍼스부터 내림)
+DEFAULT_CORPUS = os.getenv("CHATBOT_CORPUS", "rain")
+CHATBOT_PREWARM = [name.strip() for name in os.getenv("CHATBOT_PREWARM", DEFAULT_CORPUS).split(",") if name.strip()]
+CHATBOT_MAX_CORPORA = int(os.getenv("CHATBOT_MAX_CORPORA", "4"))
+
+# 벡터디비 처리 함수 (source/의 PDF·CSV를 스트리밍으로 색인, document_ingest.py)
+# source_file: 'rain2' (→ rain2.pdf, 없으면 .csv) 또는 'item.csv', 벡터DB 이름은 확장자를 뺀 파일명
+def vectordb_save(source_file, resume=True):
     print('-'*20)
     print('벡터디비 생성 시작')
 
-    # 단계 1 : 문서 로드(Load Documents)
-    sFile = SOURCE_PATH + source_file + '.pdf'
-    # sFile = SOURCE_PATH + source_file + '.csv'
-    loader = PyMuPDFLoader(sFile)
-    # loader = CSVLoader(file_path=sFile)
-    docs = loader.load()
-    print(f"문서 페이지수 : {len(docs)}")
-
-    # 단계 2 : 문서 분할(Split Documents)
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000, chunk_overlap=50
-    )
-    split_documents = text_splitter.split_documents(docs)
-    print(f"분할문서 페이지수 : {len(split_documents)}")
-
-    # 단계 3 : 임베딩 후 벡터DB로 처리하는 과정
-    vectorstore = FAISS.from_documents(
-        documents=split_documents,
-        embedding=embeddings
-    )
-
-    # 단계 4 : 벡터 DB 저장
-    vFile = VECTORDB_PATH + source_file
+    # 단계 1~3 : 문서를 페이지/행 단위로 읽어 분할 → 묶음별 임베딩 → 인덱스에 추가 (중간에 멈추면 이어서)
+    sFile = resolve_source(source_file, SOURCE_PATH)
+    name = corpus_name(source_file)
+    vFile = VECTORDB_PATH + name
     print("vFile =", vFile)
-    vectorstore.save_local(vFile)
+
+    # 단계 4 : 벡터 DB 저장 (작업 폴더에 저장한 뒤 교체 → 불러오는 쪽이 쓰다 만 파일을 읽지 않음)
+    stats = ingest_source(sFile, vFile, resume=resume)
+    print(f"문서 페이지수 : {stats['documents']}")
+    print(f"분할문서 페이지수 : {stats['chunks']}")
 
     print('-'*20)
     print(f'벡터디비 생성 완료 : {vFile}')
 
-# 벡터디비 불러오는 함수
+    # 이 프로세스에 로드된 코퍼스면 새 인덱스로 교체 (다른 프로세스는 다음 질문 때 index.faiss 변경을 보고 교체)
+    if is_ready(name):
+        vectordb_load(name)
+
+# 불러온 코퍼스 하나. 만든 뒤에는 바꾸지 않으므로, 다시 로드되어도 처리 중인 질문은 기존 객체로 끝까지 답합니다.
+@dataclass(frozen=True)
+class Corpus:
+    name: str
+    vectordb: FAISS
+    chain: object
+    mtime: float | None      # 로드한 index.faiss의 수정 시각
+    load_seconds: float
+
+# 코퍼스 이름 -> Corpus 레지스트리 (LRU)
+# - (다시) 로드는 잠금 밖에서 새 Corpus를 만든 뒤 항목만 교체 (원자적 교체, 실패하면 기존 코퍼스 유지)
+# - 코퍼스별 로드 잠금: 같은 코퍼스는 한 번만 로드하고, 다른 코퍼스 질문은 기다리지 않음
+# - index.faiss가 바뀌면 (다른 프로세스가 다시 생성) 다음 질문 때 다시 로드
+class CorpusRegistry:
+    def __init__(self, max_corpora=CHATBOT_MAX_CORPORA):
+        self.max_corpora = max(1, max_corpora)
+        self._corpora = OrderedDict()   # 이름 -> Corpus
+        self._status = {}               # 이름 -> {"state", "load_seconds", "error"}
+        self._load_locks = {}           # 이름 -> 로드 잠금
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _mtime(name):
+        try:
+            return os.path.getmtime(os.path.join(VECTORDB_PATH, name, "index.faiss"))
+        except OSError:
+            return None
+
+    def _cached(self, name):
+        with self._lock:
+            corpus = self._corpora.get(name)
+            if corpus is not None:
+                self._corpora.move_to_end(name)
+            return corpus
+
+    def _load_lock(self, name):
+        with self._lock:
+            return self._load_locks.setdefault(name, threading.Lock())
+
+    def _load_locked(self, name):
+        vFile = VECTORDB_PATH + name
+        with self._lock:
+            if name not in self._corpora:
+                self._status[name] = {"state": "loading"}
+
+        started = time.time()
+        mtime = self._mtime(name)
+        try:
+            vectordb_qa = FAISS.load_local(
+                vFile, 
+                get_embeddings(), 
+                allow_dangerous_deserialization=True)
+        except Exception as e:
+            with self._lock:
+                if name not in self._corpora:
+                    self._status[name] = {"state": "failed", "error": str(e)}
+            raise
+        corpus = Corpus(name, vectordb_qa, _build_chain(vectordb_qa), mtime, round(time.time() - started, 3))
+
+        evicted = []
+        with self._lock:
+            self._corpora[name] = corpus
+            self._corpora.move_to_end(name)
+            self._status[name] = {"state": "ready", "load_seconds": corpus.load_seconds}
+            while len(self._corpora) > self.max_corpora:
+                old_name, _ = self._corpora.popitem(last=False)
+                self._status[old_name] = {"state": "unloaded"}
+                evicted.append(old_name)
+
+        print(f"벡터 디비 불러오기완료 : {vFile}")
+        for old_name in evicted:
+            print(f"[Chatbot] 코퍼스 내림: {old_name}")
+        return corpus
+
+    def load(self, name) -> Corpus:
+        """
+        코퍼스를 (다시) 로드해 교체합니다.
+        """
+        with self._load_lock(name):
+            return self._load_locked(name)
+
+    def get(self, name) -> Corpus:
+        """
+        코퍼스를 반환합니다. 없거나 index.faiss가 바뀌었으면 로드합니다.
+        """
+        corpus = self._cached(name)
+        if corpus is not None and corpus.mtime == self._mtime(name):
+            return corpus
+
+        with self._load_lock(name):
+            corpus = self._cached(name)   # 기다리는 동안 다른 스레드가 로드했을 수 있음
+            if corpus is not None and corpus.mtime == self._mtime(name):
+                return corpus
+            try:
+                return self._load_locked(name)
+            except Exception as e:
+                if corpus is None:
+                    raise RuntimeError(f"코퍼스를 불러오지 못했습니다: {name}") from e
+                print(f"[Chatbot] 코퍼스 다시 로드 실패, 기존 인덱스 사용: {name} – {e}")
+                return corpus
+
+    def mark_pending(self, name):
+        with self._lock:
+            self._status.setdefault(name, {"state": "pending"})
+
+    def is_loaded(self, name) -> bool:
+        with self._lock:
+            return name in self._corpora
+
+    def status(self) -> dict:
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}
+
+_registry = CorpusRegistry()
+
+# 벡터디비 불러오는 함수 (코퍼스 하나를 (다시) 불러와 교체, 실패하면 False)
 def vectordb_load(vectordb_path):
-    global vectordb_qa, embeddings, retriever, chain
-
-    # 벡터함수를 불러오기
-    vFile = VECTORDB_PATH + vectordb_path
-
-    # try:
-    vectordb_qa = FAISS.load_local(
-        vFile, 
-        embeddings, 
-        allow_dangerous_deserialization=True)
-    # except:
-    #     print(f"벡터 디비 불러오기오류 : {vFile}")
-    #     return False
+    try:
+        _registry.load(vectordb_path)
+    except Exception as e:
+        print(f"벡터 디비 불러오기오류 : {VECTORDB_PATH + vectordb_path} – {e}")
+        return False
+    return True
 
+# 코퍼스 하나의 검색 + 답변 체인 구성
+def _build_chain(vectordb_qa):
     # 응답 및 프롬프트 구성
     retriever = vectordb_qa.as_retriever()
 
@@ -112,25 +213,50 @@ def vectordb_load(vectordb_path):
     #Answer:"""
     )
 
-    # 채팅에 사용할 모델
-    gemini = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        temperature=0
-    )
+    # 채팅에 사용할 모델 (llm_gateway 경유)
+    gemini = RunnableLambda(_invoke_gateway)
 
     # 채팅 모듈 설계
     chain = RunnableMap({
         "context": lambda x: retriever.get_relevant_documents(x['question']),
         "question": lambda x: x['question']
     }) | prompt | gemini
+    return chain
 
-    print(f"벡터 디비 불러오기완료 : {vFile}")
-    return True
+# 코퍼스 미리 로드 (백그라운드 스레드, 서버 시작을 막지 않음)
+def prewarm(corpora=None):
+    corpora = CHATBOT_PREWARM if corpora is None else corpora
+    if not corpora:
+        return None
+    for corpus in corpora:
+        _registry.mark_pending(corpus)
+
+    def run():
+        for corpus in corpora:
+            try:
+                _registry.get(corpus)
+            except Exception as e:
+                print(f"[Chatbot] 미리 로드 실패: {corpus} – {e}")
+
+    thread = threading.Thread(target=run, name="chatbot-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def is_ready(corpus=None):
+    return _registry.is_loaded(corpus or DEFAULT_CORPUS)
+
+def corpus_status():
+    return _registry.status()
+
+def _invoke_gateway(prompt_value) -> AIMessage:
+    from api.services import llm_gateway
+    return AIMessage(content=llm_gateway.generate(prompt_value.to_string(), node="ChatQuery", temperature=0))
 
 # 로드된 벡터디비에서 정보검색
 # 에코서버 : echo server
-def chat_query(msg):
-    global chain
+def chat_query(msg, corpus=None):
+    # 여러 스레드가 동시에 질문해도 되고, 질문 중에 코퍼스가 교체되어도 이 질문은 받은 체인으로 끝까지 답합니다.
+    chain = _registry.get(corpus or DEFAULT_CORPUS).chain
 
     response = chain.invoke({'question':msg}).content
     answer = response
@@ -0,0 +1,190 @@
+# 문서 스트리밍 색인 (챗봇 코퍼스 벡터DB 생성)
+# 작성자: 최준혁
+# 작성일: 2025-07-06
+#
+# source/의 PDF(페이지 단위)·CSV(행 단위)를 한 번에 다 읽지 않고 순서대로 읽어 색인합니다.
+# - 읽기(lazy_load) → 청크 분할(제너레이터) → INGEST_BATCH_SIZE개 안팎으로 임베딩 → 인덱스에 바로 추가
+#   (원본 전체/청크 전체를 메모리에 올리지 않음, 묶음은 원본 페이지·행 경계에서만 끊음)
+# - 작업 폴더(vectordb/<이름>.ingest/)에 INGEST_CHECKPOINT_EVERY 청크마다 인덱스와 진행 위치(checkpoint.json) 저장
+#   → 중간에 멈추면 다음 실행 때 이어서 색인 (원본 파일·분할 설정·임베딩 모델이 같을 때만)
+# - 끝나면 작업 폴더를 vectordb/<이름>/과 교체 (불러오는 쪽이 쓰다 만 파일을 읽지 않음)
+# 명령: python manage.py ingest_source rain2 item.csv
+
+import os
+import json
+import time
+import shutil
+from decouple import config
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import PyMuPDFLoader
+from langchain_community.document_loaders.csv_loader import CSVLoader
+from langchain_community.vectorstores import FAISS
+from api.services.embedding_service import get_embeddings
+
+SOURCE_ROOT = './source/'
+VECTORDB_ROOT = './vectordb/'
+SOURCE_EXTENSIONS = (".pdf", ".csv")
+
+INGEST_CHUNK_SIZE = 1000
+INGEST_CHUNK_OVERLAP = 50
+INGEST_BATCH_SIZE = config('INGEST_BATCH_SIZE', default=64, cast=int)               # 임베딩/추가 묶음 크기(청크)
+INGEST_CHECKPOINT_EVERY = config('INGEST_CHECKPOINT_EVERY', default=512, cast=int)  # 체크포인트 간격(청크)
+
+
+def resolve_source(source_file: str, source_root: str = SOURCE_ROOT) -> str:
+    """
+    'rain2' → source/rain2.pdf (없으면 .csv), 확장자나 경로가 있으면 그대로 찾습니다.
+    """
+    candidates = [source_file, os.path.join(source_root, source_file)]
+    if not os.path.splitext(source_file)[1]:
+        candidates = [os.path.join(source_root, source_file + ext) for ext in SOURCE_EXTENSIONS]
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError(f"원본 파일이 없습니다: {source_file}")
+
+
+def corpus_name(source_file: str) -> str:
+    return os.path.splitext(os.path.basename(source_file))[0]
+
+
+def iter_documents(path: str):
+    """
+    PDF는 페이지, CSV는 행 하나를 Document 하나로 순서대로 읽습니다.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        loader = PyMuPDFLoader(path)
+    elif extension == ".csv":
+        loader = CSVLoader(file_path=path, encoding="utf-8-sig")   # BOM이 있는 파일(item3.csv)도 처리
+    else:
+        raise ValueError(f"지원하지 않는 형식: {path}")
+    yield from loader.lazy_load()
+
+
+def iter_chunks(documents, splitter, skip: int = 0):
+    """
+    (원본 문서 번호, 청크). 앞의 skip개 문서는 건너뜁니다. (체크포인트에서 이어서)
+    """
+    for position, document in enumerate(documents):
+        if position < skip:
+            continue
+        for chunk in splitter.split_documents([document]):
+            yield position, chunk
+
+
+def iter_batches(chunks, batch_size: int):
+    """
+    (마지막 원본 문서 번호, [청크...]) 묶음. 체크포인트가 원본 문서 단위가 되도록 문서 경계에서만 끊습니다.
+    """
+    batch, last = [], None
+    for position, chunk in chunks:
+        if batch and position != last and len(batch) >= batch_size:
+            yield last, batch
+            batch = []
+        batch.append(chunk)
+        last = position
+    if batch:
+        yield last, batch
+
+
+def replace_dir(src: str, dst: str):
+    """
+    src 폴더를 dst로 교체합니다. (dst를 치운 뒤 이름만 바꿈)
+    """
+    old_path = f"{dst}.old-{os.getpid()}"
+    if os.path.exists(dst):
+        os.replace(dst, old_path)
+    os.replace(src, dst)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _fingerprint(path, embeddings) -> dict:
+    stat = os.stat(path)
+    return {
+        "source": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime,
+        "chunk_size": INGEST_CHUNK_SIZE, "chunk_overlap": INGEST_CHUNK_OVERLAP,
+        "embedding": getattr(embeddings, "namespace", type(embeddings).__name__),
+    }
+
+
+def _save_checkpoint(vectorstore, work_dir, fingerprint, documents, chunks):
+    vectorstore.save_local(work_dir)
+    checkpoint = {"fingerprint": fingerprint, "documents": documents, "chunks": chunks,
+                  "vectors": vectorstore.index.ntotal}
+    tmp_path = os.path.join(work_dir, "checkpoint.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(work_dir, "checkpoint.json"))
+
+
+def _load_checkpoint(work_dir, fingerprint, embeddings):
+    """
+    이어서 색인할 수 있으면 (인덱스, 완료한 문서 수, 청크 수), 아니면 None
+    """
+    try:
+        with open(os.path.join(work_dir, "checkpoint.json"), encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint["fingerprint"] != fingerprint:
+            return None
+        vectorstore = FAISS.load_local(work_dir, embeddings, allow_dangerous_deserialization=True)
+    except Exception:
+        return None
+    # 인덱스 저장 뒤 checkpoint.json을 쓰기 전에 멈춘 경우 진행 위치를 믿을 수 없으므로 처음부터
+    if vectorstore.index.ntotal != checkpoint["vectors"]:
+        return None
+    return vectorstore, checkpoint["documents"], checkpoint["chunks"]
+
+
+# 작성자 : 최준혁
+# 기능 : 원본 파일 하나를 스트리밍으로 색인해 target_dir(vectordb/<이름>)에 저장
+# 마지막 수정일 : 2025-07-06
+def ingest_source(path: str, target_dir: str, batch_size: int = INGEST_BATCH_SIZE,
+                  checkpoint_every: int = INGEST_CHECKPOINT_EVERY, resume: bool = True, embeddings=None) -> dict:
+    embeddings = embeddings or get_embeddings()
+    target_dir = target_dir.rstrip("/\\")
+    work_dir = target_dir + ".ingest"
+    fingerprint = _fingerprint(path, embeddings)
+
+    vectorstore, documents, chunks = None, 0, 0
+    restored = _load_checkpoint(work_dir, fingerprint, embeddings) if resume else None
+    if restored:
+        vectorstore, documents, chunks = restored
+        print(f"[Ingest] 이어서 색인: {path} (문서 {documents}개, 청크 {chunks}개 완료)")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=INGEST_CHUNK_SIZE, chunk_overlap=INGEST_CHUNK_OVERLAP)
+    started = time.time()
+    resumed_chunks = chunks
+    since_checkpoint = 0
+
+    for last, batch in iter_batches(iter_chunks(iter_documents(path), splitter, skip=documents), batch_size):
+        texts = [chunk.page_content for chunk in batch]
+        metadatas = [chunk.metadata for chunk in batch]
+        text_embeddings = list(zip(texts, embeddings.embed_documents(texts)))
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas)
+        else:
+            vectorstore.add_embeddings(text_embeddings, metadatas=metadatas)
+
+        documents = last + 1
+        chunks += len(batch)
+        since_checkpoint += len(batch)
+        if since_checkpoint >= checkpoint_every:
+            _save_checkpoint(vectorstore, work_dir, fingerprint, documents, chunks)
+            since_checkpoint = 0
+            print(f"[Ingest] 체크포인트: 문서 {documents}개, 청크 {chunks}개")
+
+    if vectorstore is None:
+        raise ValueError(f"색인할 내용이 없습니다: {path}")
+
+    vectorstore.save_local(work_dir)
+    checkpoint_path = os.path.join(work_dir, "checkpoint.json")
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    replace_dir(work_dir, target_dir)
+
+    elapsed = time.time() - started
+    return {"documents": documents, "chunks": chunks, "new_chunks": chunks - resumed_chunks,
+            "seconds": round(elapsed, 3)}
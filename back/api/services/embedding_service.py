@@ -0,0 +1,274 @@
+# 임베딩 공용 서비스
+# 작성자: 최준혁
+# 작성일: 2025-07-04
+#
+# 문단 색인(vector_utils), 챗봇 벡터DB 생성(chatbot_gemini_lib)의 임베딩은 이 모듈을 거칩니다.
+# - 입력을 EMBEDDING_BATCH_SIZE개씩 묶어 요청 (Gemini batchEmbedContents 요청당 최대 100개)
+# - 묶음이 여러 개면 EMBEDDING_CONCURRENCY개까지 동시에 요청
+# - 벡터는 내용 해시(모델 + 문서/질문 구분 + 본문)로 디스크에 캐시 → 같은 문단/청크를 다시 색인해도 재요청 없음
+#   저장: float16 memmap 파일(vectors.f16) + 해시 → 행 번호 색인(index.sqlite3), 모델별 폴더
+# - EMBEDDING_BACKEND=fake 이면 API 없이 결정적인 가짜 벡터를 사용 (오프라인 처리량 측정: python manage.py bench_embeddings)
+#   가짜 벡터는 차원이 달라 기존 벡터DB와 섞어 쓰면 안 됩니다.
+# LangChain Embeddings를 상속하므로 FAISS.from_documents / load_local에 그대로 넘길 수 있습니다.
+
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from decouple import config
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKEND = config('EMBEDDING_BACKEND', default="gemini")                 # gemini / fake
+EMBEDDING_MODEL = config('EMBEDDING_MODEL', default="models/gemini-embedding-exp-03-07")
+EMBEDDING_BATCH_SIZE = config('EMBEDDING_BATCH_SIZE', default=100, cast=int)       # 요청 하나에 넣을 최대 개수
+EMBEDDING_CONCURRENCY = config('EMBEDDING_CONCURRENCY', default=4, cast=int)       # 동시에 보낼 묶음 수
+EMBEDDING_CACHE = config('EMBEDDING_CACHE', default=True, cast=bool)              # 디스크 캐시 사용 여부
+EMBEDDING_CACHE_DIR = config(
+    'EMBEDDING_CACHE_DIR',
+    default=os.path.join(os.path.dirname(__file__), '..', '..', 'cache', 'embeddings'),  # 예: back/cache/embeddings/
+)
+EMBEDDING_FAKE_DIM = config('EMBEDDING_FAKE_DIM', default=768, cast=int)           # 가짜 벡터 차원
+EMBEDDING_FAKE_LATENCY = config('EMBEDDING_FAKE_LATENCY', default=0.0, cast=float)  # 가짜 요청 하나당 지연(초)
+
+_CACHE_GROW_ROWS = 1024   # memmap 파일을 늘릴 때 최소 행 수
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    본문 sha256으로 시드를 정하는 결정적 가짜 임베딩 (단위 벡터). 요청 하나마다 latency초를 기다립니다.
+    """
+    def __init__(self, dim=EMBEDDING_FAKE_DIM, latency=EMBEDDING_FAKE_LATENCY):
+        self.dim = dim
+        self.latency = latency
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class EmbeddingCache:
+    """
+    내용 해시 → float16 벡터 디스크 캐시. 여러 프로세스가 같은 폴더를 공유해도 됩니다.
+    행 할당/기록/색인 추가를 한 SQLite 쓰기 트랜잭션 안에서 하므로 색인에 있는 행은 항상 기록이 끝난 행입니다.
+    """
+    def __init__(self, root, namespace):
+        self.dir = os.path.abspath(os.path.join(root, re.sub(r"[^0-9A-Za-z_.-]+", "_", namespace)))
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, "vectors.f16")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._vectors = None   # np.memmap (행 수 x 차원)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.dir, "index.sqlite3"), timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _get_meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else None
+
+    def _map(self, dim, rows):
+        """
+        rows개 행을 담을 수 있도록 파일을 늘리고(필요하면) 다시 매핑합니다. self._lock 안에서 호출
+        """
+        if self._vectors is not None and self._vectors.shape[0] >= rows:
+            return self._vectors
+        row_bytes = dim * 2
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if size < rows * row_bytes:
+            size = max(rows, size // row_bytes * 2, _CACHE_GROW_ROWS) * row_bytes
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(size)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r+", shape=(size // row_bytes, dim))
+        return self._vectors
+
+    def get_many(self, keys) -> dict:
+        """
+        {키: float32 벡터} (없는 키는 빠짐)
+        """
+        conn = self._connect()
+        rows = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows.update(conn.execute(f"SELECT key, row FROM vectors WHERE key IN ({marks})", chunk).fetchall())
+        if not rows:
+            return {}
+        dim = self._get_meta(conn, "dim")
+        with self._lock:
+            vectors = self._map(dim, max(rows.values()) + 1)
+        return {key: np.asarray(vectors[row], dtype=np.float32) for key, row in rows.items()}
+
+    def put_many(self, items: dict):
+        """
+        {키: 벡터}를 저장합니다. 이미 있는 키는 건너뜁니다.
+        """
+        if not items:
+            return
+        conn = self._connect()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = set()
+                keys = list(items)
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    marks = ",".join("?" * len(chunk))
+                    existing.update(k for (k,) in conn.execute(f"SELECT key FROM vectors WHERE key IN ({marks})", chunk))
+                new = [(key, vector) for key, vector in items.items() if key not in existing]
+                if new:
+                    dim = self._get_meta(conn, "dim")
+                    if dim is None:
+                        dim = len(new[0][1])
+                        conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(dim),))
+                    next_row = self._get_meta(conn, "next_row") or 0
+                    vectors = self._map(dim, next_row + len(new))
+                    vectors[next_row:next_row + len(new)] = np.asarray([vector for _, vector in new], dtype=np.float16)
+                    vectors.flush()
+                    conn.executemany(
+                        "INSERT INTO vectors (key, row) VALUES (?, ?)",
+                        [(key, next_row + i) for i, (key, _) in enumerate(new)],
+                    )
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_row', ?)", (str(next_row + len(new)),))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class EmbeddingService(Embeddings):
+    def __init__(self, provider: Embeddings, namespace: str, batch_size=EMBEDDING_BATCH_SIZE,
+                 concurrency=EMBEDDING_CONCURRENCY, cache: EmbeddingCache | None = None):
+        self.provider = provider
+        self.namespace = namespace
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._stats = {"texts": 0, "cache_hits": 0, "embedded": 0, "batches": 0, "seconds": 0.0}
+
+    def _key(self, kind, text) -> str:
+        return hashlib.sha256(f"{self.namespace}\n{kind}\n{text}".encode("utf-8")).hexdigest()
+
+    def _request(self, kind, batch):
+        if kind == "query":
+            return [self.provider.embed_query(text) for text in batch]
+        return self.provider.embed_documents(batch)
+
+    def _embed(self, texts, kind):
+        started = time.monotonic()
+        keys = [self._key(kind, text) for text in texts]
+        found = self.cache.get_many(set(keys)) if self.cache else {}
+
+        # 캐시에 없는 본문만 (같은 호출 안의 중복도 한 번만) 요청
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        missing_keys = list(missing)
+        batches = [missing_keys[i:i + self.batch_size] for i in range(0, len(missing_keys), self.batch_size)]
+
+        def run(batch_keys):
+            return self._request(kind, [missing[key] for key in batch_keys])
+
+        if len(batches) > 1 and self.concurrency > 1:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                results = list(pool.map(run, batches))
+        else:
+            results = [run(batch) for batch in batches]
+
+        embedded = {}
+        for batch_keys, vectors in zip(batches, results):
+            embedded.update(zip(batch_keys, vectors))
+        if self.cache and embedded:
+            try:
+                self.cache.put_many(embedded)
+            except Exception as e:
+                print(f"[Embedding] 캐시 저장 실패: {e}")
+
+        with self._lock:
+            self._stats["texts"] += len(texts)
+            self._stats["cache_hits"] += len(texts) - sum(1 for key in keys if key in missing)
+            self._stats["embedded"] += len(embedded)
+            self._stats["batches"] += len(batches)
+            self._stats["seconds"] += time.monotonic() - started
+
+        return [
+            found[key].tolist() if key in found else list(map(float, embedded[key]))
+            for key in keys
+        ]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return self._embed(list(texts), "document")
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text], "query")[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["cache_hit_rate"] = round(stats["cache_hits"] / stats["texts"], 3) if stats["texts"] else None
+        stats["texts_per_second"] = round(stats["texts"] / stats["seconds"], 1) if stats["seconds"] else None
+        return stats
+
+    def report_stats(self):
+        s = self.stats()
+        print(
+            f"📊 [Embedding] {self.namespace}: 입력 {s['texts']}개, 캐시 적중률 {s['cache_hit_rate']}, "
+            f"요청 {s['embedded']}개 / {s['batches']}묶음, 처리량 {s['texts_per_second']}개/초"
+        )
+
+
+def build_embedding_service(backend=EMBEDDING_BACKEND, cache_dir=EMBEDDING_CACHE_DIR, use_cache=EMBEDDING_CACHE,
+                            **kwargs) -> EmbeddingService:
+    if backend == "fake":
+        provider = FakeEmbeddings(
+            dim=kwargs.pop("dim", EMBEDDING_FAKE_DIM), latency=kwargs.pop("latency", EMBEDDING_FAKE_LATENCY)
+        )
+        namespace = f"fake-{provider.dim}"
+    elif backend == "gemini":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        provider = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+        namespace = EMBEDDING_MODEL
+    else:
+        raise ValueError(f"알 수 없는 EMBEDDING_BACKEND: {backend}")
+    cache = EmbeddingCache(cache_dir, namespace) if use_cache else None
+    return EmbeddingService(provider, namespace, cache=cache, **kwargs)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embeddings() -> EmbeddingService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = build_embedding_service()
+        return _service
@@ -2,47 +2,58 @@
 # 작성자: 최준혁
 # 작성일: 2025-06-15
 
-from .story_flow import story_flow, StoryState
-from .core_nodes import generate_story_plan, retrieve_context, generate_paragraph
+from .story_flow import story_flow, story_flow_async, story_post_flow, StoryState
+from .story_tasks import StoryTaskRunner, get_story_task_runner
+from .story_stream import stream_story_turn
+from .core_nodes import (
+    generate_story_plan, retrieve_context, generate_paragraph,
+    agenerate_story_plan, aretrieve_context, agenerate_paragraph
+)
 from .character_utils import (
     extract_new_characters, get_character_description, 
     is_similar_name, filter_significant_characters
 )
-from .summary_utils import detect_and_update_story, get_story_stage
-from .paragraph_utils import save_paragraph, update_paragraph_version, save_qa
-from .image_utils import generate_image, image_prompt_check
-from .parsing_utils import extract_choice, normalize_name, is_choice_only
-from .finalize_utils import finalize_story_output
+from .summary_utils import detect_and_update_story, adetect_and_update_story
+from .paragraph_utils import (
+    save_paragraph, update_paragraph_version, save_qa,
+    asave_paragraph, aupdate_paragraph_version, asave_qa
+)
+from .image_utils import generate_image, agenerate_image
+from .parsing_utils import extract_choice, normalize_name, is_choice_only, StreamingChoiceParser
+from .finalize_utils import finalize_story_output, afinalize_story_output
 from .routers import (
-    summary_router, mode_router, finalize_router, passthrough_start
+    summary_router, mode_router, finalize_router, passthrough_start, apassthrough_start
 )
 
 __all__ = [
     # 메인 플로우
-    'story_flow', 'StoryState',
+    'story_flow', 'story_flow_async', 'story_post_flow', 'StoryState', 'stream_story_turn',
+    'StoryTaskRunner', 'get_story_task_runner',
     
     # 핵심 노드
     'generate_story_plan', 'retrieve_context', 'generate_paragraph',
+    'agenerate_story_plan', 'aretrieve_context', 'agenerate_paragraph',
     
     # 캐릭터 관리
     'extract_new_characters', 'get_character_description', 
     'is_similar_name', 'filter_significant_characters',
     
     # 요약 관리
-    'detect_and_update_story', 'get_story_stage',
+    'detect_and_update_story', 'adetect_and_update_story',
     
     # 문단 관리
     'save_paragraph', 'update_paragraph_version', 'save_qa',
+    'asave_paragraph', 'aupdate_paragraph_version', 'asave_qa',
     
     # 이미지 관리
-    'generate_image', 'image_prompt_check',
+    'generate_image', 'agenerate_image',
     
     # 파싱 유틸
-    'extract_choice', 'normalize_name', 'is_choice_only',
+    'extract_choice', 'normalize_name', 'is_choice_only', 'StreamingChoiceParser',
     
     # 마무리
-    'finalize_story_output',
+    'finalize_story_output', 'afinalize_story_output',
     
     # 라우터
-    'summary_router', 'mode_router', 'finalize_router', 'passthrough_start'
+    'summary_router', 'mode_router', 'finalize_router', 'passthrough_start', 'apassthrough_start'
 ]
@@ -5,8 +5,8 @@
 
 import difflib
 import re
-import google.generativeai as genai
-import os
+import json
+from api.services import llm_gateway
 from typing import List
 from .parsing_utils import normalize_name
 
@@ -17,9 +17,7 @@ from .parsing_utils import normalize_name
 
 debug = True
 
-# Gemini 모델 초기화
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+# Gemini 호출은 llm_gateway를 거칩니다. (모델 재사용, 재시도, 속도 제한, 지표)
 
 
 # ------------------------------------------------------------------------------------------
@@ -27,10 +25,9 @@ model = genai.GenerativeModel("gemini-2.0-flash")
 # ------------------------------------------------------------------------------------------
 
 # 작성자: 최준혁
-# 기능: 기존 3개 함수(extract_new_characters, filter_significant_characters, get_character_description)를 
-#       하나로 통합하여 Gemini API 호출을 1회로 축소 (성능 최적화)
+# 기능: 통합 캐릭터 추출 프롬프트 구성 (동기/비동기 공용)
 # 마지막 수정일: 2025-06-16
-def extract_and_describe(text: str, user_input: str, known_names: list[str], age: int) -> dict:
+def _build_extract_contents(text: str, user_input: str, known_names: list[str], age: int) -> list:
     system_instruction = (
         f"You are a professional Korean children's story writer for kids aged {age}.\n"
         "Your task is to analyze a story paragraph and extract ONLY new, meaningful characters.\n\n"
@@ -80,11 +77,33 @@ def extract_and_describe(text: str, user_input: str, known_names: list[str], age
         {'role': 'model', 'parts': [{'text': 'Understood. I will extract meaningful new characters and provide descriptions in JSON format.'}]},
         {'role': 'user', 'parts': [{'text': user_request}]}
     ]
+    return contents
+
+
+# 기능: 응답에서 JSON 객체 부분만 추출해 파싱 (없으면 None, 형식이 깨졌으면 ValueError)
+#       llm_gateway의 validate로도 사용해 파싱되는 응답만 캐시합니다.
+def _extract_json_object(response_text: str) -> dict | None:
+    if "```json" in response_text:
+        json_start = response_text.find("```json") + 7
+        json_end = response_text.find("```", json_start)
+        json_content = response_text[json_start:json_end].strip()
+    elif "{" in response_text and "}" in response_text:
+        start = response_text.find("{")
+        end = response_text.rfind("}") + 1
+        json_content = response_text[start:end]
+    else:
+        return None
+    result = json.loads(json_content)
+    if not isinstance(result, dict):
+        raise ValueError("JSON 객체가 아닙니다.")
+    return result
 
+
+# 작성자: 최준혁
+# 기능: 통합 캐릭터 추출 응답(JSON) 파싱 및 필터링 (동기/비동기 공용)
+# 마지막 수정일: 2025-06-16
+def _parse_extract_response(response_text: str, known_names: list[str]) -> dict:
     try:
-        response = model.generate_content(contents)
-        response_text = response.text.strip()
-        
         if debug:
             print("\n" + "-" * 40)
             print("[ExtractAndDescribe] DEBUG LOG")
@@ -94,23 +113,11 @@ def extract_and_describe(text: str, user_input: str, known_names: list[str], age
             print("-" * 40 + "\n")
 
         # JSON 추출 및 파싱
-        import json
-        
-        # JSON 부분만 추출
-        if "```json" in response_text:
-            json_start = response_text.find("```json") + 7
-            json_end = response_text.find("```", json_start)
-            json_content = response_text[json_start:json_end].strip()
-        elif "{" in response_text and "}" in response_text:
-            start = response_text.find("{")
-            end = response_text.rfind("}") + 1
-            json_content = response_text[start:end]
-        else:
+        result = _extract_json_object(response_text)
+        if result is None:
             if debug:
                 print("[ExtractAndDescribe] No JSON found in response")
             return {"new_characters": []}
-            
-        result = json.loads(json_content)
         characters = result.get("new_characters", [])
         
         # 유효성 검사 및 필터링
@@ -139,6 +146,33 @@ def extract_and_describe(text: str, user_input: str, known_names: list[str], age
         return {"new_characters": []}
 
 
+# 작성자: 최준혁
+# 기능: 기존 3개 함수(extract_new_characters, filter_significant_characters, get_character_description)를 
+#       하나로 통합하여 Gemini API 호출을 1회로 축소 (성능 최적화)
+# 마지막 수정일: 2025-06-16
+def extract_and_describe(text: str, user_input: str, known_names: list[str], age: int) -> dict:
+    contents = _build_extract_contents(text, user_input, known_names, age)
+    try:
+        response_text = llm_gateway.generate(contents, node="ExtractCharacters", validate=_extract_json_object).strip()
+    except Exception as e:
+        if debug:
+            print(f"[ExtractAndDescribe] Error: {e}")
+        return {"new_characters": []}
+    return _parse_extract_response(response_text, known_names)
+
+
+# 기능: extract_and_describe의 비동기 버전
+async def aextract_and_describe(text: str, user_input: str, known_names: list[str], age: int) -> dict:
+    contents = _build_extract_contents(text, user_input, known_names, age)
+    try:
+        response_text = (await llm_gateway.agenerate(contents, node="ExtractCharacters", validate=_extract_json_object)).strip()
+    except Exception as e:
+        if debug:
+            print(f"[ExtractAndDescribe] Error: {e}")
+        return {"new_characters": []}
+    return _parse_extract_response(response_text, known_names)
+
+
 
 # ------------------------------------------------------------------------------------------
 # 이름 유사도 및 중복 검사
@@ -230,8 +264,7 @@ def filter_significant_characters(paragraph: str, candidates: list[str], user_in
         "→ 반드시 인물 이름만 콤마(,)로 구분된 한 줄로 출력해주세요. 중요한 인물이 없다면 '없음'이라고 하세요."
     )
 
-    response = model.generate_content(prompt)
-    line = response.text.strip()
+    line = llm_gateway.generate(prompt, node="FilterCharacters").strip()
     if line.lower().startswith("없음"):
         return []
     return [name.strip() for name in line.split(",") if name.strip()]
@@ -263,8 +296,7 @@ def extract_new_characters(text: str, known_names: list[str]) -> list[str]:
         {'role': 'user', 'parts': [{'text': user_request}]}
     ]
 
-    response = model.generate_content(contents)
-    response_text = response.text.strip()
+    response_text = llm_gateway.generate(contents, node="ExtractNewCharacters").strip()
 
     if debug:
         print("\n" + "-" * 40)
@@ -352,8 +384,7 @@ def get_character_description(name: str, context: str, user_input: str, age: int
         {'role': 'user', 'parts': [{'text': user_request}]}
     ]
 
-    response = model.generate_content(contents)
-    first_line = response.text.strip().splitlines()[0]
+    first_line = llm_gateway.generate(contents, node="DescribeCharacter").strip().splitlines()[0]
 
     # 정규표현식으로 형식 맞추기: "번호. 이름 : 성별, 머리색, 눈동자색, 나이, 종족"까지만 유지
     cleaned_line = re.match(r"^\d+\.\s*[^:]+:\s*[^,]+,\s*[^,]+,\s*[^,]+,\s*[^,]+,\s*[^,]+", first_line)
@@ -1,17 +1,20 @@
 # LangGraph 핵심 생성 노드 정의
 # 작성자: 최준혁
 # 작성일: 2025-06-03
-# 마지막 수정일: 2025-06-15
-import google.generativeai as genai
-import os
+# 마지막 수정일: 2025-07-01
 import re
 from typing import Tuple, List
 
 from api.models import Story, Storyparagraph
 from django.utils import timezone
+from asgiref.sync import sync_to_async
+from api.services import llm_gateway
 from api.services.relational_utils import search_similar_paragraphs_by_keywords, get_latest_paragraphs
-from .parsing_utils import extract_choice
-from .substage_prompts import get_substage_instruction  
+from langgraph.config import get_stream_writer
+from .parsing_utils import extract_choice, StreamingChoiceParser
+from .substage_prompts import get_substage_instruction
+from .prompt_templates import get_template, get_paragraph_suffix
+from .story_cursor import cursor_paragraphs
 
 # ------------------------------------------------------------------------------------------
 # 초기화 및 설정
@@ -19,73 +22,37 @@ from .substage_prompts import get_substage_instruction
 
 debug = True
 
-# Gemini 초기화 및 모델 정의
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+# Gemini 호출은 llm_gateway를 거칩니다. (모델 재사용, 재시도, 속도 제한, 지표)
 
 # ------------------------------------------------------------------------------------------
 # 1. 기승전결 생성
 # ------------------------------------------------------------------------------------------
 
 # 작성자: 최준혁
-# 기능: 주제/분위기 기반 10단계 요약 생성 + DB 저장
+# 기능: 10단계 요약 생성용 프롬프트 구성 (동기/비동기 노드 공용)
 # 마지막 수정일: 2025-06-17
-def generate_story_plan(state: dict) -> dict:
+def _build_story_plan_contents(state: dict) -> list:
     theme = state.get("theme")
     mood = state.get("mood")
     topic = state.get("input")  # 사용자 입력 주제
     age = state.get("age", 7)
-    story_id = state.get("story_id")  # story_id 반드시 필요
-
-    # 1. 시스템 지침 
-    system_instruction = (
-        f"You are a professional children's story writer for age {age}.\n"
-        "Your task is to create a story outline using a 10-step version of the classic Korean 4-stage structure: 기 (Introduction), 승 (Development), 전 (Climax), 결 (Conclusion).\n"
-        "Use the provided topic, theme, and mood to generate a coherent, emotionally progressive 10-sentence outline.\n"
-        "Each sentence should represent a key transition in the story's development.\n"
-        "Keep characters, setting, and tone consistent. Do NOT change place/time or introduce new characters after step 5.\n"
-        "Use only 1–2 main characters with clear details: name, gender, age, species, hair, eyes.\n"
-        "Use nickname-style Korean names for animals or fantasy characters.\n"
-        "Write clearly in Korean. No markdown or explanations."
-    )
 
-    # 2. 사용자 요청 
+    # 고정 지침/출력 예시는 prompt_templates에 한 번만 만들어 두고, 입력 정보만 붙입니다.
     user_request = (
         f"[Input Information]\n"
         f"- Topic: {topic}\n"
         f"- Theme: {theme}\n"
-        f"- Mood: {mood}\n\n"
-
-        "[Output Format Example]\n"
-        "[기승전결]\n"
-        "1. 기1: 주인공이 평소 어떤 삶을 살고 있는지 소개한다.\n"
-        "2. 기2: 조용한 일상 속에서 작은 이상 징후가 감지된다.\n"
-        "3. 승1: 그 이상 현상이 점점 커지며 문제의 조짐을 보인다.\n"
-        "4. 승2: 주인공이 사태에 반응하고, 감정 변화가 시작된다.\n"
-        "5. 승3: 문제 상황이 점점 더 복잡해지고, 갈등이 확대된다.\n"
-        "6. 전1: 가장 큰 위기 상황이 벌어지며 절정에 이른다.\n"
-        "7. 전2: 주인공이 중요한 결단을 내리거나 변화한다.\n"
-        "8. 결1: 문제 해결을 위한 행동이 시작된다.\n"
-        "9. 결2: 사건이 마무리되고 감정적으로 정리된다.\n"
-        "10. 에필로그: 평화로운 결말과 함께 교훈이나 여운을 남긴다.\n\n"
-        
-        "[등장인물]\n"
-        "1. 수아 : 여자, 노란 머리, 파란 눈동자, 7세, 인간\n"
-        "2. 용이 : 남성, 검은 머리, 검은 눈동자, 100세, 용\n\n"
-        "→ 반드시 1~10 단계 문장과 [등장인물] 섹션을 포함해야 합니다.\n"
-        "→ 각 문장은 '1. ~', '2. ~' 형식으로 시작하세요."
+        f"- Mood: {mood}\n"
+        f"- Child Age: {age}\n"
     )
+    return get_template("GenerateStoryPlan").build(user_request)
 
-    contents = [
-        {'role': 'user', 'parts': [{'text': system_instruction}]},
-        {'role': 'model', 'parts': [{'text': "Understood. I will generate a 10-stage story outline and character list in Korean."}]},
-        {'role': 'user', 'parts': [{'text': user_request}]}
-    ]
 
-    response = model.generate_content(contents)
-    result = response.text.strip()
-
-    # 결과 파싱
+# 작성자: 최준혁
+# 기능: 10단계 요약 응답 파싱 + DB 저장 (동기/비동기 노드 공용)
+# 마지막 수정일: 2025-06-17
+# 기능: 10단계 요약 응답을 (요약 줄 목록, 등장인물 줄 목록)으로 파싱 (요약 줄이 없으면 캐시하지 않음)
+def _parse_story_plan(result: str) -> tuple[list[str], list[str]]:
     story_plan, characters = [], []
     current_section = "summary"
     for line in result.splitlines():
@@ -97,6 +64,18 @@ def generate_story_plan(state: dict) -> dict:
                 story_plan.append(line.strip())
             elif current_section == "characters":
                 characters.append(line.strip())
+    return story_plan, characters
+
+
+def _save_story_plan(state: dict, result: str) -> dict:
+    theme = state.get("theme")
+    mood = state.get("mood")
+    topic = state.get("input")
+    age = state.get("age", 7)
+    story_id = state.get("story_id")  # story_id 반드시 필요
+
+    # 결과 파싱
+    story_plan, characters = _parse_story_plan(result)
 
     # DB 저장 - 캐시된 Story 객체 사용
     story = state.get("story")
@@ -132,10 +111,35 @@ def generate_story_plan(state: dict) -> dict:
     }
 
 
+# 작성자: 최준혁
+# 기능: 주제/분위기 기반 10단계 요약 생성 + DB 저장
+# 마지막 수정일: 2025-06-17
+def generate_story_plan(state: dict) -> dict:
+    contents = _build_story_plan_contents(state)
+    response_text = llm_gateway.generate(contents, node="GenerateStoryPlan", validate=lambda text: _parse_story_plan(text)[0])
+    return _save_story_plan(state, response_text.strip())
+
+
+# 기능: generate_story_plan의 비동기 버전 (Gemini 비동기 호출, DB 저장은 스레드에서 실행)
+async def agenerate_story_plan(state: dict) -> dict:
+    contents = _build_story_plan_contents(state)
+    response_text = await llm_gateway.agenerate(contents, node="GenerateStoryPlan", validate=lambda text: _parse_story_plan(text)[0])
+    return await sync_to_async(_save_story_plan)(state, response_text.strip())
+
+
 # ------------------------------------------------------------------------------------------
 # 2. 문맥 조회
 # ------------------------------------------------------------------------------------------
 
+# 기능: 다음 문단 번호 (Start에서 읽은 커서 사용, 커서가 없으면 DB 조회)
+def _next_paragraph_no(state: dict) -> int:
+    cursor = state.get("cursor")
+    if cursor:
+        return cursor["next_paragraph_no"]
+    last_para = Storyparagraph.objects.filter(story_id=state.get("story_id")).order_by("-paragraph_no").first()
+    return (last_para.paragraph_no + 1) if last_para else 1
+
+
 # 작성자: 최준혁
 # 기능: 관계형 DB에서 관련 문맥을 조회하여 상태에 context로 추가 (벡터DB 대체)
 # 마지막 수정일: 2025-06-16
@@ -143,11 +147,11 @@ def retrieve_context(state: dict) -> dict:
     query = state.get("input", "")
     story_id = state.get("story_id")
     paragraph_no = state.get("paragraph_no") 
+    paragraphs = cursor_paragraphs(state.get("cursor"))  # 커서가 전체 문단을 담고 있으면 DB 대신 사용
 
     # 11번째 문단 이상 요청 시 거부
-    if not paragraph_no:  # paragraph_no가 설정되지 않은 경우 계산
-        last_para = Storyparagraph.objects.filter(story_id=story_id).order_by("-paragraph_no").first()
-        paragraph_no = (last_para.paragraph_no + 1) if last_para else 1
+    if not paragraph_no:  # paragraph_no가 설정되지 않은 경우 커서(없으면 DB)에서 계산
+        paragraph_no = _next_paragraph_no(state)
     
     if paragraph_no >= 11:
         if debug:
@@ -171,16 +175,16 @@ def retrieve_context(state: dict) -> dict:
     retrieved_context = ""
 
     try:
-        # 관계형 DB에서 키워드 기반 검색 시도 (벡터DB 대체)
-        retrieved_context = search_similar_paragraphs_by_keywords(story_id, query, top_k=6)
+        # 동화별 BM25 색인에서 관련 문단 검색 (벡터DB 대체)
+        retrieved_context = search_similar_paragraphs_by_keywords(story_id, query, top_k=6, paragraphs=paragraphs)
         if not retrieved_context:
             if debug:
                 print("[RetrieveContext] 키워드 검색 결과 없음. 최근 문단 사용.")
-            retrieved_context = get_latest_paragraphs(story_id, top_k=6)
+            retrieved_context = get_latest_paragraphs(story_id, top_k=6, paragraphs=paragraphs)
     except Exception as e:
         if debug:
             print(f"[RetrieveContext Error] {e}")
-        retrieved_context = get_latest_paragraphs(story_id, top_k=6)
+        retrieved_context = get_latest_paragraphs(story_id, top_k=6, paragraphs=paragraphs)
 
     if not retrieved_context:
         retrieved_context = "이전에 생성된 문맥이 없습니다."
@@ -202,104 +206,76 @@ def retrieve_context(state: dict) -> dict:
         "context": retrieved_context
     }
 
+
+# 기능: retrieve_context의 비동기 버전 (관계형 DB 조회를 스레드에서 실행)
+async def aretrieve_context(state: dict) -> dict:
+    return await sync_to_async(retrieve_context)(state)
+
 # ------------------------------------------------------------------------------------------
 # 3. 문단 생성
 # ------------------------------------------------------------------------------------------
 
 # 작성자: 최준혁
 # 기능: 문단 번호에 따른 이야기 단계 반환
-# 마지막 수정일: 2025-06-16
+# 마지막 수정일: 2025-07-01
+STORY_SUBSTAGES = ("기1", "기2", "승1", "승2", "승3", "전1", "전2", "결1", "결2", "에필로그")
+
+
 def get_story_substage(paragraph_no: int) -> str:
-    if paragraph_no == 1:
-        return "기1"
-    elif paragraph_no == 2:
-        return "기2"
-    elif paragraph_no == 3:
-        return "승1"
-    elif paragraph_no == 4:
-        return "승2"
-    elif paragraph_no == 5:
-        return "승3"
-    elif paragraph_no == 6:
-        return "전1"
-    elif paragraph_no == 7:
-        return "전2"
-    elif paragraph_no == 8:
-        return "결1"
-    elif paragraph_no == 9:
-        return "결2"
-    elif paragraph_no == 10:
-        return "에필로그"
-    else:
-        return "에필로그"  # 10 초과일 경우에도 에필로그로 간주
+    if 1 <= paragraph_no <= len(STORY_SUBSTAGES):
+        return STORY_SUBSTAGES[paragraph_no - 1]
+    return "에필로그"  # 10 초과일 경우에도 에필로그로 간주
 
 
 # 작성자: 최준혁
 # 기능: 문단 번호에 따른 힌트 제공
-# 마지막 수정일: 2025-06-11
+# 마지막 수정일: 2025-07-01
+PARAGRAPH_HINTS = {
+    "기1": "- This is the beginning. Introduce the main character and their peaceful routine.\n",
+    "기2": "- A small oddity appears. Let curiosity emerge, but stay gentle.",
+    "승1": "- First clear tension. Start shifting from peace to conflict.",
+    "승2": (
+        "- The character begins to engage with the problem. Show their response."
+        "- It’s okay to introduce a helper if needed.\n"
+    ),
+    "승3": "- Tension rises. Reveal internal or external challenges.",
+    "전1": (
+        "- The crisis peaks. Everything should feel urgent, risky, or highly emotional.\n"
+        "- No new characters or places.\n"
+    ),
+    "전2": "- Turning point. The character makes a key decision.",
+    "결1": (
+        "- Begin resolving the conflict. Emotional tone should soften.\n"
+        "- Guide toward a peaceful resolution.\n"
+    ),
+    "결2": (
+        "- Final emotional closure. Highlight reflections or lessons learned.\n"
+        "- Prepare for the story’s end.\n"
+    ),
+    "에필로그": (
+        "- Write a complete 3-6 sentence [문장] that beautifully closes the story.\n"
+        "- No [질문] or [행동]. Use peaceful, conclusive tone.\n"
+        "- Provide proper emotional closure and story resolution.\n"
+    ),
+}
+
+
 def get_paragraph_hint(substage: str) -> str:
-    if substage == "기1":
-        return (
-            "- This is the beginning. Introduce the main character and their peaceful routine.\n"
-        )
-    elif substage == "기2":
-        return (
-            "- A small oddity appears. Let curiosity emerge, but stay gentle."
-        )
-    elif substage == "승1":
-        return (
-            "- First clear tension. Start shifting from peace to conflict."
-        )
-    elif substage == "승2":
-        return (
-            "- The character begins to engage with the problem. Show their response."
-            "- It’s okay to introduce a helper if needed.\n"
-        )
-    elif substage == "승3":
-        return (
-            "- Tension rises. Reveal internal or external challenges."
-        )
-    elif substage == "전1":
-        return (
-            "- The crisis peaks. Everything should feel urgent, risky, or highly emotional.\n"
-            "- No new characters or places.\n"
-        )
-    elif substage == "전2":
-        return (
-            "- Turning point. The character makes a key decision."
-        )
-    elif substage == "결1":
-        return (
-            "- Begin resolving the conflict. Emotional tone should soften.\n"
-            "- Guide toward a peaceful resolution.\n"
-        )
-    elif substage == "결2":
-        return (
-            "- Final emotional closure. Highlight reflections or lessons learned.\n"
-            "- Prepare for the story’s end.\n"
-        )
-    elif substage == "에필로그":
-        return (
-            "- Write a complete 3-6 sentence [문장] that beautifully closes the story.\n"
-            "- No [질문] or [행동]. Use peaceful, conclusive tone.\n"
-            "- Provide proper emotional closure and story resolution.\n"
-        )
-    return ""
+    return PARAGRAPH_HINTS.get(substage, "")
 
 # 작성자: 최준혁
-# 기능: 사용자 입력을 받아 동화 패러그래프를 생성하는 노드
+# 기능: 다음 문단 번호 조회 + 문단 생성 프롬프트 구성 (동기/비동기 노드 공용)
+#       11번째 이상 요청이면 (완료 응답, None), 아니면 (None, 요청 정보)를 반환
 # 마지막 수정일: 2025-06-17
-def generate_paragraph(state: dict) -> dict:
+def _prepare_paragraph_request(state: dict) -> tuple[dict | None, dict | None]:
     user_input = state.get("input")
     user_age = state.get("age")
     theme = state.get("theme")
     mood = state.get("mood")
     context = state.get("context")
     story_plan = state.get("story_plan", [])
-    story_id = state.get("story_id")
 
-    last_para = Storyparagraph.objects.filter(story_id=story_id).order_by("-paragraph_no").first()
-    paragraph_no = (last_para.paragraph_no + 1) if last_para else 1
+    paragraph_no = _next_paragraph_no(state)
 
     if paragraph_no >= 11:
         if debug:
@@ -313,7 +289,7 @@ def generate_paragraph(state: dict) -> dict:
             "context": context,
             "paragraph_no": paragraph_no,
             "story_completed": True
-        }
+        }, None
 
     story_substage = get_story_substage(paragraph_no)
 
@@ -325,60 +301,7 @@ def generate_paragraph(state: dict) -> dict:
     substage_instruction = get_substage_instruction(story_substage)
 
 
-    # Chain of Thought 기반 사고 흐름 유도
-    reasoning_instruction = (
-        "Before writing the paragraph, think step-by-step:")
-    reasoning_prompt = (
-        "1. What just happened in the previous part of the story?\n"
-        "2. How would the main character logically feel at this point?\n"
-        "3. Based on the child's input, what event would naturally happen next?\n"
-        "4. What emotional tone best fits this paragraph? (e.g., joy, anxiety, wonder)\n"
-        "5. If you had to choose one central emotion for this paragraph, what would it be?\n"
-        "6. Could you vary sentence length and rhythm to make the paragraph more engaging for a child?\n"
-        "7. What kind of ending sentence would gently connect to the next paragraph?\n"
-        "8. What question could you ask the child that directly relates to this paragraph and invites them to choose the next direction?\n"
-        "9. What are three possible action choices that logically follow the current events, help the story progress, and align with the child’s age and theme?\n"
-        "→ Think through all of these step by step, then write the [문장], [질문], and [행동] sections accordingly."
-    )
-
-
-    # 마지막 문단 강제 종료 지침
-    if paragraph_no == 10:
-        instruction_suffix = (
-            "- This is the final paragraph. Only write the [문장] section with 3–6 complete, emotionally conclusive sentences.\n"
-            "- DO NOT write any [질문] or [행동] sections.\n"
-            "- DO NOT include the [문장] label. Only provide 3–6 full sentences as natural story narration.\n"
-            "- End with a warm and clear sentence that signals the story has finished.\n"
-            "- Examples: 행복하게 살았답니다. / 여기서 끝이랍니다. / 어떻게 되었을까요? \n"
-        )
-    elif paragraph_no == 9:
-        instruction_suffix = (
-            "- You MUST include [문장], [질문], and [행동].\n"
-            "- In the [문장], give a clear sense that the story is nearing its conclusion.\n"
-            "- Use soft emotional reflection and prepare the child for closure.\n"
-            "- You must gently prepare the child for the ending in the next (10th) paragraph.\n"
-        )
-    else: # 1~8 paragraph
-        instruction_suffix = (
-            "- You MUST include [문장], [질문], and [행동].\n"
-            "- The [행동] MUST reflect the current story substage and help transition to the next stage.\n"
-            "- Choices must align with the planned story arc (기1-기2-승1-승2-승3-전1-전2-결1-결2-에필로그).\n"
-        )
-
-    system_instruction = (
-        f"You are a professional Korean children's story writer.\n\n"
-        "Your tone should be warm, gentle, and immersive, like reading a picture book aloud to a child.\n"
-        f"Use simple, age-appropriate language for a child aged {user_age}.\n"
-        "Dialogue between close friends may use soft casual endings like ~해/~지?, but keep it warm and polite.\n"
-        "- NEVER use emojis, markdown, or sound effects.\n"
-        "- DO NOT repeat the stage summary or previously told story.\n"
-        "- DO NOT give human names to animal or fantasy characters.\n"
-        "- Do NOT assign the same name to more than one character, even if they are different species.\n"
-        "- Each character must have a unique name.\n"
-        "- Maintain a consistent naming convention throughout the story.\n"
-        "- Encourage the child to imagine or choose the next step using the provided [질문] and [행동] sections."
-    )
-
+    # 작가 지침, 사고 단계, 출력 형식/예시, 어투·이름 규칙은 고정 부분(prompt_templates)에 있습니다.
     user_request = (
         f"Child's New Input:\n\"{user_input}\"\n\n"
         "→ This is a NEW event or suggestion from the child.\n"
@@ -401,81 +324,32 @@ def generate_paragraph(state: dict) -> dict:
         f"Substage-Specific [행동] Guidance:\n{substage_instruction}\n\n"
         f"Current Context:\n{context}\n\n"
 
+        "Now write your own output based on the child's latest input, following the reasoning steps, "
+        "format and rules given above.\n\n"
 
-        "--- REASONING ---\n\n"
-        f"{reasoning_instruction}\n{reasoning_prompt}\n\n"
-
-        "Answer these step-by-step **in your internal reasoning** (DO NOT show these in the final output).\n\n"
-
-        "Then begin writing output with the following format:\n"
-        "[문장] ...\n"
-        "[질문] ...\n"
-        "[행동] ...\n"
-
-        "Here is a good example for reference (DO NOT COPY):\n\n"
-
-
-        "[문장]\n"
-        "작은 다람쥐는 조심스럽게 다가가 인사를 했어요. 나무 위의 새도 고개를 끄덕이며 인사를 받아주었답니다. 그렇게 둘은 금세 친구가 되었어요.\n\n"
-        "[질문]\n"
-        "다람쥐는 다음에 무엇을 하면 좋을까요?\n\n"
-        "[행동]\n"
-        "- 새에게 나무 열매를 가져다줘요.\n"
-        "- 새와 함께 나무 위를 올라가요.\n"
-        "- 새의 둥지를 구경해요.\n"
-
-        "Now write your own output below, based on the child's latest input and the reasoning above.\n\n"
-
-
-        f"Then write:\n"
-
-        "--- INSTRUCTION ---\n\n"
-        "Use the following format:\n"
-        "[문장] - Continue the story in 3–6 Korean sentences.\n"
-        "[질문] - Ask ONE child-directed question in Korean about what should happen next.\n"
-        "[행동] - List 3 clear action choices the child can select. Each must be a full sentence.\n\n"
-
-        "Mandatory Tone Requirements:\n"
-        "- [문장]: End every sentence with ~해요/~어요/~예요/~이에요/~답니다\n"
-        "- [질문]: Must end with ~을까요?/~까요?/~어요?\n"
-        "- [행동]: Each choice must end with ~해요/~어요/~예요\n"
-        "- DO NOT use ~았다/~었다/~했다 ANYWHERE\n\n"
-        "✓ Correct Examples: (DO NOT repeat in output, just for style understanding):\n"
-        "1. 토끼가 숲속을 뛰어다녀요 (✅ OK)\n"
-        "2. 공주가 \"안녕하세요\"라고 말해요 (✅ OK)\n"
-        "3. 그들은 행복하게 살아요 (✅ OK)\n"
-        "1. 문이 열려요 (✅ OK)\n"
-        "❌ DO NOT write: 뛰어다녔다, 말했다, 살았다, 열렸다\n\n"
-
-        "Additional Formatting Constraints:\n"
-        "- DO NOT phrase choices as questions or suggestions (e.g., '~할까요?', '~볼래요?').\n"
-        "- Choices must describe what the character does, not what the child should do.\n"
-        "- NEVER use emojis, markdown, or sound effects.\n"
-        "- DO NOT repeat the story summary or previous context.\n\n"
-
-        "→ The [행동] section MUST follow this exact format:\n"
-        "1. [specific child-directed action in Korean, ending with ~해요/~어요]\n"
-        "2. ...\n"
-        "3. ...\n"
-        "→ Do NOT use hyphens or bullet points. Only use '1.', '2.', '3.' as prefix.\n"
-        "→ Each sentence must end with polite declarative endings, not questions or suggestions.\n\n"
-
-        "Character Naming Rules:\n"
-        "- Animal or fantasy characters (e.g., talking dogs, fairies, goblins) must NEVER have human names.\n"
-        "- Only human characters may have Korean names\n"
-        "- Each character must have a unique name across the entire story.\n\n"
-
-        f"{instruction_suffix}"
+        # 마지막 문단 강제 종료 지침 (10: 마지막, 9: 결말 준비, 1~8: 기본)
+        f"{get_paragraph_suffix(paragraph_no)}"
     )
 
-    contents = [
-        {'role': 'user', 'parts': [{'text': system_instruction}]},
-        {"role": "model", "parts": [{"text": "이해했습니다. 사고 흐름을 먼저 생각한 후, 문단을 쓰겠습니다."}]},
-        {'role': 'user', 'parts': [{'text': user_request}]}
-    ]
+    contents = get_template("GenerateParagraph").build(user_request)
+    return None, {
+        "paragraph_no": paragraph_no,
+        "story_substage": story_substage,
+        "plan_summary": plan_summary,
+        "contents": contents,
+    }
 
-    response = model.generate_content(contents)
-    full_text = response.text.strip()
+
+# 작성자: 최준혁
+# 기능: 문단 생성 응답에서 [문장]/[질문]/[행동] 추출 (동기/비동기 노드 공용)
+# 마지막 수정일: 2025-06-17
+def _parse_paragraph_response(state: dict, request: dict, full_text: str) -> dict:
+    user_input = state.get("input")
+    mood = state.get("mood")
+    context = state.get("context")
+    paragraph_no = request["paragraph_no"]
+    story_substage = request["story_substage"]
+    plan_summary = request["plan_summary"]
 
     paragraph, question, choices = extract_choice(full_text, paragraph_no)
 
@@ -499,3 +373,47 @@ def generate_paragraph(state: dict) -> dict:
         "context": context,
         "paragraph_no": paragraph_no
     }
+
+
+# 작성자: 최준혁
+# 기능: 사용자 입력을 받아 동화 패러그래프를 생성하는 노드
+#       state["stream"]이면 응답을 스트리밍으로 받아 [문장] 조각/[질문]/[행동]을
+#       stream_mode="custom" 이벤트로 내보냅니다. (story_stream.py)
+# 마지막 수정일: 2025-06-27
+def generate_paragraph(state: dict) -> dict:
+    completed, request = _prepare_paragraph_request(state)
+    if completed:
+        return completed
+
+    if not state.get("stream"):
+        response_text = llm_gateway.generate(request["contents"], node="GenerateParagraph")
+        return _parse_paragraph_response(state, request, response_text.strip())
+
+    writer = get_stream_writer()
+    parser = StreamingChoiceParser(request["paragraph_no"])
+    for chunk in llm_gateway.stream(request["contents"], node="GenerateParagraph"):
+        for event in parser.feed(chunk):
+            writer(event)
+    for event in parser.close():
+        writer(event)
+    return _parse_paragraph_response(state, request, parser.text.strip())
+
+
+# 기능: generate_paragraph의 비동기 버전 (문단 번호 조회는 스레드에서, Gemini는 비동기 호출)
+async def agenerate_paragraph(state: dict) -> dict:
+    completed, request = await sync_to_async(_prepare_paragraph_request)(state)
+    if completed:
+        return completed
+
+    if not state.get("stream"):
+        response_text = await llm_gateway.agenerate(request["contents"], node="GenerateParagraph")
+        return _parse_paragraph_response(state, request, response_text.strip())
+
+    writer = get_stream_writer()
+    parser = StreamingChoiceParser(request["paragraph_no"])
+    async for chunk in llm_gateway.astream(request["contents"], node="GenerateParagraph"):
+        for event in parser.feed(chunk):
+            writer(event)
+    for event in parser.close():
+        writer(event)
+    return _parse_paragraph_response(state, request, parser.text.strip())
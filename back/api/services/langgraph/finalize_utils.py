@@ -2,10 +2,10 @@
 # 작성자: 최준혁
 # 마지막 수정일: 2025-06-18 (Storyparagraph 제거 및 context 확인 추가)
 
-import google.generativeai as genai
-import os
 from api.models import Story
+from api.services import llm_gateway
 from django.utils import timezone
+from asgiref.sync import sync_to_async
 import re
 
 # ------------------------------------------------------------------------------------------
@@ -14,19 +14,19 @@ import re
 
 debug = True
 
-# Gemini 모델 초기화
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+# Gemini 호출은 llm_gateway를 거칩니다. (모델 재사용, 재시도, 속도 제한, 지표)
 
 # ------------------------------------------------------------------------------------------
 # 동화 요약 및 마무리 (제목 + 요약만 생성)
 # ------------------------------------------------------------------------------------------
 
-def finalize_story_output(state: dict) -> dict:
+# 기능: 마무리 대상 Story 조회 + 제목/요약 프롬프트 구성 (동기/비동기 공용)
+#       중단해야 하면 (반환할 state, None, None), 아니면 (None, story, prompt)
+def _prepare_finalize(state: dict):
     story_id = state.get("story_id")
     if not story_id:
         print("[FinalizeStory] story_id 없음")
-        return state
+        return state, None, None
 
     # 이미 완료된 스토리인지 확인
     story = state.get("story") or Story.objects.filter(story_id=story_id).first()
@@ -39,7 +39,7 @@ def finalize_story_output(state: dict) -> dict:
             "summary_3line": story.summary or "이미 완료된 동화입니다.",
             "narrative_story": "동화가 이미 완성되었습니다.",
             "completion_message": "동화가 완성되었습니다. 새로운 이야기를 원하시면 새로 시작해주세요."
-        }
+        }, None, None
 
     # context(전체 문단 텍스트)가 비어 있으면 중단
     full_text = state.get("context", "").strip()
@@ -49,7 +49,7 @@ def finalize_story_output(state: dict) -> dict:
             **state,
             "story_completed": False,
             "completion_message": "본문 내용이 없어 제목과 요약을 생성할 수 없습니다."
-        }
+        }, None, None
 
     # 프롬프트 구성
     prompt = (
@@ -65,12 +65,13 @@ def finalize_story_output(state: dict) -> dict:
         "마크다운은 사용하지 마세요.\n"
         f"{full_text}"
     )
+    return None, story, prompt
 
-    # Gemini 호출
-    response = model.generate_content(prompt)
-    lines = response.text.strip().splitlines()
 
-    # 제목 및 요약 추출
+# 기능: 제목/요약 응답을 (제목, 요약)으로 파싱 (둘 다 없으면 캐시하지 않음)
+def _parse_finalize(response_text: str) -> tuple[str, str]:
+    lines = response_text.strip().splitlines()
+
     def extract_section(prefixes: list[str]) -> str:
         for line in lines:
             for p in prefixes:
@@ -78,8 +79,15 @@ def finalize_story_output(state: dict) -> dict:
                     return line.split(":", 1)[-1].strip()
         return ""
 
-    title = extract_section(["1.", "1. 제목", "제목"])
-    summary = extract_section(["2.", "2. 요약", "요약"])
+    return extract_section(["1.", "1. 제목", "제목"]), extract_section(["2.", "2. 요약", "요약"])
+
+
+# 기능: 제목/요약 응답 파싱 + Story 완료 처리 저장 (동기/비동기 공용)
+def _save_finalize(state: dict, story, response_text: str) -> dict:
+    lines = response_text.strip().splitlines()
+
+    # 제목 및 요약 추출
+    title, summary = _parse_finalize(response_text)
 
     if not title and not summary:
         print("[FinalizeStory] ❗ Gemini 응답에서 제목과 요약을 추출하지 못했습니다.")
@@ -105,7 +113,7 @@ def finalize_story_output(state: dict) -> dict:
         print("Lines:")
         print(lines)
         print("Response Text:")
-        print(response.text)
+        print(response_text)
         print("Title:")
         print(title)
         print("Summary:")
@@ -120,6 +128,26 @@ def finalize_story_output(state: dict) -> dict:
         "completion_message": "동화가 완성되었습니다!"
     }
 
+
+def finalize_story_output(state: dict) -> dict:
+    stopped, story, prompt = _prepare_finalize(state)
+    if prompt is None:
+        return stopped
+
+    # Gemini 호출
+    response_text = llm_gateway.generate(prompt, node="FinalizeStory", validate=lambda text: any(_parse_finalize(text)))
+    return _save_finalize(state, story, response_text)
+
+
+# 기능: finalize_story_output의 비동기 버전 (Gemini 비동기 호출, DB 조회/저장은 스레드에서 실행)
+async def afinalize_story_output(state: dict) -> dict:
+    stopped, story, prompt = await sync_to_async(_prepare_finalize)(state)
+    if prompt is None:
+        return stopped
+
+    response_text = await llm_gateway.agenerate(prompt, node="FinalizeStory", validate=lambda text: any(_parse_finalize(text)))
+    return await sync_to_async(_save_finalize)(state, story, response_text)
+
 # ------------------------------------------------------------------------------------------
 # 완료 상태 체크 및 저장 제어 유틸리티
 # ------------------------------------------------------------------------------------------
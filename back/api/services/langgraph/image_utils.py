@@ -3,11 +3,10 @@
 # 작성일: 2025-06-03
 # 마지막 수정일: 2025-06-15
 
-import google.generativeai as genai
-import os
 from api.models import Illustration
 from django.utils import timezone
-from api.services.langgraph.node_img import generate_image_unified
+from asgiref.sync import sync_to_async
+from api.services.langgraph.node_img import generate_image_unified, agenerate_image_unified
 
 # ------------------------------------------------------------------------------------------
 # 초기화 및 설정
@@ -15,9 +14,7 @@ from api.services.langgraph.node_img import generate_image_unified
 
 debug = True
 
-# Gemini 모델 초기화
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+# Gemini 호출은 node_img에서 llm_gateway를 거칩니다.
 
 # ------------------------------------------------------------------------------------------
 # 이미지 생성
@@ -33,7 +30,21 @@ def generate_image(state: dict) -> dict:
         paragraph_id=state.get("paragraph_id"),
         check="illustration",
     )
+    return _save_illustration(state, imageLC)
 
+
+# 기능: generate_image의 비동기 버전 (Gemini 비동기 호출, DB 저장은 스레드에서 실행)
+async def agenerate_image(state: dict) -> dict:
+    imageLC = await agenerate_image_unified(
+        story_id=state.get("story_id"),
+        paragraph_id=state.get("paragraph_id"),
+        check="illustration",
+    )
+    return await sync_to_async(_save_illustration)(state, imageLC)
+
+
+# 기능: 생성된 캡션/라벨을 Illustration 테이블에 저장 (동기/비동기 공용)
+def _save_illustration(state: dict, imageLC: dict) -> dict:
     Illustration.objects.create(
         story_id=state.get("story_id"),
         paragraph_id=state.get("paragraph_id"),
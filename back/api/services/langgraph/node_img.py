@@ -1,11 +1,13 @@
 # 작성자 : 최재우
 # 작성일 : 2025-06-12
 import json
+from asgiref.sync import sync_to_async
 
 from api.models import Storyparagraph,Story
 from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.runnables import RunnableSequence  # 중요
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableSequence, RunnableLambda  # 중요
+from api.services import llm_gateway
 
 
 debug = True
@@ -35,6 +37,29 @@ def generate_image_unified(story_id, paragraph_id, check) -> dict:
             "positive_prompt": str
         }
     """
+    unified_prompt = _build_unified_prompt(story_id, paragraph_id, check)
+
+    try:
+        # 단일 API 호출로 통합 처리
+        content = llm_gateway.generate(unified_prompt, node="GenerateImage", temperature=IMAGE_TEMPERATURE)
+        return _parse_unified_response(content)
+    except Exception as e:
+        return _unified_fallback(e)
+
+
+# 기능: generate_image_unified의 비동기 버전 (DB 조회는 스레드에서, Gemini는 비동기 호출)
+async def agenerate_image_unified(story_id, paragraph_id, check) -> dict:
+    unified_prompt = await sync_to_async(_build_unified_prompt)(story_id, paragraph_id, check)
+
+    try:
+        content = await llm_gateway.agenerate(unified_prompt, node="GenerateImage", temperature=IMAGE_TEMPERATURE)
+        return _parse_unified_response(content)
+    except Exception as e:
+        return _unified_fallback(e)
+
+
+# 기능: 통합 이미지 프롬프트 구성 (DB에서 문단/캐릭터 조회)
+def _build_unified_prompt(story_id, paragraph_id, check) -> str:
     # DB에서 데이터 가져오기
     story = Story.objects.get(story_id=story_id)
     story_paragraph = Storyparagraph.objects.get(paragraph_id=paragraph_id)
@@ -87,50 +112,55 @@ def generate_image_unified(story_id, paragraph_id, check) -> dict:
     - JSON 형식을 엄격히 준수하세요
     - 한글과 영어를 적절히 혼용하세요
     """
-    
-    try:
-        # 단일 API 호출로 통합 처리
-        response = model.invoke(unified_prompt)
-        content = response.content
-        
-        if debug:
-            print(f"7. [UnifiedImageGeneration] 통합 응답: {content}")
-        
-        # JSON 추출 및 파싱
-        if "```json" in content:
-            json_start = content.find("```json") + 7
-            json_end = content.find("```", json_start)
-            json_content = content[json_start:json_end].strip()
-        else:
-            json_content = content
-            
-        result = json.loads(json_content)
-        
-        if debug:
-            print(f"[UnifiedImageGeneration] 파싱 결과: {result}")
-            
-        return result
-        
-    except Exception as e:
-        if debug:
-            print(f"[UnifiedImageGeneration] 오류: {e}")
-        # 기본값 반환
-        return {
-            "caption_text": "동화 장면",
-            "labels": ["장면", "배경"],
-            "positive_prompt": f"{POSITIVE_PROMPT_BASE}, digital art, detailed, high quality"
-        }
+    return unified_prompt
+
+
+# 기능: 통합 응답에서 JSON 추출 및 파싱 (실패 시 예외)
+def _parse_unified_response(content: str) -> dict:
+    if debug:
+        print(f"7. [UnifiedImageGeneration] 통합 응답: {content}")
+
+    # JSON 추출 및 파싱
+    if "```json" in content:
+        json_start = content.find("```json") + 7
+        json_end = content.find("```", json_start)
+        json_content = content[json_start:json_end].strip()
+    else:
+        json_content = content
+
+    result = json.loads(json_content)
+
+    if debug:
+        print(f"[UnifiedImageGeneration] 파싱 결과: {result}")
+
+    return result
+
+
+def _unified_fallback(error) -> dict:
+    if debug:
+        print(f"[UnifiedImageGeneration] 오류: {error}")
+    # 기본값 반환
+    return {
+        "caption_text": "동화 장면",
+        "labels": ["장면", "배경"],
+        "positive_prompt": f"{POSITIVE_PROMPT_BASE}, digital art, detailed, high quality"
+    }
 
 
 # ------------------------------------------------------------------------------------------
 # Gemini 초기화 및 모델 정의
 # ------------------------------------------------------------------------------------------
 
-model = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    temperature=0.7,
-    streaming=False
-)
+IMAGE_TEMPERATURE = 0.7
+
+
+# 레거시 체인(generate_image_LC)의 "prompt | model"에서 쓰는 LLM 단계 (llm_gateway 경유)
+def _invoke_gateway(prompt_value) -> AIMessage:
+    content = llm_gateway.generate(prompt_value.to_string(), node="GenerateImageLC", temperature=IMAGE_TEMPERATURE)
+    return AIMessage(content=content)
+
+
+model = RunnableLambda(_invoke_gateway)
 
 
 # ------------------------------------------------------------------------------------------
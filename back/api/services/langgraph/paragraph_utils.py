@@ -5,7 +5,10 @@
 
 from api.models import Storyparagraph, Paragraphversion, Paragraphqa
 from django.utils import timezone
-from api.services.relational_utils import index_paragraphs_to_db
+from asgiref.sync import sync_to_async
+from api.services.relational_utils import index_paragraph
+from tts.utils.qa_audio import prewarm_qa_audio
+from tts.utils.text_processor import presegment_in_background
 
 # ------------------------------------------------------------------------------------------
 # 초기화 및 설정
@@ -53,12 +56,16 @@ def save_paragraph(state: dict) -> dict:
         created_at=timezone.now()
     )
     
+    # 문맥 검색(BM25) 색인에 새 문단 반영
     try:
-        index_paragraphs_to_db(story_id, [paragraph_text])
+        index_paragraph(story_id, paragraph_text, paragraph_no=paragraph_no, paragraph_id=paragraph.paragraph_id)
     except Exception as e:
         if debug:
             print(f"[RelationalDB] 인덱싱 실패: {e}")
 
+    # 오디오북 생성 시 다시 분리하지 않도록 문장 분리 결과를 미리 캐시
+    presegment_in_background([paragraph_text])
+
     return {
         **state,
         "paragraph_id": paragraph.paragraph_id,
@@ -98,6 +105,12 @@ def update_paragraph_version(state: dict) -> dict:
         content_text=new_text,
         updated_at=timezone.now()
     )
+    try:
+        index_paragraph(state.get("story_id"), new_text, paragraph_id=paragraph_id)
+    except Exception as e:
+        if debug:
+            print(f"[RelationalDB] 인덱싱 실패: {e}")
+    presegment_in_background([new_text])
 
     if debug:
         print("\n" + "-"*40)
@@ -122,13 +135,14 @@ def update_paragraph_version(state: dict) -> dict:
 
 # 작성자: 최준혁
 # 기능: 사용자 입력과 패러그래프를 ParagraphQA에 저장 (대량 데이터 대비 bulk_create 지원)
+#       저장 직후 AI 질문 음성을 백그라운드에서 미리 합성
 # 마지막 수정일: 2025-06-16
 def save_qa(state: dict) -> dict:
     """
     개별 QA 저장 함수
     향후 대량 QA 생성 시 bulk_save_qa() 함수 사용 권장
     """
-    Paragraphqa.objects.create(
+    qa = Paragraphqa.objects.create(
         paragraph_id=state.get("paragraph_id"),
         story_id=state.get("story_id"),
         question_text=state.get("input"),
@@ -139,6 +153,13 @@ def save_qa(state: dict) -> dict:
 
     )
 
+    # AI 질문 음성을 백그라운드에서 미리 합성 (첫 재생 시 바로 캐시에서 응답)
+    try:
+        prewarm_qa_audio(qa.qa_id, state.get("question"))
+    except Exception as e:
+        if debug:
+            print(f"[SaveQA] 질문 음성 미리 합성 요청 실패: {e}")
+
     if debug:
         print("\n" + "-"*40)
         print("6. [SaveQA] DEBUG LOG")
@@ -160,6 +181,22 @@ def save_qa(state: dict) -> dict:
     }
 
 
+# ------------------------------------------------------------------------------------------
+# 비동기 그래프용 노드 (DB 작업을 스레드에서 실행)
+# ------------------------------------------------------------------------------------------
+
+async def asave_paragraph(state: dict) -> dict:
+    return await sync_to_async(save_paragraph)(state)
+
+
+async def aupdate_paragraph_version(state: dict) -> dict:
+    return await sync_to_async(update_paragraph_version)(state)
+
+
+async def asave_qa(state: dict) -> dict:
+    return await sync_to_async(save_qa)(state)
+
+
 # 작성자: 최준혁
 # 기능: 대량 QA 일괄 저장 함수 (향후 확장용)
 # 마지막 수정일: 2025-06-16
@@ -34,6 +34,96 @@ def extract_choice(text: str, paragraph_no: int = None) -> Tuple[str, str, List[
     return paragraph, question, choices
 
 
+# 작성자: 최준혁
+# 기능: 스트리밍 응답을 조각 단위로 받아 [문장]/[질문]/[행동]을 점진적으로 파싱
+#       feed()/close()는 이벤트 목록을 반환합니다.
+#         {"type": "token", "text": ...}      [문장] 본문 조각 (도착하는 대로)
+#         {"type": "question", "text": ...}   [질문] 구역이 닫히면 한 번
+#         {"type": "choices", "choices": [...]} [행동] 구역이 닫히면 (응답 끝) 한 번
+#       최종 저장은 전체 텍스트에 extract_choice를 적용한 결과를 사용합니다.
+# 마지막 수정일: 2025-06-27
+class StreamingChoiceParser:
+    MARKERS = {"[문장]": "sentence", "[질문]": "question", "[행동]": "choices"}
+
+    def __init__(self, paragraph_no: int = None):
+        # 에필로그(10번째)는 [문장] 표지 없이 바로 본문이 올 수 있음
+        self.section = "sentence" if paragraph_no == 10 else None
+        self.text = ""             # 지금까지 받은 전체 응답
+        self._buffer = ""          # 아직 내보내지 않은 현재 구역 텍스트
+        self._seen_marker = False
+        self._sentence_started = False
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        self._buffer += chunk
+        return self._drain(final=False)
+
+    def close(self) -> list:
+        return self._drain(final=True)
+
+    def _next_marker(self):
+        found = None
+        for marker in self.MARKERS:
+            idx = self._buffer.find(marker)
+            if idx != -1 and (found is None or idx < found[0]):
+                found = (idx, marker)
+        return found
+
+    def _holdback(self) -> int:
+        # 조각 경계에서 잘린 표지("[질" 등)나 끝 공백은 다음 조각을 볼 때까지 보류
+        buf = self._buffer
+        partial = 0
+        for size in range(min(len(buf), 3), 0, -1):
+            if any(marker.startswith(buf[-size:]) for marker in self.MARKERS):
+                partial = size
+                break
+        rest = buf[:len(buf) - partial]
+        return len(buf) - len(rest.rstrip())
+
+    def _emit_tokens(self, text: str) -> list:
+        if not self._sentence_started:
+            text = text.lstrip()
+        if not text:
+            return []
+        self._sentence_started = True
+        return [{"type": "token", "text": text}]
+
+    def _close_section(self, text: str) -> list:
+        if self.section == "sentence":
+            return self._emit_tokens(text.rstrip())
+        if self.section == "question":
+            return [{"type": "question", "text": text.strip()}]
+        if self.section == "choices":
+            choices = [line.strip("-•*●· ") for line in text.strip().split("\n") if line.strip()]
+            return [{"type": "choices", "choices": choices}]
+        return []
+
+    def _drain(self, final: bool) -> list:
+        events = []
+        found = self._next_marker()
+        while found:
+            idx, marker = found
+            before = self._buffer[:idx]
+            self._buffer = self._buffer[idx + len(marker):]
+            events += self._close_section(before)
+            self.section = self.MARKERS[marker]
+            self._seen_marker = True
+            found = self._next_marker()
+
+        if final:
+            if self.section is None and not self._seen_marker:
+                # 표지가 전혀 없으면 전체를 문장으로 취급 (extract_choice와 동일)
+                self.section = "sentence"
+            events += self._close_section(self._buffer)
+            self._buffer = ""
+        elif self.section == "sentence":
+            ready = len(self._buffer) - self._holdback()
+            if ready > 0:
+                events += self._emit_tokens(self._buffer[:ready])
+                self._buffer = self._buffer[ready:]
+        return events
+
+
 
 # ------------------------------------------------------------------------------------------
 # 텍스트 정규화
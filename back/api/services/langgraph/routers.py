@@ -3,7 +3,9 @@
 # 작성일: 2025-06-03
 # 마지막 수정일: 2025-06-15
 from typing import Literal
-from api.models import Story
+from asgiref.sync import sync_to_async
+from .story_tasks import get_story_task_runner, wait_story_marker
+from .story_cursor import load_story_cursor
 
 # ------------------------------------------------------------------------------------------
 # 흐름 분기 관련 함수
@@ -50,21 +52,51 @@ def finalize_router(state: dict) -> str:
 
 
 # 작성자: 최준혁
-# 기능: 시작 노드, Story 객체 캐싱으로 DB 중복 조회 방지
-# 마지막 수정일: 2025-06-16
+# 기능: 시작 노드, Story 객체와 동화 커서(다음 문단 번호, 최근 문단, 등장인물)를 한 번만 조회해 state에 저장
+#       이전 턴의 등장인물/요약 갱신(백그라운드 후처리)이 끝난 뒤 Story를 읽습니다.
+# 마지막 수정일: 2025-07-01
 def passthrough_start(state: dict) -> dict:    
+    _wait_story_update(state.get("story_id"))
+    loaded = _load_story_state(state)
+    if _other_process_pending(loaded):
+        _wait_story_marker(state.get("story_id"))
+        loaded = _load_story_state(state)
+    return loaded
+
+
+def _wait_story_update(story_id):
+    if not story_id:
+        return
+    if not get_story_task_runner().wait_story_updated(story_id):
+        print(f"[Start] 이전 턴 후처리 대기 시간 초과 (story_id={story_id}), 현재 저장된 요약으로 진행합니다.")
+
+
+def _other_process_pending(state: dict) -> bool:
+    # 이 프로세스의 후처리는 이미 기다렸으므로, 남은 표시는 다른 프로세스에서 실행 중인 후처리
+    story = state.get("story")
+    return bool(story is not None and getattr(story, "post_process_pending", False))
+
+
+def _wait_story_marker(story_id):
+    print(f"[Start] 다른 프로세스의 후처리를 기다립니다. (story_id={story_id})")
+    if not wait_story_marker(story_id):
+        print(f"[Start] 이전 턴 후처리 대기 시간 초과 (story_id={story_id}), 현재 저장된 요약으로 진행합니다.")
+
+
+def _load_story_state(state: dict) -> dict:
     story_id = state.get("story_id")
     if not story_id:
         return state
 
     try:
-        # Story 객체를 한 번만 조회하여 state에 저장 (캐싱)
-        from api.models import Story
-        story = Story.objects.get(story_id=story_id)
-        
+        story, cursor = load_story_cursor(story_id)
+        if story is None:
+            print(f"[Start] Story 객체 로드 실패: story_id {story_id} 없음")
+            return state
+
+        cached_state = {**state, "story": story, "cursor": cursor}  # Story 객체/커서 캐싱
+
         # 기존 summary_4step이 있으면 state에 주입
-        cached_state = {**state, "story": story}  # Story 객체 캐싱
-        
         if story.summary_4step:
             print("[Start] DB 요약을 state에 주입합니다.")
             cached_state["story_plan"] = story.summary_4step.strip().splitlines()
@@ -74,3 +106,14 @@ def passthrough_start(state: dict) -> dict:
     except Exception as e:
         print(f"[Start] Story 객체 로드 실패: {e}")
         return state
+
+
+# 기능: passthrough_start의 비동기 버전
+#       대기는 공용 DB 스레드를 막지 않도록 별도 스레드에서, Story 조회는 sync_to_async로 실행
+async def apassthrough_start(state: dict) -> dict:
+    await sync_to_async(_wait_story_update, thread_sensitive=False)(state.get("story_id"))
+    loaded = await sync_to_async(_load_story_state)(state)
+    if _other_process_pending(loaded):
+        await sync_to_async(_wait_story_marker, thread_sensitive=False)(state.get("story_id"))
+        loaded = await sync_to_async(_load_story_state)(state)
+    return loaded
@@ -0,0 +1,59 @@
+# 동화 커서 (턴 시작 시 한 번 읽는 동화 진행 상태)
+# 작성자: 최준혁
+# 작성일: 2025-07-01
+#
+# Start 노드에서 Story와 최근 문단을 한 번에 읽어 state["cursor"]로 넘깁니다.
+# RetrieveContext / GenerateParagraph는 다음 문단 번호와 문맥을 커서에서 가져오므로
+# 한 턴의 DB 조회 수가 문단 수와 상관없이 일정합니다. (Story 1회 + 문단 1회)
+#   cursor = {
+#       "next_paragraph_no": 다음에 생성할 문단 번호,
+#       "paragraphs": [(paragraph_no, content_text), ...]  최근 문단 (오래된 순),
+#       "complete": paragraphs가 동화의 모든 문단인지 (문맥 검색 색인을 이 내용으로 맞춰도 되는지),
+#       "characters": 등장인물 줄 목록,
+#   }
+# Story에는 다른 프로세스의 후처리가 아직 끝나지 않았는지(post_process_pending)를 같은 쿼리로 붙여 읽습니다.
+
+from decouple import config
+from django.db.models import Exists, OuterRef
+from api.models import Story, Storyparagraph
+from .story_tasks import pending_marker_filter
+
+STORY_CURSOR_PARAGRAPHS = config('STORY_CURSOR_PARAGRAPHS', default=10, cast=int)   # 커서에 담을 최근 문단 수 (동화 최대 길이)
+
+
+def load_story_cursor(story_id) -> tuple[object | None, dict | None]:
+    """
+    (Story, 커서)를 반환합니다. 동화가 없으면 (None, None)
+    """
+    story = (
+        Story.objects
+        .filter(story_id=story_id)
+        .annotate(post_process_pending=Exists(pending_marker_filter(OuterRef("story_id"))))
+        .first()
+    )
+    if story is None:
+        return None, None
+
+    recent = list(
+        Storyparagraph.objects
+        .filter(story_id=story_id)
+        .order_by("-paragraph_no")
+        .values_list("paragraph_no", "content_text")[:STORY_CURSOR_PARAGRAPHS]
+    )
+    recent.reverse()
+
+    return story, {
+        "next_paragraph_no": (recent[-1][0] + 1) if recent else 1,
+        "paragraphs": recent,
+        "complete": len(recent) < STORY_CURSOR_PARAGRAPHS or recent[0][0] == 1,
+        "characters": story.characters.splitlines() if story.characters else [],
+    }
+
+
+def cursor_paragraphs(cursor: dict | None) -> list[tuple[int, str]] | None:
+    """
+    커서가 동화의 모든 문단을 담고 있으면 [(paragraph_no, text)] (오래된 순), 아니면 None (DB 조회 필요)
+    """
+    if not cursor or not cursor.get("complete"):
+        return None
+    return cursor["paragraphs"]
@@ -3,17 +3,26 @@
 # 작성일: 2025-06-03
 # 마지막 수정일: 2025-06-15 (리팩토링 완료)
 
-from langgraph.graph import StateGraph
+from functools import wraps
+from django.db import connection
+from langgraph.graph import StateGraph, START
 from typing import TypedDict, Literal, Annotated
 
 # 리팩토링된 모듈들 import
-from .core_nodes import generate_story_plan, retrieve_context, generate_paragraph
+from .core_nodes import (
+    generate_story_plan, retrieve_context, generate_paragraph,
+    agenerate_story_plan, aretrieve_context, agenerate_paragraph
+)
 from .summary_utils import detect_and_update_story
-from .paragraph_utils import save_paragraph, update_paragraph_version, save_qa
+from .paragraph_utils import (
+    save_paragraph, update_paragraph_version, save_qa,
+    asave_paragraph, aupdate_paragraph_version, asave_qa
+)
 from .image_utils import generate_image
 from .finalize_utils import finalize_story_output
+from .story_tasks import get_story_task_runner
 from .routers import (
-    summary_router, mode_router, finalize_router, passthrough_start
+    summary_router, mode_router, finalize_router, passthrough_start, apassthrough_start
 )
 # from api.services.langgraph.image_utils import generate_image_LC
 
@@ -27,6 +36,7 @@ class StoryState(TypedDict, total=False):
     user_id: Annotated[int, "static"]         # 사용자 ID (고정값으로 반복 허용)
     story_id: Annotated[int, "static"]        # 대상 동화 ID (고정값으로 반복 허용)
     story: Annotated[object, "static"]        # 캐시된 Story 모델 객체 (DB 중복 조회 방지)
+    cursor: Annotated[dict, "static"]         # 동화 커서: 다음 문단 번호, 최근 문단, 등장인물 (story_cursor.py)
     age: Annotated[int, "static"]             # 사용자 연령 (고정값으로 반복 허용)
     paragraph_id: int                         # 단락 ID (수정 시 필요)
     paragraph_no: int                         # 단락 번호
@@ -41,46 +51,74 @@ class StoryState(TypedDict, total=False):
     context: str                              # 벡터 DB에서 불러온 문맥 (RetrieveContext)
     question: str                             # 챗봇 질문
     choices: str                              # 선택지
+    stream: bool                              # 문단을 스트리밍 이벤트로 내보낼지 여부 (story_stream.py)
 
 
 # 작성자: 최준혁
 # 기능: LangGraph 플로우 정의 함수
-# 마지막 수정일: 2025-06-15 (리팩토링 완료)
+#       문단 생성/저장/QA 저장까지만 응답 경로에서 실행하고,
+#       등장인물·요약 갱신, 삽화, 마무리는 story_post_flow()로 백그라운드에서 실행합니다.
+# 마지막 수정일: 2025-06-28
 def story_flow():
+    return _build_story_graph({
+        "Start": passthrough_start,
+        "GenerateStoryPlan": generate_story_plan,
+        "RetrieveContext": retrieve_context,
+        "GenerateParagraph": generate_paragraph,
+        "SaveParagraph": save_paragraph,
+        "UpdateParagraphVersion": update_paragraph_version,
+        "SaveQA": save_qa,
+        "SchedulePostProcess": schedule_post_process,
+    })
+
+
+# 기능: 비동기 노드로 구성된 같은 플로우 (ASGI 뷰에서 await flow.ainvoke(state)로 실행)
+#       Gemini 호출은 비동기 클라이언트로, DB 작업은 sync_to_async로 실행되어
+#       한 프로세스에서 여러 이야기 생성 요청을 동시에 처리할 수 있습니다.
+#       후처리는 동기 플로우와 같은 백그라운드 실행기를 사용합니다.
+def story_flow_async():
+    return _build_story_graph({
+        "Start": apassthrough_start,
+        "GenerateStoryPlan": agenerate_story_plan,
+        "RetrieveContext": aretrieve_context,
+        "GenerateParagraph": agenerate_paragraph,
+        "SaveParagraph": asave_paragraph,
+        "UpdateParagraphVersion": aupdate_paragraph_version,
+        "SaveQA": asave_qa,
+        "SchedulePostProcess": schedule_post_process,
+    })
+
+
+# 기능: 노드 구현(동기/비동기)을 받아 그래프를 구성
+def _build_story_graph(nodes: dict):
     graph = StateGraph(StoryState)
 
     # 노드 등록
     # ------------------------------------------------------------------------
 
     # 시작 노드
-    graph.add_node("Start", passthrough_start)
+    graph.add_node("Start", nodes["Start"])
 
     # 1. 기승전결 요약 생성
-    graph.add_node("GenerateStoryPlan", generate_story_plan)
+    graph.add_node("GenerateStoryPlan", nodes["GenerateStoryPlan"])
 
     # 2. 이전 문단 기억 
-    graph.add_node("RetrieveContext", retrieve_context)
+    graph.add_node("RetrieveContext", nodes["RetrieveContext"])
 
     # 3. 문단 생성
-    graph.add_node("GenerateParagraph", generate_paragraph)
+    graph.add_node("GenerateParagraph", nodes["GenerateParagraph"])
 
     # 4. 문단 저장 
-    graph.add_node("SaveParagraph", save_paragraph)
-
-    # 5. 변경 사항이 있을 시 Story 테이블의 characters와 summary_4step 업데이트
-    graph.add_node("DetectAndUpdateStory", detect_and_update_story)
+    graph.add_node("SaveParagraph", nodes["SaveParagraph"])
 
-    # 6. 문단 수정
-    graph.add_node("UpdateParagraphVersion", update_paragraph_version)
+    # 5. 문단 수정
+    graph.add_node("UpdateParagraphVersion", nodes["UpdateParagraphVersion"])
 
-    # 7. QA에 기록
-    graph.add_node("SaveQA", save_qa)
+    # 6. QA에 기록
+    graph.add_node("SaveQA", nodes["SaveQA"])
 
-    # 8. 이미지 생성 
-    graph.add_node("GenerateImage", generate_image)
-
-    # 9. 동화 마무리
-    graph.add_node("FinalizeStory", finalize_story_output)
+    # 7. 후처리 예약 (story_post_flow)
+    graph.add_node("SchedulePostProcess", nodes["SchedulePostProcess"])
 
     # 엣지 설정
     # ------------------------------------------------------------------------
@@ -96,25 +134,104 @@ def story_flow():
     # 3. 문단 생성 or 문단 수정 분기
     graph.add_conditional_edges("GenerateParagraph", mode_router)
 
-    # 4. 문단 저장 후 등장인물/요약 업데이트
-    graph.add_edge("SaveParagraph", "DetectAndUpdateStory")
-    graph.add_edge("UpdateParagraphVersion", "DetectAndUpdateStory")  
+    # 4. 문단 저장 후 QA 저장
+    graph.add_edge("SaveParagraph", "SaveQA")
+    graph.add_edge("UpdateParagraphVersion", "SaveQA")
 
-    # 5. Detect 후 QA 저장
-    graph.add_edge("DetectAndUpdateStory", "SaveQA")
+    # 5. 후처리를 예약하고 바로 응답
+    graph.add_edge("SaveQA", "SchedulePostProcess")
+    graph.set_finish_point("SchedulePostProcess")
 
-    # 6. 이미지 생성 판단
-    graph.add_edge("SaveQA", "GenerateImage")
+    return graph.compile()
+
+
+# 기능: 병렬 분기 결과 병합용 reducer. 같은 키에 값이 동시에 들어오면 None이 아닌 최신 값을 유지
+def keep_latest(current, update):
+    return current if update is None else update
+
+
+# 작성자: 최준혁
+# 기능: 후처리 플로우 상태. 병렬 분기(DetectAndUpdateStory / GenerateImage)가 쓰는 키는 reducer로 병합
+# 마지막 수정일: 2025-06-28
+class StoryPostState(StoryState, total=False):
+    characters: Annotated[list[str], keep_latest]   # 갱신된 등장인물 목록 (DetectAndUpdateStory)
+    caption_text: Annotated[str, keep_latest]       # 삽화 캡션 (GenerateImage)
+    labels: Annotated[object, keep_latest]          # 삽화 라벨 (GenerateImage)
+
+
+# 작성자: 최준혁
+# 기능: 문단 저장 이후의 후처리 플로우 (story_tasks 실행기에서 동화별 순서대로 실행)
+#       등장인물/요약 갱신과 삽화 프롬프트 생성은 서로 독립적이므로 병렬로 실행하고,
+#       둘 다 끝난 뒤(JoinPostProcess) 마무리 여부를 판단합니다.
+#       삽화 프롬프트는 이번 턴 갱신 전의 등장인물 목록을 사용합니다. (문단 본문에는 새 인물 포함)
+# 마지막 수정일: 2025-06-28
+def story_post_flow():
+    graph = StateGraph(StoryPostState)
 
-    # 7. 이미지 생성 후 종료 판단
-    graph.add_conditional_edges("GenerateImage", finalize_router)
+    # 1-a. 변경 사항이 있을 시 Story 테이블의 characters와 summary_4step 업데이트
+    graph.add_node("DetectAndUpdateStory", _closing_db(detect_and_update_story))
 
-    # 8. 동화 마무리
+    # 1-b. 갱신 완료 알림 (다음 턴의 Start 대기 해제)
+    graph.add_node("StoryUpdated", mark_story_updated)
+
+    # 2. 이미지 생성 (1-a와 병렬)
+    graph.add_node("GenerateImage", _closing_db(generate_image))
+
+    # 3. 두 분기 합류
+    graph.add_node("JoinPostProcess", join_post_process)
+
+    # 4. 동화 마무리
+    graph.add_node("FinalizeStory", finalize_story_output)
+
+    graph.add_edge(START, "DetectAndUpdateStory")
+    graph.add_edge(START, "GenerateImage")
+    graph.add_edge("DetectAndUpdateStory", "StoryUpdated")
+    graph.add_edge(["StoryUpdated", "GenerateImage"], "JoinPostProcess")
+    graph.add_conditional_edges("JoinPostProcess", finalize_router)
     graph.set_finish_point("FinalizeStory")
 
     return graph.compile()
 
 
+# 기능: 병렬 분기 노드는 LangGraph 작업 스레드에서 실행되므로 끝나면 그 스레드의 DB 연결을 닫음
+def _closing_db(node):
+    @wraps(node)
+    def run(state: dict) -> dict:
+        try:
+            return node(state)
+        finally:
+            connection.close()
+    return run
+
+
+_post_flow = None
+
+
+def _run_post_flow(state: dict) -> dict:
+    global _post_flow
+    if _post_flow is None:
+        _post_flow = story_post_flow()
+    return _post_flow.invoke(state)
+
+
+# 기능: 후처리 플로우를 동화별 작업 큐에 넣는 노드 (기다리지 않음)
+def schedule_post_process(state: dict) -> dict:
+    post_state = {k: v for k, v in state.items() if k != "stream"}
+    get_story_task_runner().submit(state.get("story_id"), _run_post_flow, post_state)
+    return {}
+
+
+# 기능: 등장인물/요약 갱신이 끝났음을 실행기에 알리는 노드
+def mark_story_updated(state: dict) -> dict:
+    get_story_task_runner().story_updated(state.get("story_id"))
+    return {}
+
+
+# 기능: 병렬 분기 합류 노드 (두 분기가 모두 끝나야 실행됨)
+def join_post_process(state: dict) -> dict:
+    return {}
+
+
 # 플로우 다이어그램:
 # Start
 #   ↓
@@ -130,12 +247,15 @@ def story_flow():
 #         ↓
 # SaveParagraph / UpdateParagraphVersion
 #   ↓
-# DetectAndUpdateStory
-#   ↓
 # SaveQA
 #   ↓
-# GenerateImage
-#    ├── paragraph_no < 10 → __end__
-#    └── paragraph_no ≥ 10 → FinalizeStory
-#                              ↓
-#                            [END]
+# SchedulePostProcess → [응답]
+#
+# 백그라운드 (story_post_flow, 같은 동화는 순서대로):
+#        ┌── DetectAndUpdateStory → StoryUpdated  (다음 턴의 Start는 여기까지만 기다림)
+# START ─┤                                      ├─→ JoinPostProcess
+#        └── GenerateImage ──────────────────────┘        │
+#                                     ├── paragraph_no < 10 → __end__
+#                                     └── paragraph_no ≥ 10 → FinalizeStory
+#                                                               ↓
+#                                                             [END]
@@ -0,0 +1,98 @@
+# 동화 문단 스트리밍 실행기
+# 작성자: 최준혁
+# 작성일: 2025-06-27
+#
+# 그래프를 백그라운드 스레드에서 stream_mode=["custom", "updates"]로 실행하고
+# 이벤트를 큐로 넘겨 받는 쪽(SSE 응답)이 도착하는 대로 내보낼 수 있게 합니다.
+#   token / question / choices : GenerateParagraph가 Gemini 스트림을 파싱하며 내보내는 이벤트
+#   saved                      : 문단 저장(SaveParagraph / UpdateParagraphVersion) 완료 - 문단만 저장된 상태
+#   done                       : SaveQA, SchedulePostProcess까지 끝남 (마지막 이벤트)
+#                                qa_saved / post_process_scheduled로 각각 실행되었는지, 실패했으면 error도 함께
+#   error                      : 문단 저장 전 실패 (마지막 이벤트)
+# 클라이언트 연결이 끊겨도 그래프는 스레드에서 끝까지 실행됩니다.
+# 등장인물/요약 갱신, 이미지, 마무리는 이 그래프가 아니라 SchedulePostProcess가 동화별 실행기에 넘긴
+# story_post_flow에서 응답과 별개로 실행되므로 이벤트로 알리지 않습니다. (story_tasks.py)
+
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from decouple import config
+from django.db import close_old_connections
+
+STORY_STREAM_WORKERS = config('STORY_STREAM_WORKERS', default=8, cast=int)   # 동시에 실행할 스트리밍 그래프 수
+SAVE_NODES = ("SaveParagraph", "UpdateParagraphVersion")
+TERMINAL_EVENTS = ("done", "error")
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=STORY_STREAM_WORKERS, thread_name_prefix="story-stream")
+    return _executor
+
+
+def _saved_event(state: dict) -> dict:
+    return {
+        "type": "saved",
+        "story_id": state.get("story_id"),
+        "paragraph": state.get("paragraph_text"),
+        "question": state.get("question"),
+        "choices": state.get("choices"),
+        "paragraph_no": state.get("paragraph_no"),
+        "version_no": state.get("version_no"),
+        "paragraph_id": state.get("paragraph_id"),
+    }
+
+
+def _run_flow(flow, initial_state: dict, events: queue.Queue):
+    state = dict(initial_state, stream=True)
+    saved = False
+    done = {"type": "done", "qa_saved": False, "post_process_scheduled": False}
+    try:
+        for mode, payload in flow.stream(state, stream_mode=["custom", "updates"]):
+            if mode == "custom":
+                events.put(payload)
+                continue
+            for node, update in payload.items():
+                if update:
+                    state.update(update)
+                if node in SAVE_NODES:
+                    saved = True
+                    events.put(_saved_event(state))
+                elif node == "SaveQA":
+                    done["qa_saved"] = True
+                elif node == "SchedulePostProcess":
+                    done["post_process_scheduled"] = True
+        if not saved:
+            # 이미 완성된 동화 등 문단 저장 없이 끝난 경우
+            events.put(_saved_event(state))
+        events.put(done)
+    except Exception as e:
+        traceback.print_exc()
+        if not saved:
+            events.put({"type": "error", "error": str(e)})
+        else:
+            print(f"[StoryStream] 문단 저장 이후 노드 실패: {e}")
+            events.put(dict(done, error=str(e)))
+    finally:
+        events.put(None)
+        close_old_connections()
+
+
+def stream_story_turn(flow, initial_state: dict):
+    """
+    그래프를 백그라운드에서 실행하고 이벤트(dict)를 차례로 내보내는 제너레이터.
+    done 또는 error 이벤트를 마지막으로 끝납니다.
+    """
+    events = queue.Queue()
+    _get_executor().submit(_run_flow, flow, initial_state, events)
+
+    while True:
+        event = events.get()
+        if event is None:
+            return
+        yield event
+        if event["type"] in TERMINAL_EVENTS:
+            return
@@ -0,0 +1,175 @@
+# 동화별 후처리 작업 실행기
+# 작성자: 최준혁
+# 작성일: 2025-06-28
+#
+# 문단 저장 이후의 작업(등장인물/요약 갱신, 삽화 프롬프트, 마무리)을 응답과 분리해 백그라운드에서 실행합니다.
+# - 같은 story_id의 작업은 제출 순서대로 하나씩 실행 (동화 간에는 병렬)
+# - 다음 턴은 이전 턴의 등장인물/요약 갱신이 끝날 때까지만 기다립니다. (story_updated 호출 시점)
+#   삽화 생성 등 나머지 단계는 기다리지 않습니다.
+# - 실행기는 프로세스 안에만 있습니다. 동화별 순서 보장과 메모리 대기는 같은 프로세스 안에서만 유효하므로,
+#   갱신 대기 수를 DB(StoryPostProcess)에도 기록하고 다음 턴이 다른 프로세스로 가면 그 값을 보고 기다립니다.
+#   (다른 프로세스 사이에서는 갱신 단계만 순서가 맞춰지고, 삽화/마무리 단계는 겹칠 수 있습니다.)
+
+import time
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from decouple import config
+from django.db import close_old_connections, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from api.models import StoryPostProcess
+
+POST_PROCESS_WORKERS = config('POST_PROCESS_WORKERS', default=4, cast=int)               # 동시에 후처리할 동화 수
+POST_PROCESS_WAIT_TIMEOUT = config('POST_PROCESS_WAIT_TIMEOUT', default=60.0, cast=float)  # 다음 턴이 갱신을 기다리는 최대 시간(초)
+POST_PROCESS_MARKER_TTL = config('POST_PROCESS_MARKER_TTL', default=300, cast=int)      # 이 시간(초) 동안 바뀌지 않은 DB 표시는 무시 (프로세스 종료 등)
+POST_PROCESS_POLL_INTERVAL = 0.2   # 다른 프로세스의 갱신을 기다릴 때 DB 확인 주기(초)
+
+
+# ------------------------------------------------------------------------
+# DB 표시 (프로세스 간 공유)
+# ------------------------------------------------------------------------
+
+def _marker_cutoff():
+    return timezone.now() - timedelta(seconds=POST_PROCESS_MARKER_TTL)
+
+
+def pending_marker_filter(story_id):
+    """
+    갱신이 끝나지 않은 (오래되지 않은) 표시 QuerySet
+    """
+    return StoryPostProcess.objects.filter(story_id=story_id, pending_updates__gt=0, updated_at__gte=_marker_cutoff())
+
+
+def _mark_pending(story_id):
+    now = timezone.now()
+    try:
+        # 오래된 표시는 0부터 다시 셈
+        StoryPostProcess.objects.filter(story_id=story_id, updated_at__lt=_marker_cutoff()).update(pending_updates=0)
+        if not StoryPostProcess.objects.filter(story_id=story_id).update(
+            pending_updates=F("pending_updates") + 1, updated_at=now
+        ):
+            try:
+                StoryPostProcess.objects.create(story_id=story_id, pending_updates=1, updated_at=now)
+            except IntegrityError:
+                StoryPostProcess.objects.filter(story_id=story_id).update(
+                    pending_updates=F("pending_updates") + 1, updated_at=now
+                )
+    except Exception as e:
+        print(f"[StoryTasks] story_id={story_id} 후처리 표시 실패: {e}")
+
+
+def _mark_done(story_id):
+    try:
+        StoryPostProcess.objects.filter(story_id=story_id, pending_updates__gt=0).update(
+            pending_updates=F("pending_updates") - 1, updated_at=timezone.now()
+        )
+    except Exception as e:
+        print(f"[StoryTasks] story_id={story_id} 후처리 표시 해제 실패: {e}")
+
+
+def wait_story_marker(story_id, timeout=POST_PROCESS_WAIT_TIMEOUT) -> bool:
+    """
+    다른 프로세스에서 실행 중인 갱신이 끝날 때까지 DB 표시를 확인하며 기다립니다. 시간 초과 시 False.
+    """
+    deadline = time.monotonic() + timeout
+    while pending_marker_filter(story_id).exists():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(POST_PROCESS_POLL_INTERVAL)
+    return True
+
+
+class StoryTaskRunner:
+    """
+    story_id별 FIFO 작업 큐. submit()은 Future를 반환합니다.
+    """
+    def __init__(self, max_workers=POST_PROCESS_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._cond = threading.Condition()
+        self._queues = {}            # story_id -> deque[(fn, args, future)]
+        self._pending_updates = {}   # story_id -> 갱신이 끝나지 않은 작업 수
+        self._marked = {}            # story_id -> 실행 중인 작업이 갱신 완료를 알렸는지
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="story-post")
+        return self._executor
+
+    def submit(self, story_id, fn, *args) -> Future:
+        _mark_pending(story_id)   # 응답 전에 기록 → 다음 턴이 어느 프로세스로 가도 기다림
+        future = Future()
+        with self._cond:
+            self._pending_updates[story_id] = self._pending_updates.get(story_id, 0) + 1
+            start = story_id not in self._queues
+            if start:
+                self._queues[story_id] = deque()
+            self._queues[story_id].append((fn, args, future))
+            if start:
+                self._get_executor().submit(self._drain, story_id)
+        return future
+
+    def _drain(self, story_id):
+        while True:
+            with self._cond:
+                queue = self._queues[story_id]
+                if not queue:
+                    del self._queues[story_id]
+                    return
+                fn, args, future = queue.popleft()
+                self._marked[story_id] = False
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    traceback.print_exc()
+                    print(f"[StoryTasks] story_id={story_id} 후처리 실패: {e}")
+                    future.set_exception(e)
+                finally:
+                    close_old_connections()
+
+            # 갱신 완료를 알리지 못하고 끝난 작업(실패 포함)도 다음 턴을 막지 않도록 정리
+            self.story_updated(story_id)
+            with self._cond:
+                self._marked.pop(story_id, None)
+
+    def story_updated(self, story_id):
+        """
+        실행 중인 작업의 등장인물/요약 갱신이 끝났음을 알립니다. (작업당 한 번만 반영)
+        """
+        with self._cond:
+            if self._marked.get(story_id) is not False:
+                return
+            self._marked[story_id] = True
+            remaining = self._pending_updates.get(story_id, 0) - 1
+            if remaining > 0:
+                self._pending_updates[story_id] = remaining
+            else:
+                self._pending_updates.pop(story_id, None)
+            self._cond.notify_all()
+        _mark_done(story_id)
+
+    def wait_story_updated(self, story_id, timeout=POST_PROCESS_WAIT_TIMEOUT) -> bool:
+        """
+        이 프로세스에 제출된 작업들의 갱신 단계가 모두 끝날 때까지 기다립니다. 시간 초과 시 False.
+        (다른 프로세스의 작업은 wait_story_marker)
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: story_id not in self._pending_updates, timeout)
+
+    def pending(self, story_id) -> int:
+        with self._cond:
+            queued = len(self._queues.get(story_id, ()))
+            running = 1 if story_id in self._marked else 0
+            return queued + running
+
+
+_runner = StoryTaskRunner()
+
+
+def get_story_task_runner() -> StoryTaskRunner:
+    return _runner
@@ -4,13 +4,14 @@
 # 마지막 수정일: 2025-06-15
 
 import re
-import google.generativeai as genai
-import os
 from typing import List
 
+from asgiref.sync import sync_to_async
+
 from api.models import Story
+from api.services import llm_gateway
 from .character_utils import (
-    extract_and_describe, get_similar_name, is_duplicate_character
+    extract_and_describe, aextract_and_describe, get_similar_name, is_duplicate_character
 )
 from .parsing_utils import is_choice_only
 
@@ -20,40 +21,33 @@ from .parsing_utils import is_choice_only
 
 debug = True
 
-# Gemini 모델 초기화
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+# Gemini 호출은 llm_gateway를 거칩니다. (모델 재사용, 재시도, 속도 제한, 지표)
 
 # ------------------------------------------------------------------------------------------
 # 5. 스토리 업데이트 및 캐릭터 관리
 # ------------------------------------------------------------------------------------------
 # 작성자: 최준혁
-# 기능: 사용자 입력을 통해 Story 테이블의 characters와 summary_4step을 수정하는 메인 함수
-# 마지막 수정일: 2025-06-17 (10단계 요약 기반 업데이트 대응)
-def detect_and_update_story(state: dict) -> dict:
-
+# 기능: 업데이트 대상 Story와 기존 등장인물 정보 준비 (동기/비동기 공용)
+#       업데이트를 건너뛰는 경우 (반환할 변경분, None), 아니면 (None, 준비 정보)
+# 마지막 수정일: 2025-06-28
+def _prepare_story_update(state: dict) -> tuple[dict | None, dict | None]:
     # 맨 처음 문단은 generate_story_plan에서 생성되므로 스킵
     if state.get("paragraph_no", 1) == 1:
         print("[DetectUpdate] 첫 문단이므로 스킵")
-        return state
+        return {}, None
 
     story_id = state.get("story_id")
-    paragraph_text = state.get("paragraph_text", "")
     user_input = state.get("input", "")
-    age = state.get("age", 7)
-    mood = state.get("mood", "")
-    theme = state.get("theme", "")
-    paragraph_no = state.get("paragraph_no", 1)
 
     story = state.get("story") or Story.objects.filter(story_id=story_id).first()
     if not story:
         print(f"[DetectUpdate] story_id {story_id} not found.")
-        return state
+        return {}, None
 
     # 선택지 입력만 포함된 경우 스킵
     if is_choice_only(user_input):
         print("[DetectUpdate] 선택지 입력만 포함된 것으로 판단 → 캐릭터 및 요약 업데이트 스킵")
-        return {**state, "characters": story.characters.splitlines() if story.characters else []}
+        return {"characters": story.characters.splitlines() if story.characters else []}, None
 
     prev_character_lines = story.characters.splitlines() if story.characters else []
     prev_char_map = {
@@ -62,18 +56,23 @@ def detect_and_update_story(state: dict) -> dict:
     }
     protagonist_name = list(prev_char_map.keys())[0] if prev_char_map else None
 
-    # 통합 캐릭터 추출
-    unified_result = extract_and_describe(
-        text=paragraph_text + "\n" + user_input,
-        user_input=user_input,
-        known_names=list(prev_char_map.keys()),
-        age=age
-    )
-    new_characters_data = unified_result.get("new_characters", [])
+    return None, {
+        "story": story,
+        "prev_char_map": prev_char_map,
+        "protagonist_name": protagonist_name,
+        "extract_args": {
+            "text": state.get("paragraph_text", "") + "\n" + user_input,
+            "user_input": user_input,
+            "known_names": list(prev_char_map.keys()),
+            "age": state.get("age", 7),
+        },
+    }
 
-    if debug:
-        print(f"[DetectUpdate] New characters detected: {[c['name'] for c in new_characters_data]}")
 
+# 작성자: 최준혁
+# 기능: 새로 추출된 캐릭터를 기존 목록과 합치고 번호를 다시 매김
+# 마지막 수정일: 2025-06-17
+def _merge_characters(prev_char_map: dict, protagonist_name: str | None, new_characters_data: list) -> list[str]:
     updated_characters = []
     for char_data in new_characters_data:
         name, description = char_data["name"], char_data["description"]
@@ -100,55 +99,71 @@ def detect_and_update_story(state: dict) -> dict:
             seen_names.add(name)
             cleaned = re.sub(r"^\d+\.\s*", "", line)
             renumbered_characters.append(f"{len(renumbered_characters)+1}. {cleaned}")
-    story.characters = "\n".join(renumbered_characters)
+    return renumbered_characters
+
+
+# 작성자: 최준혁
+# 기능: 10단계 요약 수정 프롬프트 구성. 수정 조건이 아니면 None
+#       (조건: story_plan 존재 + 사용자 입력의 의미성 + paragraph_no < 10)
+# 마지막 수정일: 2025-06-17
+def _build_summary_contents(state: dict, story, new_characters_data: list) -> list | None:
+    user_input = state.get("input", "")
+    age = state.get("age", 7)
+    mood = state.get("mood", "")
+    theme = state.get("theme", "")
+    paragraph_no = state.get("paragraph_no", 1)
 
-    # 새 요약 흐름 생성 조건: story_plan 존재 + 사용자 입력의 의미성 + paragraph_no < 10
     existing_lines = story.summary_4step.strip().splitlines() if story.summary_4step else []
-    new_summary = None
-    if existing_lines and user_input.strip() and paragraph_no < 10 and len(existing_lines) == 10:
-        system_instruction = (
-            f"You are a professional Korean children's story writer for age {age}.\n"
-            "Your task is to revise the existing 10-step story outline in Korean.\n"
-            "You MUST reflect the latest [사용자 입력], but ONLY to the extent that it naturally fits the story's flow and tone.\n"
-            "If the input is extreme or disruptive, interpret it creatively and smoothly integrate it into the existing narrative.\n"
-            "- Keep the structure: 1. 기1, 2. 기2, ..., 10. 에필로그\n"
-            "- Preserve character traits and emotional flow.\n"
-            "- NEVER insert disruptive or inconsistent content.\n"
-            "**All output must be in Korean. Do NOT use English.**"
-        )
-
-        user_request = (
-            f"[기존 요약]\n" + "\n".join(existing_lines) + "\n\n"
-            f"[사용자 입력]\n{user_input}\n\n"
-            f"[현재 등장인물]: {', '.join([char['name'] for char in new_characters_data])}\n"
-            f"[분위기]: {mood} / [주제]: {theme}\n\n"
-            "→ 위 내용을 바탕으로 10단계 요약을 새롭게 수정해주세요.\n"
-            "- 각 줄은 '1. 기1: ...', '2. 기2: ...' 형식으로 시작하고, 한국어로만 작성하세요.\n"
-        )
-
-        contents = [
-            {'role': 'user', 'parts': [{'text': system_instruction}]},
-            {'role': 'model', 'parts': [{'text': "Understood."}]},
-            {'role': 'user', 'parts': [{'text': user_request}]}
-        ]
+    if not (existing_lines and user_input.strip() and paragraph_no < 10 and len(existing_lines) == 10):
+        return None
+
+    system_instruction = (
+        f"You are a professional Korean children's story writer for age {age}.\n"
+        "Your task is to revise the existing 10-step story outline in Korean.\n"
+        "You MUST reflect the latest [사용자 입력], but ONLY to the extent that it naturally fits the story's flow and tone.\n"
+        "If the input is extreme or disruptive, interpret it creatively and smoothly integrate it into the existing narrative.\n"
+        "- Keep the structure: 1. 기1, 2. 기2, ..., 10. 에필로그\n"
+        "- Preserve character traits and emotional flow.\n"
+        "- NEVER insert disruptive or inconsistent content.\n"
+        "**All output must be in Korean. Do NOT use English.**"
+    )
+
+    user_request = (
+        f"[기존 요약]\n" + "\n".join(existing_lines) + "\n\n"
+        f"[사용자 입력]\n{user_input}\n\n"
+        f"[현재 등장인물]: {', '.join([char['name'] for char in new_characters_data])}\n"
+        f"[분위기]: {mood} / [주제]: {theme}\n\n"
+        "→ 위 내용을 바탕으로 10단계 요약을 새롭게 수정해주세요.\n"
+        "- 각 줄은 '1. 기1: ...', '2. 기2: ...' 형식으로 시작하고, 한국어로만 작성하세요.\n"
+    )
+
+    return [
+        {'role': 'user', 'parts': [{'text': system_instruction}]},
+        {'role': 'model', 'parts': [{'text': "Understood."}]},
+        {'role': 'user', 'parts': [{'text': user_request}]}
+    ]
+
+
+def _parse_summary_response(response_text: str) -> list[str] | None:
+    raw = [line.strip() for line in response_text.strip().splitlines() if re.match(r"^\d+\. ", line)]
+    return raw if len(raw) == 10 else None
 
-        try:
-            response = model.generate_content(contents)
-            raw = [line.strip() for line in response.text.strip().splitlines() if re.match(r"^\d+\. ", line)]
-            if len(raw) == 10:
-                new_summary = raw
-                story.summary_4step = "\n".join(new_summary)
-        except Exception as e:
-            print(f"[DetectUpdate] 요약 업데이트 실패: {e}")
 
+# 작성자: 최준혁
+# 기능: 캐릭터/요약 변경 사항을 Story에 저장하고 새 state 반환 (동기/비동기 공용)
+# 마지막 수정일: 2025-06-17
+def _save_story_update(state: dict, story, renumbered_characters: list[str], new_summary: list[str] | None) -> dict:
+    story.characters = "\n".join(renumbered_characters)
+    if new_summary:
+        story.summary_4step = "\n".join(new_summary)
     story.save()
 
     if debug:
         print("\n" + "-" * 40)
         print("5. [DetectUpdate] DEBUG LOG")
         print("-" * 40)
-        print(f"Story ID     : {story_id}")
-        print(f"User Input   : {user_input}")
+        print(f"Story ID     : {state.get('story_id')}")
+        print(f"User Input   : {state.get('input', '')}")
         print(f"Characters   :")
         for c in renumbered_characters:
             print(f"  {c}")
@@ -158,13 +173,76 @@ def detect_and_update_story(state: dict) -> dict:
                 print(f"  {s}")
         print("-" * 40 + "\n")
 
-    new_state = {**state, "characters": renumbered_characters}
+    # 이미지 생성과 병렬로 실행되므로 바뀐 키만 반환 (story_post_flow)
+    new_state = {"characters": renumbered_characters}
     if new_summary and new_summary != state.get("story_plan"):
         new_state["story_plan"] = new_summary
 
     return new_state
 
 
+# 작성자: 최준혁
+# 기능: 사용자 입력을 통해 Story 테이블의 characters와 summary_4step을 수정하는 메인 함수
+# 마지막 수정일: 2025-06-17 (10단계 요약 기반 업데이트 대응)
+def detect_and_update_story(state: dict) -> dict:
+    skipped, prepared = _prepare_story_update(state)
+    if prepared is None:
+        return skipped
+
+    # 통합 캐릭터 추출
+    unified_result = extract_and_describe(**prepared["extract_args"])
+    new_characters_data = unified_result.get("new_characters", [])
+
+    if debug:
+        print(f"[DetectUpdate] New characters detected: {[c['name'] for c in new_characters_data]}")
+
+    renumbered_characters = _merge_characters(
+        prepared["prev_char_map"], prepared["protagonist_name"], new_characters_data
+    )
+
+    # 새 요약 흐름 생성
+    new_summary = None
+    contents = _build_summary_contents(state, prepared["story"], new_characters_data)
+    if contents:
+        try:
+            new_summary = _parse_summary_response(
+                llm_gateway.generate(contents, node="UpdateStorySummary", validate=_parse_summary_response)
+            )
+        except Exception as e:
+            print(f"[DetectUpdate] 요약 업데이트 실패: {e}")
+
+    return _save_story_update(state, prepared["story"], renumbered_characters, new_summary)
+
+
+# 기능: detect_and_update_story의 비동기 버전 (Gemini 비동기 호출, DB 조회/저장은 스레드에서 실행)
+async def adetect_and_update_story(state: dict) -> dict:
+    skipped, prepared = await sync_to_async(_prepare_story_update)(state)
+    if prepared is None:
+        return skipped
+
+    unified_result = await aextract_and_describe(**prepared["extract_args"])
+    new_characters_data = unified_result.get("new_characters", [])
+
+    if debug:
+        print(f"[DetectUpdate] New characters detected: {[c['name'] for c in new_characters_data]}")
+
+    renumbered_characters = _merge_characters(
+        prepared["prev_char_map"], prepared["protagonist_name"], new_characters_data
+    )
+
+    new_summary = None
+    contents = _build_summary_contents(state, prepared["story"], new_characters_data)
+    if contents:
+        try:
+            new_summary = _parse_summary_response(
+                await llm_gateway.agenerate(contents, node="UpdateStorySummary", validate=_parse_summary_response)
+            )
+        except Exception as e:
+            print(f"[DetectUpdate] 요약 업데이트 실패: {e}")
+
+    return await sync_to_async(_save_story_update)(state, prepared["story"], renumbered_characters, new_summary)
+
+
 # ------------------------------------------------------------------------------------------
 # 스토리 종료 관리
 # ------------------------------------------------------------------------------------------
@@ -0,0 +1,151 @@
+# LLM 응답 캐시
+# 작성자: 최준혁
+# 작성일: 2025-06-30
+#
+# 같은 프롬프트가 반복해서 Gemini로 가는 경우(같은 주제/분위기/이름으로 시작한 첫 문단의 10단계 요약,
+# 다시 실행된 마무리 노드 등)를 llm_gateway 앞에서 응답을 재사용해 줄입니다.
+# - 키: 정규화한 프롬프트(공백 정리) + 모델 + temperature 의 sha256
+# - 백엔드: sqlite (로컬 파일, 기본) / django (settings.CACHES, 여러 서버 공유) / none (끄기)
+# - TTL이 지난 항목은 무시하고, 최대 개수를 넘으면 가장 오래 사용하지 않은 항목부터 삭제 (sqlite)
+# - LLM_CACHE_SKIP_NODES에 적은 노드는 캐시하지 않음 (다시 생성 요청마다 새 문단이 필요한 GenerateParagraph 등)
+# - 응답을 파싱하는 노드는 validate로 확인한 응답만 저장하고, 확인에 실패한 캐시 항목은 지웁니다. (llm_gateway)
+# 스트리밍 호출(stream/astream)은 캐시하지 않습니다.
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from decouple import config, Csv
+
+LLM_CACHE_BACKEND = config('LLM_CACHE_BACKEND', default="sqlite")   # sqlite / django / none
+LLM_CACHE_PATH = config(
+    'LLM_CACHE_PATH',
+    default=os.path.join(os.path.dirname(__file__), '..', '..', 'cache', 'llm_cache.sqlite3'),  # 예: back/cache/
+)
+LLM_CACHE_ALIAS = config('LLM_CACHE_ALIAS', default="default")                 # django 백엔드가 사용할 CACHES 별칭
+LLM_CACHE_TTL = config('LLM_CACHE_TTL', default=7 * 24 * 3600, cast=int)       # 항목 유지 시간(초)
+LLM_CACHE_MAX_ENTRIES = config('LLM_CACHE_MAX_ENTRIES', default=5000, cast=int)  # sqlite 백엔드 최대 항목 수
+LLM_CACHE_SKIP_NODES = set(config('LLM_CACHE_SKIP_NODES', default="GenerateParagraph", cast=Csv()))
+
+
+def _normalize(contents):
+    """
+    문자열은 앞뒤 공백을 없애고 연속 공백/줄바꿈을 하나로 합칩니다. (리스트/딕셔너리는 재귀)
+    """
+    if isinstance(contents, str):
+        return " ".join(contents.split())
+    if isinstance(contents, dict):
+        return {key: _normalize(value) for key, value in contents.items()}
+    if isinstance(contents, (list, tuple)):
+        return [_normalize(item) for item in contents]
+    return contents
+
+
+def make_key(contents, model: str, temperature: float = None) -> str:
+    payload = json.dumps([model, temperature, _normalize(contents)], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCache:
+    """
+    로컬 파일 캐시. 스레드별 연결을 사용하고, 여러 프로세스(서버/TTS 워커)가 같은 파일을 공유해도 됩니다.
+    """
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = os.path.abspath(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, node TEXT, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key, value, node=None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, node, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, node, value, now, now),
+            )
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+
+class DjangoCache:
+    """
+    settings.CACHES의 캐시를 사용합니다. (Redis/Memcached 등으로 여러 서버가 공유, 크기 제한은 캐시 설정을 따름)
+    """
+    def __init__(self, alias=LLM_CACHE_ALIAS, ttl=LLM_CACHE_TTL):
+        from django.core.cache import caches
+        self._cache = caches[alias]
+        self.ttl = ttl
+
+    def get(self, key):
+        return self._cache.get(f"llm:{key}")
+
+    def set(self, key, value, node=None):
+        self._cache.set(f"llm:{key}", value, timeout=self.ttl)
+
+    def delete(self, key):
+        self._cache.delete(f"llm:{key}")
+
+
+BACKENDS = {
+    "sqlite": SQLiteCache,
+    "django": DjangoCache,
+}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    LLM_CACHE_BACKEND에 맞는 캐시를 반환합니다. (none이면 None)
+    """
+    global _cache
+    if LLM_CACHE_BACKEND == "none":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = BACKENDS[LLM_CACHE_BACKEND]()
+        return _cache
+
+
+def is_cacheable(node: str) -> bool:
+    return LLM_CACHE_BACKEND != "none" and node not in LLM_CACHE_SKIP_NODES
@@ -0,0 +1,548 @@
+# Gemini 호출 공용 게이트웨이
+# 작성자: 최준혁
+# 작성일: 2025-06-29
+#
+# 모든 LLM 호출(동화 생성 노드, 삽화 프롬프트, 음성 연출 분석)은 이 모듈을 거칩니다.
+# - genai.configure는 한 번만, GenerativeModel은 (모델, temperature)별로 재사용 (같은 클라이언트/연결 공유)
+# - 모델별 동시 호출 수 제한 (동기/비동기 호출이 같은 한도를 공유)
+# - 모델별 토큰 버킷으로 분당 요청 수 제한
+# - 429/5xx/타임아웃은 지터가 섞인 지수 백오프로 재시도, 호출 전체에 마감 시간(deadline) 적용
+# - 노드별 호출 수/재시도/실패, 지연(평균·p95), 입력/출력 토큰 수, 프롬프트 크기, 캐시 적중률 집계 (stats())
+# - generate/agenerate는 응답 캐시(llm_cache)를 먼저 확인합니다.
+#   응답을 파싱하는 호출은 validate를 넘겨, 파싱되는 응답만 캐시에 남깁니다.
+#   (잘린 JSON 등이 TTL 동안 계속 재사용되지 않도록, 재시도할 때는 refresh=True로 캐시를 건너뜀)
+
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+import google.generativeai as genai
+from decouple import config
+from api.services import llm_cache
+
+LLM_DEFAULT_MODEL = config('LLM_DEFAULT_MODEL', default="gemini-2.0-flash")
+LLM_MAX_CONCURRENCY = config('LLM_MAX_CONCURRENCY', default=8, cast=int)        # 모델별 동시 호출 수
+LLM_REQUESTS_PER_MINUTE = config('LLM_REQUESTS_PER_MINUTE', default=120, cast=float)  # 모델별 분당 요청 수 (0이면 제한 없음)
+LLM_BURST = config('LLM_BURST', default=10, cast=int)                           # 토큰 버킷 크기 (순간 허용 요청 수)
+LLM_TIMEOUT = config('LLM_TIMEOUT', default=60.0, cast=float)                   # 호출 마감 시간(초, 재시도 포함)
+LLM_MAX_RETRIES = config('LLM_MAX_RETRIES', default=2, cast=int)                # 호출별 재시도 횟수
+LLM_RETRY_BACKOFF = config('LLM_RETRY_BACKOFF', default=1.0, cast=float)        # 재시도 대기 기본값(초), 시도마다 2배 + 지터
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRY_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway",
+}
+
+genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+class LLMError(RuntimeError):
+    """
+    Gemini 호출 실패 (재시도 후에도 실패했거나 재시도할 수 없는 오류, 빈 응답)
+    """
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMDeadlineExceeded(LLMError):
+    """
+    호출 마감 시간 안에 응답을 받지 못함 (대기열/속도 제한 대기 포함)
+    """
+
+
+# ------------------------------------------------------------------------------------------
+# 모델 풀 / 동시 호출 제한 / 속도 제한
+# ------------------------------------------------------------------------------------------
+
+_models = {}
+_models_lock = threading.Lock()
+_default_api_key = os.getenv("GOOGLE_API_KEY")
+
+
+def _bind_api_key(model, api_key):
+    # genai.configure는 프로세스 전역이므로, 다른 키(예: GEMINI_TTS_API_KEY)는 모델에 전용 클라이언트를 붙입니다.
+    from google.ai import generativelanguage as glm
+    model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+    model._async_client = glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+
+
+def get_model(model_name: str = LLM_DEFAULT_MODEL, temperature: float = None, api_key: str = None):
+    """
+    (모델, temperature, API 키)별로 하나씩 만든 GenerativeModel을 재사용합니다.
+    """
+    if api_key == _default_api_key:
+        api_key = None
+    key = (model_name, temperature, api_key)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            generation_config = {"temperature": temperature} if temperature is not None else None
+            model = genai.GenerativeModel(model_name, generation_config=generation_config)
+            if api_key:
+                _bind_api_key(model, api_key)
+            _models[key] = model
+        return model
+
+
+class ModelLimiter:
+    """
+    모델 하나의 동시 호출 슬롯 + 토큰 버킷. 스레드/이벤트 루프 어디서 호출해도 같은 한도를 공유합니다.
+    """
+    def __init__(self, max_concurrency, requests_per_minute, burst):
+        self.max_concurrency = max_concurrency
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """
+        슬롯과 토큰을 얻으면 0, 아니면 다시 시도할 때까지 기다릴 시간(초)
+        """
+        with self._cond:
+            if self._in_flight >= self.max_concurrency:
+                return 0.05
+            if self.rate > 0:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens < 1:
+                    return (1 - self._tokens) / self.rate
+                self._tokens -= 1
+            self._in_flight += 1
+            return 0
+
+    def acquire(self, deadline: float):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMDeadlineExceeded("LLM 호출 대기 중 마감 시간 초과 (동시 호출/속도 제한)")
+            with self._cond:
+                self._cond.wait(min(wait, remaining))
+
+    async def aacquire(self, deadline: float):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMDeadlineExceeded("LLM 호출 대기 중 마감 시간 초과 (동시 호출/속도 제한)")
+            await asyncio.sleep(min(wait, remaining))
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    @property
+    def in_flight(self) -> int:
+        with self._cond:
+            return self._in_flight
+
+
+_limiters = {}
+
+
+def get_limiter(model_name: str, api_key: str = None) -> ModelLimiter:
+    """
+    한도는 (모델, API 키)별로 적용합니다. (쿼터가 키/프로젝트 단위)
+    """
+    key = (model_name, None if api_key == _default_api_key else api_key)
+    with _models_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = ModelLimiter(LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_BURST)
+            _limiters[key] = limiter
+        return limiter
+
+
+# ------------------------------------------------------------------------------------------
+# 지표
+# ------------------------------------------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_node_stats = {}
+
+
+def _node_stat(node):
+    return _node_stats.setdefault(node, {
+        "calls": 0, "failed": 0, "retries": 0,
+        "prompt_tokens": 0, "output_tokens": 0,
+        "cache_hits": 0, "cache_misses": 0,
+        "prompts": 0, "prompt_chars": 0,
+        "latencies": deque(maxlen=500),
+    })
+
+
+def _record(node, latency, retries=0, failed=False, usage=None):
+    with _stats_lock:
+        stat = _node_stat(node)
+        stat["calls"] += 1
+        stat["retries"] += retries
+        stat["latencies"].append(latency)
+        if failed:
+            stat["failed"] += 1
+        if usage is not None:
+            stat["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+            stat["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+
+
+def _prompt_chars(contents) -> int:
+    if isinstance(contents, str):
+        return len(contents)
+    if isinstance(contents, dict):
+        return sum(_prompt_chars(value) for value in contents.values())
+    if isinstance(contents, (list, tuple)):
+        return sum(_prompt_chars(item) for item in contents)
+    return 0
+
+
+def _record_prompt(node, contents):
+    size = _prompt_chars(contents)
+    with _stats_lock:
+        stat = _node_stat(node)
+        stat["prompts"] += 1
+        stat["prompt_chars"] += size
+
+
+def _record_cache(node, hit):
+    with _stats_lock:
+        _node_stat(node)["cache_hits" if hit else "cache_misses"] += 1
+
+
+def stats() -> dict:
+    """
+    노드별 {calls, failed, retries, prompt_tokens, output_tokens, prompt_chars_avg,
+            cache_hits, cache_misses, cache_hit_rate, latency{avg, p95, max}}
+    calls는 실제 Gemini 호출 수 (캐시 적중 제외)
+    """
+    with _stats_lock:
+        snapshot = {node: {**stat, "latencies": sorted(stat["latencies"])} for node, stat in _node_stats.items()}
+
+    result = {}
+    for node, stat in snapshot.items():
+        values = stat.pop("latencies")
+        stat["latency"] = {
+            "avg": round(sum(values) / len(values), 3),
+            "p95": round(values[min(len(values) - 1, int(round(len(values) * 0.95)) - 1)], 3),
+            "max": round(values[-1], 3),
+        } if values else {}
+        prompts = stat.pop("prompts")
+        stat["prompt_chars_avg"] = round(stat.pop("prompt_chars") / prompts) if prompts else None
+        lookups = stat["cache_hits"] + stat["cache_misses"]
+        stat["cache_hit_rate"] = round(stat["cache_hits"] / lookups, 3) if lookups else None
+        result[node] = stat
+    return result
+
+
+def report_stats():
+    for node, stat in stats().items():
+        latency = stat["latency"]
+        print(
+            f"📊 [LLM] {node}: {stat['calls']}회 (실패 {stat['failed']}, 재시도 {stat['retries']}), "
+            f"평균 {latency.get('avg')}초 / p95 {latency.get('p95')}초, "
+            f"토큰 입력 {stat['prompt_tokens']} / 출력 {stat['output_tokens']}, 프롬프트 평균 {stat['prompt_chars_avg']}자"
+            + (f", 캐시 적중 {stat['cache_hits']}회 ({round(stat['cache_hit_rate'] * 100, 1)}%)"
+               if stat["cache_hit_rate"] is not None else "")
+        )
+
+
+# ------------------------------------------------------------------------------------------
+# 재시도 판단
+# ------------------------------------------------------------------------------------------
+
+def _status_code(error):
+    code = getattr(error, "code", None)
+    if callable(code):  # grpc 오류는 code()가 메서드
+        return None
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error) -> bool:
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if _status_code(error) in RETRY_STATUS:
+        return True
+    return type(error).__name__ in RETRY_ERROR_NAMES
+
+
+def _retry_delay(attempt: int) -> float:
+    # full jitter: 0 ~ backoff * 2^(attempt-1)
+    return random.uniform(0, LLM_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+
+def _response_text(response) -> str:
+    try:
+        return response.text
+    except ValueError as e:
+        # 안전 필터 등으로 후보가 비어 있으면 .text 접근 시 ValueError
+        raise LLMError(f"Gemini 응답이 비어 있습니다: {e}") from e
+
+
+def _chunk_text(chunk) -> str:
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+def _retry_or_raise(node, error, attempt, started, deadline, emitted=False) -> float:
+    """
+    재시도할 수 있으면 기다릴 시간(초)을 반환하고, 아니면 실패를 기록하고 LLMError를 발생시킵니다.
+    """
+    status_code = _status_code(error)
+    if isinstance(error, LLMError):
+        failure = error
+    elif emitted:
+        failure = LLMError(f"[{node}] Gemini 스트리밍 중단: {error}", status_code)
+    elif not _is_retryable(error) or attempt > LLM_MAX_RETRIES:
+        failure = LLMError(f"[{node}] Gemini 호출 실패: {error}", status_code)
+    else:
+        delay = _retry_delay(attempt)
+        if time.monotonic() + delay < deadline:
+            print(f"⚠️ [{node}] Gemini 호출 실패: {error} → {round(delay, 2)}초 후 재시도 ({attempt}/{LLM_MAX_RETRIES})")
+            return delay
+        failure = LLMDeadlineExceeded(f"[{node}] 재시도 전 마감 시간 초과: {error}", status_code)
+
+    _record(node, time.monotonic() - started, attempt - 1, failed=True)
+    if failure is error:
+        raise failure
+    raise failure from error
+
+
+def _request_options(deadline: float) -> dict:
+    return {"timeout": max(deadline - time.monotonic(), 1.0)}
+
+
+# ------------------------------------------------------------------------------------------
+# 응답 캐시 (캐시 오류는 호출을 막지 않음)
+# ------------------------------------------------------------------------------------------
+
+def _is_valid(node, validate, text) -> bool:
+    """
+    validate(text)가 예외 없이 참 값을 반환하면 True. (validate가 없으면 항상 True)
+    """
+    if validate is None:
+        return True
+    try:
+        return bool(validate(text))
+    except Exception as e:
+        print(f"⚠️ [{node}] 응답 확인 실패, 캐시하지 않음: {e}")
+        return False
+
+
+def _cache_lookup(node, contents, model, temperature, validate=None, refresh=False):
+    """
+    (키, 캐시된 응답)을 반환합니다. 캐시하지 않는 노드면 (None, None)
+    refresh=True면 캐시를 읽지 않고 (키, None) — 새 응답으로 덮어씀
+    캐시된 응답이 validate를 통과하지 못하면 그 항목을 지우고 (키, None)
+    """
+    if not llm_cache.is_cacheable(node):
+        return None, None
+    key = llm_cache.make_key(contents, model, temperature)
+    if refresh:
+        return key, None
+    try:
+        cached = llm_cache.get_cache().get(key)
+    except Exception as e:
+        print(f"⚠️ [{node}] LLM 캐시 조회 실패: {e}")
+        return None, None
+    if cached is not None and not _is_valid(node, validate, cached):
+        _cache_delete(node, key)
+        cached = None
+    _record_cache(node, cached is not None)
+    return key, cached
+
+
+def _cache_store(node, key, text, validate=None):
+    if key is None or not _is_valid(node, validate, text):
+        return
+    try:
+        llm_cache.get_cache().set(key, text, node)
+    except Exception as e:
+        print(f"⚠️ [{node}] LLM 캐시 저장 실패: {e}")
+
+
+def _cache_delete(node, key):
+    try:
+        llm_cache.get_cache().delete(key)
+    except Exception as e:
+        print(f"⚠️ [{node}] LLM 캐시 삭제 실패: {e}")
+
+
+# ------------------------------------------------------------------------------------------
+# 호출
+# ------------------------------------------------------------------------------------------
+
+def generate(contents, node: str, model: str = LLM_DEFAULT_MODEL, temperature: float = None, timeout: float = None, api_key: str = None,
+             validate=None, refresh: bool = False) -> str:
+    """
+    Gemini를 호출해 응답 텍스트를 반환합니다. 실패 시 LLMError (마감 초과는 LLMDeadlineExceeded)
+    api_key를 주지 않으면 GOOGLE_API_KEY를 사용합니다.
+    같은 프롬프트의 응답이 캐시에 있으면 호출하지 않고 바로 반환합니다. (LLM_CACHE_SKIP_NODES 제외)
+    validate(text)가 주어지면 통과한 응답만 캐시에 저장합니다. (통과하지 못해도 응답은 그대로 반환)
+    refresh=True면 캐시를 읽지 않고 새로 호출합니다. (파싱 실패 후 재시도할 때)
+    """
+    _record_prompt(node, contents)
+    cache_key, cached = _cache_lookup(node, contents, model, temperature, validate, refresh)
+    if cached is not None:
+        return cached
+
+    started = time.monotonic()
+    deadline = started + (timeout or LLM_TIMEOUT)
+    limiter = get_limiter(model, api_key)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            limiter.acquire(deadline)
+        except LLMDeadlineExceeded as e:
+            _retry_or_raise(node, e, attempt, started, deadline)
+        try:
+            response = get_model(model, temperature, api_key).generate_content(contents, request_options=_request_options(deadline))
+            text = _response_text(response)
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        finally:
+            limiter.release()
+
+        if error is None:
+            _record(node, time.monotonic() - started, attempt - 1, usage=getattr(response, "usage_metadata", None))
+            _cache_store(node, cache_key, text, validate)
+            return text
+        time.sleep(_retry_or_raise(node, error, attempt, started, deadline))
+
+
+async def agenerate(contents, node: str, model: str = LLM_DEFAULT_MODEL, temperature: float = None, timeout: float = None, api_key: str = None,
+                    validate=None, refresh: bool = False) -> str:
+    """
+    generate의 비동기 버전
+    """
+    _record_prompt(node, contents)
+    cache_key, cached = _cache_lookup(node, contents, model, temperature, validate, refresh)
+    if cached is not None:
+        return cached
+
+    started = time.monotonic()
+    deadline = started + (timeout or LLM_TIMEOUT)
+    limiter = get_limiter(model, api_key)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            await limiter.aacquire(deadline)
+        except LLMDeadlineExceeded as e:
+            _retry_or_raise(node, e, attempt, started, deadline)
+        try:
+            response = await asyncio.wait_for(
+                get_model(model, temperature, api_key).generate_content_async(contents, request_options=_request_options(deadline)),
+                timeout=max(deadline - time.monotonic(), 0.001),
+            )
+            text = _response_text(response)
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        finally:
+            limiter.release()
+
+        if error is None:
+            _record(node, time.monotonic() - started, attempt - 1, usage=getattr(response, "usage_metadata", None))
+            _cache_store(node, cache_key, text, validate)
+            return text
+        await asyncio.sleep(_retry_or_raise(node, error, attempt, started, deadline))
+
+
+def stream(contents, node: str, model: str = LLM_DEFAULT_MODEL, temperature: float = None, timeout: float = None, api_key: str = None):
+    """
+    응답을 조각(str) 단위로 내보내는 제너레이터.
+    첫 조각을 받기 전 실패만 재시도합니다. (이미 내보낸 조각은 되돌릴 수 없으므로)
+    """
+    _record_prompt(node, contents)
+    started = time.monotonic()
+    deadline = started + (timeout or LLM_TIMEOUT)
+    limiter = get_limiter(model, api_key)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            limiter.acquire(deadline)
+        except LLMDeadlineExceeded as e:
+            _retry_or_raise(node, e, attempt, started, deadline)
+        emitted = False
+        usage = None
+        error = None
+        try:
+            response = get_model(model, temperature, api_key).generate_content(
+                contents, stream=True, request_options=_request_options(deadline)
+            )
+            for chunk in response:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = _chunk_text(chunk)
+                if text:
+                    emitted = True
+                    yield text
+        except Exception as e:
+            error = e
+        finally:
+            # 받는 쪽이 중간에 멈춰도(GeneratorExit) 슬롯 반환
+            limiter.release()
+
+        if error is None:
+            _record(node, time.monotonic() - started, attempt - 1, usage=usage)
+            return
+        time.sleep(_retry_or_raise(node, error, attempt, started, deadline, emitted))
+
+
+async def astream(contents, node: str, model: str = LLM_DEFAULT_MODEL, temperature: float = None, timeout: float = None, api_key: str = None):
+    """
+    stream의 비동기 버전 (async for로 사용)
+    """
+    _record_prompt(node, contents)
+    started = time.monotonic()
+    deadline = started + (timeout or LLM_TIMEOUT)
+    limiter = get_limiter(model, api_key)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            await limiter.aacquire(deadline)
+        except LLMDeadlineExceeded as e:
+            _retry_or_raise(node, e, attempt, started, deadline)
+        emitted = False
+        usage = None
+        error = None
+        try:
+            response = await get_model(model, temperature, api_key).generate_content_async(
+                contents, stream=True, request_options=_request_options(deadline)
+            )
+            async for chunk in response:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = _chunk_text(chunk)
+                if text:
+                    emitted = True
+                    yield text
+        except Exception as e:
+            error = e
+        finally:
+            limiter.release()
+
+        if error is None:
+            _record(node, time.monotonic() - started, attempt - 1, usage=usage)
+            return
+        await asyncio.sleep(_retry_or_raise(node, error, attempt, started, deadline, emitted))
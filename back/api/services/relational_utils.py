@@ -1,60 +1,192 @@
 # 관계형 DB 기반 문맥 검색 (벡터DB 대체)
-# 작성자: 최준혁  
+# 작성자: 최준혁
 # 작성일: 2025-06-16
-# 마지막 수정일: 2025-06-16
+# 마지막 수정일: 2025-07-02
+#
+# 동화별 역색인(메모리)을 만들어 BM25 점수로 문단을 찾습니다. (LIKE '%키워드%' 스캔 대체)
+# - 토큰: 한글 어절은 음절 bigram + 첫 음절(조사가 붙어도 명사 앞부분이 맞도록), 영문/숫자는 소문자 단어
+# - 문단 저장/수정 시(save_paragraph / update_paragraph_version) 해당 문단만 색인에 반영
+# - 동화 커서(다음 턴 시작 시 읽은 문단)와 비교해 다른 프로세스에서 바뀐 문단도 맞춰 줍니다.
 
-from api.models import Storyparagraph
-from django.db.models import Q
+import math
 import re
+import threading
+from collections import Counter, OrderedDict
+from decouple import config
+from api.models import Storyparagraph
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_MAX_STORIES = config('BM25_MAX_STORIES', default=1000, cast=int)   # 메모리에 유지할 동화 색인 수 (LRU)
+
+# 불용어 (일반적인 단어들)
+STOP_WORDS = {
+    '그런데', '하지만', '그래서', '그리고', '그때', '이때', '그것', '이것',
+    '어떻게', '무엇을', '어디서', '언제', '왜', '어떤', '어느', '그런',
+    '이런', '저런', '그거', '이거', '저거', '여기', '거기', '저기',
+    '지금', '나중', '먼저', '다음', '다시', '또', '더', '가장',
+    '정말', '너무', '매우', '아주', '조금', '많이', '빨리', '천천히'
+}
+
+_WORD_RE = re.compile(r'[가-힣]+|[a-zA-Z0-9]+')
+
+
+# ------------------------------------------------------------------------
+# 토큰화 / 동화별 역색인
+# ------------------------------------------------------------------------
+
+def tokenize(text: str) -> list[str]:
+    """
+    한글 어절: '^첫음절' + 음절 bigram (예: 숲으로 → ^숲, 숲으, 으로), 영문/숫자: 소문자 단어
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text or ""):
+        if word in STOP_WORDS:
+            continue
+        if '가' <= word[0] <= '힣':
+            tokens.append("^" + word[0])
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+class StoryIndex:
+    """
+    한 동화의 문단 역색인. 문서 키는 paragraph_no
+    """
+    def __init__(self):
+        self.docs = {}            # paragraph_no -> (text, Counter(토큰), 길이)
+        self.postings = {}        # 토큰 -> {paragraph_no: tf}
+        self.total_length = 0
+        self.paragraph_ids = {}   # paragraph_id -> paragraph_no (수정 시 문단 번호 찾기용)
+        self.lock = threading.Lock()
+
+    def _remove(self, paragraph_no):
+        text, tf, length = self.docs.pop(paragraph_no)
+        for token in tf:
+            posting = self.postings[token]
+            del posting[paragraph_no]
+            if not posting:
+                del self.postings[token]
+        self.total_length -= length
+
+    def _add(self, paragraph_no, text):
+        tf = Counter(tokenize(text))
+        length = sum(tf.values())
+        self.docs[paragraph_no] = (text, tf, length)
+        for token, count in tf.items():
+            self.postings.setdefault(token, {})[paragraph_no] = count
+        self.total_length += length
+
+    def upsert(self, paragraph_no: int, text: str, paragraph_id: int = None):
+        with self.lock:
+            if paragraph_id is not None:
+                self.paragraph_ids[paragraph_id] = paragraph_no
+            current = self.docs.get(paragraph_no)
+            if current is not None:
+                if current[0] == text:
+                    return
+                self._remove(paragraph_no)
+            self._add(paragraph_no, text)
+
+    def sync(self, paragraphs: list[tuple[int, str]]):
+        """
+        [(paragraph_no, text), ...]와 같아지도록 바뀐 문단만 반영합니다.
+        """
+        with self.lock:
+            wanted = dict(paragraphs)
+            for paragraph_no in [no for no in self.docs if no not in wanted]:
+                self._remove(paragraph_no)
+            for paragraph_no, text in wanted.items():
+                current = self.docs.get(paragraph_no)
+                if current is not None and current[0] == text:
+                    continue
+                if current is not None:
+                    self._remove(paragraph_no)
+                self._add(paragraph_no, text)
+
+    def search(self, query: str, top_k: int) -> list[tuple[float, int, str]]:
+        """
+        BM25 점수 상위 top_k개 [(점수, paragraph_no, text)] (점수 0인 문단 제외, 동점이면 최신 문단 먼저)
+        """
+        query_tokens = set(tokenize(query))
+        with self.lock:
+            n_docs = len(self.docs)
+            if not n_docs or not query_tokens:
+                return []
+            avg_length = self.total_length / n_docs or 1.0
+            scores = Counter()
+            for token in query_tokens:
+                posting = self.postings.get(token)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for paragraph_no, tf in posting.items():
+                    length = self.docs[paragraph_no][2]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[paragraph_no] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:top_k]
+            return [(score, paragraph_no, self.docs[paragraph_no][0]) for paragraph_no, score in ranked]
+
+
+_indexes = OrderedDict()   # story_id -> StoryIndex (LRU)
+_indexes_lock = threading.Lock()
+
+
+def get_story_index(story_id: int, paragraphs: list[tuple[int, str]] | None = None) -> StoryIndex:
+    """
+    동화 색인을 반환합니다. 없으면 paragraphs(없으면 DB)로 만들고, paragraphs를 주면 그 내용과 맞춥니다.
+    """
+    with _indexes_lock:
+        index = _indexes.get(story_id)
+        if index is not None:
+            _indexes.move_to_end(story_id)
+
+    if index is None:
+        if paragraphs is None:
+            paragraphs = list(
+                Storyparagraph.objects.filter(story_id=story_id).values_list("paragraph_no", "content_text")
+            )
+        index = StoryIndex()
+        index.sync(paragraphs)
+        with _indexes_lock:
+            index = _indexes.setdefault(story_id, index)
+            _indexes.move_to_end(story_id)
+            while len(_indexes) > BM25_MAX_STORIES:
+                _indexes.popitem(last=False)
+    elif paragraphs is not None:
+        index.sync(paragraphs)
+    return index
+
 
 # ------------------------------------------------------------------------
 # 관계형 DB 기반 문맥 검색 함수들
 # ------------------------------------------------------------------------
 
 # 작성자 : 최준혁
-# 기능 : 관계형 DB에서 키워드 기반 문맥 검색 (벡터DB 대체)
-# 마지막 수정일 : 2025-06-16
-def search_similar_paragraphs_by_keywords(story_id: int, query: str, top_k: int = 4) -> str:
+# 기능 : 동화 문단 중 입력과 관련 높은 문단을 BM25 점수순으로 검색 (벡터DB 대체)
+# 마지막 수정일 : 2025-07-02
+def search_similar_paragraphs_by_keywords(story_id: int, query: str, top_k: int = 4,
+                                          paragraphs: list[tuple[int, str]] | None = None) -> str:
     """
-    벡터DB 대신 관계형DB에서 키워드 매칭으로 유사한 문단 검색
+    동화별 역색인에서 BM25 점수가 높은 문단 top_k개를 점수순으로 반환
+    paragraphs([(paragraph_no, text)], 동화 커서)를 주면 색인을 그 내용과 맞추고 DB를 조회하지 않습니다.
     """
     if not query or not query.strip():
-        return get_latest_paragraphs(story_id, top_k)
-    
+        return get_latest_paragraphs(story_id, top_k, paragraphs)
+
     try:
-        # 1. 쿼리에서 의미있는 키워드 추출
-        keywords = extract_meaningful_keywords(query)
-        
-        if not keywords:
-            # 키워드가 없으면 최신 문단 반환
-            return get_latest_paragraphs(story_id, top_k)
-        
-        # 2. 키워드 포함된 문단들 검색 (OR 조건)
-        q_objects = Q()
-        for keyword in keywords:
-            q_objects |= Q(content_text__icontains=keyword)
-        
-        # 3. 해당 스토리의 문단들 중에서 키워드 매칭
-        matching_paragraphs = (
-            Storyparagraph.objects
-            .filter(story_id=story_id)
-            .filter(q_objects)
-            .order_by("-paragraph_no")  # 최신순으로 정렬
-            [:top_k]
-        )
-        
-        if matching_paragraphs:
-            # 키워드 매칭된 문단들 반환
-            context_texts = [p.content_text for p in matching_paragraphs]
-            return "\n".join(context_texts)
-        else:
-            # 매칭되는 문단이 없으면 최신 문단들 반환
-            return get_latest_paragraphs(story_id, top_k//2)  # 더 적은 수로
-            
+        hits = get_story_index(story_id, paragraphs).search(query, top_k)
+        if hits:
+            return "\n".join(text for _, _, text in hits)
+        # 관련 문단이 없으면 최신 문단들 반환
+        return get_latest_paragraphs(story_id, top_k//2, paragraphs)  # 더 적은 수로
+
     except Exception as e:
-        print(f"[DB Search] 키워드 검색 실패: {e}")
+        print(f"[DB Search] BM25 검색 실패: {e}")
         # 실패 시 폴백으로 최신 문단 반환
-        return get_latest_paragraphs(story_id, top_k//2)
+        return get_latest_paragraphs(story_id, top_k//2, paragraphs)
 
 def extract_meaningful_keywords(text: str) -> list[str]:
     """
@@ -62,35 +194,29 @@ def extract_meaningful_keywords(text: str) -> list[str]:
     """
     # 한글 키워드만 추출 (2-5글자)
     korean_words = re.findall(r'[가-힣]{2,5}', text)
-    
-    # 불용어 제거 (일반적인 단어들)
-    stop_words = {
-        '그런데', '하지만', '그래서', '그리고', '그때', '이때', '그것', '이것',
-        '어떻게', '무엇을', '어디서', '언제', '왜', '어떤', '어느', '그런',
-        '이런', '저런', '그거', '이거', '저거', '여기', '거기', '저기',
-        '지금', '나중', '먼저', '다음', '다시', '또', '더', '가장',
-        '정말', '너무', '매우', '아주', '조금', '많이', '빨리', '천천히'
-    }
-    
+
     # 의미있는 키워드만 필터링
     meaningful_keywords = []
     for word in korean_words:
-        if (word not in stop_words and 
-            len(word) >= 2 and 
+        if (word not in STOP_WORDS and
+            len(word) >= 2 and
             len(word) <= 5 and
             word not in meaningful_keywords):  # 중복 제거
             meaningful_keywords.append(word)
-    
+
     # 최대 5개 키워드만 사용 (성능 고려)
     return meaningful_keywords[:5]
 
 # 작성자: 최준혁
 # 기능: 최신 문단 기준으로 최근 문단들 불러오기 (기존 함수 유지)
-# 마지막 수정일: 2025-06-16
-def get_latest_paragraphs(story_id: int, top_k: int = 6) -> str:
+# 마지막 수정일: 2025-07-01
+def get_latest_paragraphs(story_id: int, top_k: int = 6, paragraphs: list[tuple[int, str]] | None = None) -> str:
     """
     벡터 검색 대신 단순히 최신 문단들을 가져오는 함수
+    paragraphs([(paragraph_no, text)], 오래된 순)를 주면 DB를 조회하지 않습니다.
     """
+    if paragraphs is not None:
+        return "\n".join(text for _, text in paragraphs[-top_k:]) if top_k > 0 else ""
     try:
         paragraphs = (
             Storyparagraph.objects
@@ -103,14 +229,20 @@ def get_latest_paragraphs(story_id: int, top_k: int = 6) -> str:
         print(f"[DB Context] 최신 문단 불러오기 실패: {e}")
         return ""
 
-# 작성자: 최준혁  
-# 기능: 벡터 인덱싱 대체 함수
-# 마지막 수정일: 2025-06-16
-def index_paragraphs_to_db(story_id: int, paragraphs: list[str]):
-    """
-    벡터 인덱싱 대체 함수 - 관계형 DB에서는 별도 인덱싱 불필요
-    문단은 이미 Storyparagraph 테이블에 저장되므로 추가 작업 없음
-    """
-    if len(paragraphs) > 0:
-        print(f"[DB Index] 문단 {len(paragraphs)}개 이미 DB에 저장됨 (인덱싱 불필요)")
-    pass
+# 작성자: 최준혁
+# 기능: 저장/수정된 문단을 동화 색인에 반영 (색인이 아직 없는 동화는 첫 검색 때 만들어짐)
+# 마지막 수정일: 2025-07-02
+def index_paragraph(story_id: int, text: str, paragraph_no: int = None, paragraph_id: int = None):
+    with _indexes_lock:
+        index = _indexes.get(story_id)
+    if index is None:
+        return
+
+    if paragraph_no is None:
+        paragraph_no = index.paragraph_ids.get(paragraph_id)
+    if paragraph_no is None:
+        # 어느 문단인지 모르면 색인을 버리고 다음 검색 때 다시 만듭니다.
+        with _indexes_lock:
+            _indexes.pop(story_id, None)
+        return
+    index.upsert(paragraph_no, text, paragraph_id)
@@ -0,0 +1,294 @@
+# 샤딩된 통합 벡터 저장소
+# 작성자: 최준혁
+# 작성일: 2025-07-03
+#
+# 동화마다 vectordb/story_<id>/(index.faiss + index.pkl)를 두던 방식을 대체합니다.
+# - 벡터: story_id % VECTOR_STORE_SHARDS 샤드별 FAISS 파일 하나 (IndexIDMap2 + IndexFlatL2, 읽기는 mmap)
+# - 문서: docstore.sqlite3 한 파일 (id, story_id, 본문, 메타데이터), story_id 인덱스로 동화별 필터
+# - 검색: 동화의 문서 id만 IDSelector로 골라 해당 샤드에서 검색 → 동화 수와 상관없이 샤드 하나, 동화 문서 수만큼만 계산
+#         샤드 파일에 아직 합치지 않은 벡터는 문서 행에서 읽어 함께 비교 (id 기준으로 중복 제거)
+# - 쓰기: 새 벡터는 문서 행에만 저장 (flushed = 0), 샤드의 대기 벡터가 VECTOR_STORE_FLUSH_EVERY개를 넘으면 /
+#         종료 시 샤드 파일에 합쳐 저장. 합칠 행은 SQLite 쓰기 트랜잭션 안에서 가져오고 표시하므로
+#         여러 프로세스가 같은 행을 두 번 합치지 않습니다.
+# - 다른 프로세스가 샤드 파일을 바꾸면 (mtime/inode 변경) 다음 검색 때 다시 읽습니다.
+# 기존 폴더는 python manage.py migrate_vectordb 로 옮깁니다.
+
+import os
+import json
+import atexit
+import sqlite3
+import threading
+import numpy as np
+import faiss
+from decouple import config
+
+VECTOR_STORE_ROOT = config('VECTOR_STORE_ROOT', default='./vectordb/_shards/')
+VECTOR_STORE_SHARDS = config('VECTOR_STORE_SHARDS', default=16, cast=int)             # 샤드 수 (바꾸면 다시 마이그레이션 필요)
+VECTOR_STORE_FLUSH_EVERY = config('VECTOR_STORE_FLUSH_EVERY', default=32, cast=int)   # 샤드의 대기 벡터가 이만큼 쌓이면 샤드 파일에 저장
+
+
+class DocStore:
+    """
+    문서 저장소 (SQLite). 스레드별 연결을 사용합니다.
+    vector는 샤드 파일에 저장되기 전까지만 보관합니다. (flushed = 0)
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, story_id INTEGER NOT NULL, shard INTEGER NOT NULL,"
+                " text TEXT NOT NULL, metadata TEXT, vector BLOB, flushed INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS docs_story ON docs (story_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS docs_pending ON docs (shard, flushed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get_meta(self, key):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def insert(self, story_id, shard, texts, vectors, metadatas) -> list[int]:
+        ids = []
+        with self._connect() as conn:
+            for text, vector, metadata in zip(texts, vectors, metadatas):
+                cursor = conn.execute(
+                    "INSERT INTO docs (story_id, shard, text, metadata, vector) VALUES (?, ?, ?, ?, ?)",
+                    (story_id, shard, text, json.dumps(metadata, ensure_ascii=False), vector.tobytes()),
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def story_ids(self, story_id) -> list[int]:
+        rows = self._connect().execute("SELECT id FROM docs WHERE story_id = ?", (story_id,)).fetchall()
+        return [row[0] for row in rows]
+
+    def get(self, ids) -> dict:
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        rows = self._connect().execute(f"SELECT id, text, metadata FROM docs WHERE id IN ({marks})", list(ids)).fetchall()
+        return {row[0]: (row[1], json.loads(row[2]) if row[2] else {}) for row in rows}
+
+    def story_rows(self, story_id) -> tuple[list[int], list[tuple[int, bytes]]]:
+        """
+        (동화의 모든 문서 id, 샤드 파일에 아직 합치지 않은 [(id, 벡터)])
+        """
+        rows = self._connect().execute(
+            "SELECT id, flushed, vector FROM docs WHERE story_id = ?", (story_id,)
+        ).fetchall()
+        return [row[0] for row in rows], [(row[0], row[2]) for row in rows if not row[1]]
+
+    def pending_count(self, shard) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM docs WHERE shard = ? AND flushed = 0", (shard,)
+        ).fetchone()[0]
+
+    def flush_pending(self, shard, write) -> int:
+        """
+        샤드의 대기 벡터를 write(ids, vectors)로 샤드 파일에 합치고 합친 행으로 표시합니다.
+        쓰기 트랜잭션(BEGIN IMMEDIATE) 안에서 하므로 다른 프로세스의 flush와 겹치지 않습니다.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, vector FROM docs WHERE shard = ? AND flushed = 0 ORDER BY id", (shard,)
+            ).fetchall()
+            if rows:
+                write(
+                    np.array([row[0] for row in rows], dtype="int64"),
+                    np.vstack([np.frombuffer(row[1], dtype="float32") for row in rows]),
+                )
+                conn.executemany("UPDATE docs SET flushed = 1, vector = NULL WHERE id = ?", [(row[0],) for row in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(rows)
+
+    def delete_story(self, story_id) -> int:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM docs WHERE story_id = ?", (story_id,)).rowcount
+
+    def story_count(self) -> int:
+        return self._connect().execute("SELECT COUNT(DISTINCT story_id) FROM docs").fetchone()[0]
+
+
+class Shard:
+    """
+    샤드 하나: 저장된 샤드 파일(mmap, 읽기 전용). 대기 벡터는 문서 행(docstore)에 있습니다.
+    """
+    def __init__(self, number, path, dim, docstore):
+        self.number = number
+        self.path = path
+        self.dim = dim
+        self.docstore = docstore
+        self.lock = threading.Lock()
+        self._base = None
+        self._base_key = None   # 읽은 파일의 (inode, mtime)
+
+    def _file_key(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def base(self):
+        """
+        샤드 파일 인덱스. 다른 프로세스가 파일을 바꿨으면 다시 읽습니다.
+        """
+        key = self._file_key()
+        with self.lock:
+            if key != self._base_key:
+                self._base = faiss.read_index(self.path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY) if key else None
+                self._base_key = key
+            return self._base
+
+    def search(self, vector, ids, pending, k) -> list[tuple[float, int]]:
+        """
+        ids(동화의 문서 id) 중 가까운 k개 [(L2 거리, id)]. pending: 샤드 파일에 아직 없는 [(id, 벡터)]
+        """
+        vector = vector.reshape(1, -1)
+        distances = {}
+        base = self.base()
+        if base is not None and base.ntotal:
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.array(ids, dtype="int64")))
+            found_distances, found = base.search(vector, min(k, len(ids)), params=params)
+            for distance, doc_id in zip(found_distances[0], found[0]):
+                if doc_id != -1:
+                    distances[int(doc_id)] = float(distance)
+        if pending:
+            # 파일에 막 합쳐진 행은 양쪽에 다 있을 수 있으므로 id 기준으로 하나만 남깁니다.
+            matrix = np.vstack([np.frombuffer(blob, dtype="float32") for _, blob in pending])
+            for (doc_id, _), distance in zip(pending, ((matrix - vector) ** 2).sum(axis=1)):
+                distances[doc_id] = min(float(distance), distances.get(doc_id, float("inf")))
+        return sorted((distance, doc_id) for doc_id, distance in distances.items())[:k]
+
+    def _merge(self, ids, vectors):
+        merged = faiss.read_index(self.path) if os.path.exists(self.path) else faiss.IndexIDMap2(faiss.IndexFlatL2(self.dim))
+        # 파일 교체 후 표시 전에 종료된 경우 이미 들어간 id는 다시 넣지 않습니다.
+        existing = set(faiss.vector_to_array(merged.id_map).tolist()) if merged.ntotal else set()
+        keep = np.array([doc_id not in existing for doc_id in ids.tolist()])
+        if not keep.any():
+            return
+        merged.add_with_ids(vectors[keep], ids[keep])
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        faiss.write_index(merged, tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def flush(self) -> int:
+        """
+        대기 벡터를 샤드 파일에 합쳐 새로 씁니다. (임시 파일 → 교체)
+        """
+        return self.docstore.flush_pending(self.number, self._merge)
+
+
+class ShardedVectorStore:
+    def __init__(self, root=VECTOR_STORE_ROOT, shards=VECTOR_STORE_SHARDS, flush_every=VECTOR_STORE_FLUSH_EVERY):
+        self.root = root
+        self.shard_count = shards
+        self.flush_every = flush_every
+        os.makedirs(root, exist_ok=True)
+        self.docstore = DocStore(os.path.join(root, "docstore.sqlite3"))
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    @property
+    def dim(self):
+        value = self.docstore.get_meta("dim")
+        return int(value) if value else None
+
+    def shard_of(self, story_id) -> int:
+        return int(story_id) % self.shard_count
+
+    def _shard(self, number, dim=None) -> Shard | None:
+        """
+        샤드는 처음 쓸 때 엽니다. (시작 비용이 동화 수와 무관)
+        """
+        with self._lock:
+            shard = self._shards.get(number)
+            if shard is None:
+                dim = dim or self.dim
+                if dim is None:
+                    return None
+                path = os.path.join(self.root, f"shard_{number:02d}.faiss")
+                shard = Shard(number, path, dim, self.docstore)
+                self._shards[number] = shard
+            return shard
+
+    def add_texts(self, story_id: int, texts: list[str], vectors, metadatas: list[dict] | None = None) -> list[int]:
+        vectors = np.asarray(vectors, dtype="float32")
+        if not len(texts):
+            return []
+        if self.dim is None:
+            self.docstore.set_meta("dim", vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"벡터 차원 불일치: {vectors.shape[1]} (저장소 {self.dim})")
+
+        number = self.shard_of(story_id)
+        metadatas = metadatas or [{"story_id": story_id} for _ in texts]
+        shard = self._shard(number, vectors.shape[1])
+        ids = self.docstore.insert(story_id, number, texts, vectors, metadatas)
+        if self.docstore.pending_count(number) >= self.flush_every:
+            shard.flush()
+        return ids
+
+    def has_story(self, story_id: int) -> bool:
+        return bool(self.docstore.story_ids(story_id))
+
+    def search(self, story_id: int, vector, k: int = 6) -> list[tuple[str, dict, float]]:
+        """
+        한 동화의 문서 중 가까운 k개 [(본문, 메타데이터, L2 거리)]
+        """
+        ids, pending = self.docstore.story_rows(story_id)
+        if not ids:
+            return []
+        shard = self._shard(self.shard_of(story_id))
+        if shard is None:
+            return []
+        hits = shard.search(np.asarray(vector, dtype="float32"), ids, pending, k)
+        docs = self.docstore.get([doc_id for _, doc_id in hits])
+        return [(*docs[doc_id], distance) for distance, doc_id in hits if doc_id in docs]
+
+    def delete_story(self, story_id: int) -> int:
+        # 샤드의 벡터는 남지만 문서 행이 없으면 검색 대상(IDSelector)에서 빠집니다.
+        return self.docstore.delete_story(story_id)
+
+    def flush(self):
+        with self._lock:
+            shards = list(self._shards.values())
+        for shard in shards:
+            try:
+                count = shard.flush()
+                if count:
+                    print(f"[VectorStore] 샤드 {shard.number:02d} 저장: {count}개")
+            except Exception as e:
+                print(f"[VectorStore] 샤드 {shard.number:02d} 저장 실패: {e}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> ShardedVectorStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ShardedVectorStore()
+            atexit.register(_store.flush)
+        return _store
@@ -1,50 +1,218 @@
 from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_core.documents import Document
 import os
+import time
+import threading
+from collections import OrderedDict
+from decouple import config
 from api.models import Storyparagraph
+from api.services.vector_store import get_vector_store
+from api.services.embedding_service import get_embeddings
 
 VECTORDB_ROOT = './vectordb/'
-embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-exp-03-07")
+embeddings = get_embeddings()   # 묶음 요청 + 디스크 캐시 (embedding_service.py)
+
+# 로드한 벡터DB 캐시 설정 (환경변수로 조정 가능)
+VECTOR_CACHE_MAX_BYTES = config('VECTOR_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int)  # 캐시에 유지할 벡터DB 총 크기(추정)
+
+
+# ------------------------------------------------------------------------
+# 로드한 벡터DB 캐시 (프로세스 단위 LRU, 읽기 전용)
+# ------------------------------------------------------------------------
+# 새 문단은 통합 저장소(vector_store.py)에 저장하고, 이 캐시는 아직 옮기지 않은
+# 동화별 폴더(vectordb/story_<id>/)를 읽을 때만 사용합니다. (python manage.py migrate_vectordb)
+# - 동화별 FAISS를 한 번 로드하면 메모리에 두고 재사용 (매 검색마다 index.pkl 역직렬화 제거)
+# - 추정 크기 합이 VECTOR_CACHE_MAX_BYTES를 넘으면 가장 오래 안 쓴 동화부터 내림
+# - 폴더가 바뀌면(mtime 변경) 다음 조회 때 다시 로드
+
+class _CachedStore:
+    def __init__(self, path, store, mtime):
+        self.path = path
+        self.store = store
+        self.mtime = mtime
+        self.lock = threading.Lock()
+        self.nbytes = self._estimate_bytes()
+
+    def _estimate_bytes(self) -> int:
+        # 벡터(float32) + 문서 본문 크기로 추정
+        index = self.store.index
+        vectors = index.ntotal * index.d * 4
+        texts = sum(len(doc.page_content.encode("utf-8")) for doc in self.store.docstore._dict.values())
+        return vectors + texts
+
+
+class VectorStoreCache:
+    def __init__(self, max_bytes=VECTOR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # story_id -> _CachedStore
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0,
+                       "loads": 0, "load_seconds": 0.0, "load_max": 0.0}
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(os.path.join(path, "index.faiss"))
+        except OSError:
+            return None
+
+    def _load(self, story_id, path, mtime):
+        started = time.monotonic()
+        store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._stats["loads"] += 1
+            self._stats["load_seconds"] += elapsed
+            self._stats["load_max"] = max(self._stats["load_max"], elapsed)
+        print(f"[VectorStore] 로드: story_{story_id} ({round(elapsed * 1000, 1)}ms)")
+        return _CachedStore(path, store, mtime)
+
+    def get(self, story_id):
+        """
+        동화의 벡터DB를 반환합니다. 디스크에 없으면 None
+        """
+        path = os.path.join(VECTORDB_ROOT, f"story_{story_id}")
+        with self._lock:
+            entry = self._entries.get(story_id)
+            if entry is not None:
+                self._entries.move_to_end(story_id)
+
+        mtime = self._mtime(path)
+        if entry is not None:
+            # 폴더가 다시 저장된 경우
+            if mtime is not None and mtime != entry.mtime:
+                with self._lock:
+                    self._stats["reloads"] += 1
+                entry = self._load(story_id, path, mtime)
+                self._put(story_id, entry)
+            else:
+                with self._lock:
+                    self._stats["hits"] += 1
+            return entry
+
+        with self._lock:
+            self._stats["misses"] += 1
+        if mtime is None:
+            return None
+        entry = self._load(story_id, path, mtime)
+        self._put(story_id, entry)
+        return entry
+
+    def _put(self, story_id, entry):
+        with self._lock:
+            self._entries[story_id] = entry
+            self._entries.move_to_end(story_id)
+            total = sum(e.nbytes for e in self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                total -= old.nbytes
+                self._stats["evictions"] += 1
+
+    def evict(self, story_id):
+        with self._lock:
+            self._entries.pop(story_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["stories"] = len(self._entries)
+            stats["bytes"] = sum(e.nbytes for e in self._entries.values())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+        stats["load_avg"] = round(stats["load_seconds"] / stats["loads"], 4) if stats["loads"] else None
+        return stats
+
+    def report_stats(self):
+        s = self.stats()
+        print(
+            f"📊 [VectorStore] 캐시 {s['stories']}개 ({round(s['bytes'] / 1024 / 1024, 1)}MB), "
+            f"적중률 {s['hit_rate']} (적중 {s['hits']} / 미적중 {s['misses']}), "
+            f"로드 {s['loads']}회 평균 {s['load_avg']}초 / 최대 {round(s['load_max'], 4)}초, "
+            f"재로드 {s['reloads']}, 내림 {s['evictions']}"
+        )
+
+
+_store_cache = VectorStoreCache()
+
+
+def get_vector_store_cache() -> VectorStoreCache:
+    return _store_cache
 
 
 # ------------------------------------------------------------------------
 # Vector DB관련 함수
 # ------------------------------------------------------------------------
 
-# 작성자 : 최준혁
-# 기능 : DB에 저장된 문단을 받아 벡터화 및 저장
-# 마지막 수정일 : 2025-06-08
-def index_paragraphs_to_faiss(story_id: int, paragraphs: list[str]):
-    story_path = os.path.join(VECTORDB_ROOT, f"story_{story_id}")
-    os.makedirs(story_path, exist_ok=True)  # 폴더 생성
+_migrate_lock = threading.Lock()
+
 
-    docs = [Document(page_content=p, metadata={"story_id": story_id}) for p in paragraphs]
+def _legacy_path(story_id: int, root: str = VECTORDB_ROOT) -> str:
+    return os.path.join(root, f"story_{story_id}")
 
-    if os.path.exists(os.path.join(story_path, "index.faiss")):
-        vectorstore = FAISS.load_local(story_path, embeddings, allow_dangerous_deserialization=True)
-        vectorstore.add_documents(docs)
-    else:
-        vectorstore = FAISS.from_documents(docs, embedding=embeddings)
 
-    vectorstore.save_local(story_path)
-    print(f"[VectorStore] 저장 완료: {story_path}")
+def _is_migrated(story_id: int) -> bool:
+    return get_vector_store().docstore.get_meta(f"legacy:{story_id}") is not None
 
 
 # 작성자 : 최준혁
-# 기능 : 저장된 벡터 DB에서 문맥 검색
-# 마지막 수정일 : 2025-06-08
-def search_similar_paragraphs(story_id: int, query: str, top_k: int = 6) -> str:
-    story_path = os.path.join(VECTORDB_ROOT, f"story_{story_id}")
-    if not os.path.exists(os.path.join(story_path, "index.faiss")):
-        print(f"[VectorStore] 경로 없음: {story_path}")
-        return ""
+# 기능 : 동화별 폴더(vectordb/story_<id>/)의 문단을 통합 저장소로 옮김 (임베딩 재계산 없음, 옮긴 문단 수 반환)
+# 마지막 수정일 : 2025-07-07
+def migrate_legacy_story(story_id: int, root: str = VECTORDB_ROOT) -> int:
+    store = get_vector_store()
+    path = _legacy_path(story_id, root)
+    count = 0
+    if os.path.exists(os.path.join(path, "index.faiss")):
+        vectorstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        index = vectorstore.index
+        texts, metadatas = [], []
+        for position in range(index.ntotal):
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+            texts.append(doc.page_content)
+            metadatas.append({**doc.metadata, "story_id": story_id})
+        if texts:
+            store.add_texts(story_id, texts, index.reconstruct_n(0, index.ntotal), metadatas)
+        count = len(texts)
+    store.docstore.set_meta(f"legacy:{story_id}", count)
+    return count
 
+
+# 작성자 : 최준혁
+# 기능 : DB에 저장된 문단을 받아 벡터화 및 저장 (샤딩된 통합 저장소에 추가)
+#        옮기지 않은 동화는 처음 쓸 때 기존 폴더의 문단을 먼저 옮깁니다. (새 문단만 남고 예전 문단이 빠지지 않도록)
+# 마지막 수정일 : 2025-07-07
+def index_paragraphs_to_faiss(story_id: int, paragraphs: list[str]):
+    if not paragraphs:
+        return
+    with _migrate_lock:
+        if not _is_migrated(story_id):
+            migrated = migrate_legacy_story(story_id)
+            if migrated:
+                print(f"[VectorStore] story_{story_id} 통합 저장소로 옮김: {migrated}개")
+            _store_cache.evict(story_id)   # 이후로는 통합 저장소만 검색
+    vectors = embeddings.embed_documents(paragraphs)
+    get_vector_store().add_texts(story_id, paragraphs, vectors, [{"story_id": story_id} for _ in paragraphs])
+
+
+# 작성자 : 최준혁
+# 기능 : 저장된 벡터 DB에서 문맥 검색 (통합 저장소 + 아직 옮기지 않은 동화는 동화별 폴더, 거리순으로 합침)
+# 마지막 수정일 : 2025-07-07
+def search_similar_paragraphs(story_id: int, query: str, top_k: int = 6) -> str:
     try:
-        vectorstore = FAISS.load_local(story_path, embeddings, allow_dangerous_deserialization=True)
-        docs = vectorstore.similarity_search(query, k=top_k)
-        context = "\n".join([doc.page_content for doc in docs])
-        return context
+        store = get_vector_store()
+        legacy = None
+        if not _is_migrated(story_id):
+            legacy = _store_cache.get(story_id)
+        if legacy is None and not store.has_story(story_id):
+            print(f"[VectorStore] 경로 없음: {_legacy_path(story_id)}")
+            return ""
+
+        query_vector = embeddings.embed_query(query)
+        hits = [(distance, text) for text, _, distance in store.search(story_id, query_vector, k=top_k)]
+        if legacy is not None:
+            with legacy.lock:
+                docs = legacy.store.similarity_search_with_score_by_vector(query_vector, k=top_k)
+            hits.extend((float(score), doc.page_content) for doc, score in docs)
+        hits.sort(key=lambda hit: hit[0])
+        return "\n".join(text for _, text in hits[:top_k])
     except Exception as e:
         print(f"[VectorStore] 검색 실패: {e}")
         return ""
@@ -64,4 +232,4 @@ def get_latest_paragraphs(story_id: int, top_k: int = 6) -> str:
         return "\n".join(latest_texts)
     except Exception as e:
         print(f"[RetrieveContext] 최신 문단 불러오기 실패: {e}")
-        return ""
\ No newline at end of file
+        return ""
@@ -1,3 +1,360 @@
-from django.test import TestCase
+import os
+import json
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import User, Story, Storyparagraph
+from api.services import llm_cache, llm_gateway
+from api.services.relational_utils import StoryIndex
+from api.services.langgraph.story_stream import stream_story_turn
+from api.services.embedding_service import build_embedding_service
+from api.services.document_ingest import ingest_source
+from api.services.vector_store import ShardedVectorStore
 
 # Create your tests here.
+
+PARAGRAPH_RESPONSE = (
+    "[문장]\n토끼가 숲으로 걸어갔어요. 친구를 만났어요.\n\n"
+    "[질문]\n토끼는 무엇을 할까요?\n\n"
+    "[행동]\n1. 친구와 놀아요.\n2. 집으로 가요.\n3. 낮잠을 자요."
+)
+
+
+# 작성자: 최준혁
+# 기능: 동화 한 턴(Start → RetrieveContext → GenerateParagraph → SaveParagraph → SaveQA)의 DB 쿼리 수 확인
+#       Start에서 읽은 동화 커서를 쓰므로 이미 쓴 문단 수와 상관없이 쿼리 수가 같아야 합니다.
+#       다른 프로세스의 후처리 표시(StoryPostProcess)가 남아 있으면 Start가 기다렸다가 다시 읽는지도 확인합니다.
+# 마지막 수정일: 2025-07-07
+class StoryTurnQueryCountTests(TestCase):
+    # Story 1 + 최근 문단 1 (Start) / 문단 1 + 버전 1 (SaveParagraph) / QA 1 (SaveQA)
+    EXPECTED_QUERIES = 5
+
+    @classmethod
+    def setUpClass(cls):
+        # api 모델은 managed = False라 테스트 DB에 테이블을 직접 만듭니다.
+        cls.unmanaged_models = [m for m in apps.get_app_config("api").get_models() if not m._meta.managed]
+        with connection.schema_editor() as editor:
+            for model in cls.unmanaged_models:
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            for model in reversed(cls.unmanaged_models):
+                editor.delete_model(model)
+
+    def setUp(self):
+        from api.services.langgraph.story_flow import story_flow
+
+        now = timezone.now()
+        self.user = User.objects.create(password_hash="x", nickname="테스터", age=7, created_at=now)
+        self.flow = story_flow()
+
+        patches = [
+            mock.patch("api.services.llm_gateway.generate", return_value=PARAGRAPH_RESPONSE),
+            mock.patch("api.services.langgraph.story_flow.get_story_task_runner"),   # 후처리는 실행하지 않음
+            mock.patch("api.services.langgraph.paragraph_utils.prewarm_qa_audio"),
+            mock.patch("api.services.langgraph.paragraph_utils.presegment_in_background"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _create_story(self, paragraph_count):
+        now = timezone.now()
+        story = Story.objects.create(
+            author_user=self.user, title="제목 없음", created_at=now, updated_at=now,
+            status="in_progress", age=7,
+            characters="1. 메리 : 여자, 갈색 털, 7세, 토끼",
+            summary_4step="\n".join(f"{i}. 단계 {i}" for i in range(1, 11)),
+        )
+        for no in range(1, paragraph_count + 1):
+            Storyparagraph.objects.create(
+                story=story, paragraph_no=no, content_text=f"{no}번째 문단이에요. 메리가 숲을 걸어요.",
+                created_at=now, updated_at=now,
+            )
+        return story
+
+    def _run_turn(self, story):
+        state = {"input": "메리가 친구를 찾아요", "user_id": self.user.user_id, "story_id": story.story_id,
+                 "age": 7, "mode": "create"}
+        with CaptureQueriesContext(connection) as queries:
+            result = self.flow.invoke(state)
+        return result, len(queries)
+
+    def test_turn_query_count_is_fixed(self):
+        for paragraph_count in (1, 4, 8):
+            with self.subTest(paragraphs=paragraph_count):
+                story = self._create_story(paragraph_count)
+                result, query_count = self._run_turn(story)
+
+                self.assertEqual(result["paragraph_no"], paragraph_count + 1)
+                self.assertEqual(query_count, self.EXPECTED_QUERIES)
+                self.assertTrue(
+                    Storyparagraph.objects.filter(story=story, paragraph_no=paragraph_count + 1).exists()
+                )
+
+    def test_cursor_drives_context(self):
+        story = self._create_story(3)
+        result, _ = self._run_turn(story)
+
+        self.assertEqual(result["cursor"]["next_paragraph_no"], 4)
+        self.assertEqual([no for no, _ in result["cursor"]["paragraphs"]], [1, 2, 3])
+        self.assertIn("3번째 문단이에요", result["context"])
+
+    def test_waits_for_other_process_post_process(self):
+        # 다른 프로세스에서 후처리 중(표시가 남아 있음)이면 Start가 표시가 풀릴 때까지 기다렸다가 다시 읽음
+        from api.services.langgraph.story_cursor import load_story_cursor
+        from api.services.langgraph.story_tasks import _mark_pending, _mark_done
+
+        story = self._create_story(2)
+        _mark_pending(story.story_id)
+        self.assertTrue(load_story_cursor(story.story_id)[0].post_process_pending)
+
+        with mock.patch("api.services.langgraph.routers.wait_story_marker",
+                        side_effect=lambda story_id: _mark_done(story_id) or True) as wait:
+            result, _ = self._run_turn(story)
+
+        wait.assert_called_once_with(story.story_id)
+        self.assertEqual(result["paragraph_no"], 3)
+        self.assertFalse(load_story_cursor(story.story_id)[0].post_process_pending)
+
+
+# 작성자: 최준혁
+# 기능: 동화 문단 스트리밍 - saved(문단 저장) 뒤 SaveQA/SchedulePostProcess까지 끝나면 done으로 끝나는지 확인
+# 마지막 수정일: 2025-07-07
+class StoryStreamTests(SimpleTestCase):
+    class FakeFlow:
+        def __init__(self, chunks, fail_after=None):
+            self.chunks = chunks
+            self.fail_after = fail_after
+
+        def stream(self, state, stream_mode=None):
+            for chunk in self.chunks:
+                yield chunk
+                if chunk[0] == "updates" and self.fail_after in chunk[1]:
+                    raise RuntimeError("QA 저장 실패")
+
+    CHUNKS = [
+        ("custom", {"type": "token", "text": "토끼가"}),
+        ("updates", {"SaveParagraph": {"paragraph_text": "토끼가 걸어갔어요.", "paragraph_no": 2}}),
+        ("updates", {"SaveQA": None}),
+        ("updates", {"SchedulePostProcess": {}}),
+    ]
+
+    def _events(self, flow):
+        return list(stream_story_turn(flow, {"story_id": 1}))
+
+    def test_done_after_qa_and_post_process(self):
+        events = self._events(self.FakeFlow(self.CHUNKS))
+        self.assertEqual([e["type"] for e in events], ["token", "saved", "done"])
+        self.assertEqual(events[1]["paragraph_no"], 2)
+        self.assertEqual(events[2], {"type": "done", "qa_saved": True, "post_process_scheduled": True})
+
+    def test_failure_after_saved_is_reported_in_done(self):
+        events = self._events(self.FakeFlow(self.CHUNKS[:2] + [("updates", {"SaveQA": None})], fail_after="SaveParagraph"))
+        self.assertEqual([e["type"] for e in events], ["token", "saved", "done"])
+        self.assertFalse(events[2]["qa_saved"])
+        self.assertEqual(events[2]["error"], "QA 저장 실패")
+
+
+# 작성자: 최준혁
+# 기능: 동화별 BM25 색인 - 조사가 붙은 한국어 단어 매칭, 점수순 정렬, 증분 갱신 확인
+# 마지막 수정일: 2025-07-02
+class StoryIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = StoryIndex()
+        self.index.sync([
+            (1, "메리는 숲속 작은 집에서 살아요."),
+            (2, "메리가 강가에서 반짝이는 돌을 주웠어요."),
+            (3, "여우가 나타나 메리에게 돌을 달라고 했어요. 여우는 돌을 무척 좋아해요."),
+        ])
+
+    def test_ranks_by_score(self):
+        hits = self.index.search("여우가 돌을 가져갔어", top_k=2)
+        self.assertEqual([no for _, no, _ in hits], [3, 2])
+
+    def test_matches_word_with_particle(self):
+        hits = self.index.search("숲에서 놀아요", top_k=3)
+        self.assertEqual(hits[0][1], 1)
+
+    def test_upsert_replaces_paragraph(self):
+        self.index.upsert(1, "메리는 바닷가 오두막에서 살아요.")
+        self.assertEqual(self.index.search("숲속", top_k=3), [])
+        self.assertEqual(self.index.search("바닷가", top_k=3)[0][1], 1)
+
+
+# 작성자: 최준혁
+# 기능: 샤딩된 벡터 저장소 - 샤드 파일 저장 전후로 검색 결과에 중복이 없고, 다른 프로세스(인스턴스)가 저장한 벡터도 보이는지 확인
+# 마지막 수정일: 2025-07-07
+class ShardedVectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.store = ShardedVectorStore(root.name, shards=2, flush_every=3)
+        self.other = ShardedVectorStore(root.name, shards=2, flush_every=3)   # 다른 프로세스처럼 따로 생성
+
+    @staticmethod
+    def _vector(i):
+        return [float(i == j) + i * 0.01 for j in range(4)]
+
+    def _texts(self, store, story_id, vector):
+        return [text for text, _, _ in store.search(story_id, vector, k=10)]
+
+    def test_no_duplicates_before_and_after_flush(self):
+        self.store.add_texts(1, ["t0", "t1"], [self._vector(0), self._vector(1)])
+        self.assertEqual(sorted(self._texts(self.store, 1, self._vector(0))), ["t0", "t1"])
+
+        self.store.add_texts(1, ["t2"], [self._vector(2)])   # 대기 3개 → 샤드 파일에 저장
+        self.assertEqual(sorted(self._texts(self.store, 1, self._vector(0))), ["t0", "t1", "t2"])
+        self.assertEqual(self.store.docstore.pending_count(1), 0)
+
+    def test_sees_other_instance_and_filters_story(self):
+        self.store.add_texts(1, ["t0"], [self._vector(0)])
+        self.store.add_texts(3, ["다른 동화"], [self._vector(1)])
+        self.assertEqual(self._texts(self.store, 1, self._vector(0)), ["t0"])
+
+        self.other.add_texts(1, ["p2"], [self._vector(2)])
+        self.other.flush()
+        self.store.flush()   # 이미 저장된 행은 다시 합치지 않음
+        texts = self._texts(self.store, 1, self._vector(2))
+        self.assertEqual(texts[0], "p2")
+        self.assertEqual(sorted(texts), ["p2", "t0"])
+
+
+# 작성자: 최준혁
+# 기능: LLM 응답 캐시 - validate를 통과한 응답만 저장하고, 통과하지 못한 캐시 항목은 지우며, refresh=True면 캐시를 건너뜀
+# 마지막 수정일: 2025-07-07
+class LLMCacheTests(SimpleTestCase):
+    PROMPT = "등장인물을 JSON으로 알려 주세요."
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        self.cache = llm_cache.SQLiteCache(os.path.join(tmp, "llm.sqlite3"))
+        self.model = mock.Mock()
+        patches = [
+            mock.patch.object(llm_cache, "LLM_CACHE_BACKEND", "sqlite"),
+            mock.patch.object(llm_cache, "_cache", self.cache),
+            mock.patch.object(llm_gateway, "get_model", return_value=self.model),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _respond(self, *texts):
+        self.model.generate_content.side_effect = [SimpleNamespace(text=text) for text in texts]
+
+    def _generate(self, **kwargs):
+        return llm_gateway.generate(self.PROMPT, node="ExtractCharacters", validate=json.loads, **kwargs)
+
+    def test_malformed_response_is_not_cached(self):
+        self._respond('{"new_characters": [', '{"new_characters": []}')
+        self.assertEqual(self._generate(), '{"new_characters": [')   # 응답은 그대로 돌려줌
+        self.assertEqual(self._generate(), '{"new_characters": []}')
+        self.assertEqual(self._generate(), '{"new_characters": []}')   # 캐시
+        self.assertEqual(self.model.generate_content.call_count, 2)
+
+    def test_invalid_cached_entry_is_deleted(self):
+        key = llm_cache.make_key(self.PROMPT, llm_gateway.LLM_DEFAULT_MODEL)
+        self.cache.set(key, '{"new_characters": [', "ExtractCharacters")
+        self._respond('{"new_characters": []}')
+        self.assertEqual(self._generate(), '{"new_characters": []}')
+        self.assertEqual(self.cache.get(key), '{"new_characters": []}')
+
+    def test_refresh_skips_cache(self):
+        self._respond('{"new_characters": []}', '{"new_characters": [{"name": "메리"}]}')
+        self._generate()
+        self.assertEqual(self._generate(refresh=True), '{"new_characters": [{"name": "메리"}]}')
+        self.assertEqual(self._generate(), '{"new_characters": [{"name": "메리"}]}')
+        self.assertEqual(self.model.generate_content.call_count, 2)
+
+
+# 작성자: 최준혁
+# 기능: 임베딩 서비스 - 묶음 크기대로 요청, 같은 본문은 디스크 캐시에서 재사용 확인
+# 마지막 수정일: 2025-07-04
+class EmbeddingServiceTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        self.service = build_embedding_service("fake", cache_dir=self.cache_dir, dim=16, batch_size=4, concurrency=2)
+        self.texts = [f"{i}번째 문단" for i in range(10)]
+
+    def test_batches_requests(self):
+        with mock.patch.object(self.service.provider, "embed_documents",
+                               wraps=self.service.provider.embed_documents) as embed:
+            vectors = self.service.embed_documents(self.texts)
+        self.assertEqual(len(vectors), 10)
+        self.assertEqual(sorted(len(call.args[0]) for call in embed.call_args_list), [2, 4, 4])
+
+    def test_reuses_cached_vectors(self):
+        first = self.service.embed_documents(self.texts)
+        other = build_embedding_service("fake", cache_dir=self.cache_dir, dim=16)   # 다른 프로세스처럼 새로 생성
+        with mock.patch.object(other.provider, "embed_documents") as embed:
+            second = other.embed_documents(self.texts)
+        embed.assert_not_called()
+        for a, b in zip(first, second):
+            self.assertAlmostEqual(max(abs(x - y) for x, y in zip(a, b)), 0.0, places=2)
+
+
+# 작성자: 최준혁
+# 기능: 문서 스트리밍 색인 - CSV 행 단위 색인, 중간에 멈춘 색인을 체크포인트부터 이어서 완료하는지 확인
+# 마지막 수정일: 2025-07-06
+class DocumentIngestTests(SimpleTestCase):
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.source = os.path.join(work_dir.name, "reviews.csv")
+        self.target = os.path.join(work_dir.name, "vectordb", "reviews")
+        with open(self.source, "w", encoding="utf-8-sig") as f:
+            f.write('"vote","text"\n')
+            f.writelines(f'"5","{i}번째 후기예요. 아이가 잘 먹어요."\n' for i in range(30))
+        self.embeddings = build_embedding_service("fake", use_cache=False, dim=16)
+
+    def test_ingests_csv_rows(self):
+        stats = ingest_source(self.source, self.target, batch_size=4, checkpoint_every=8, embeddings=self.embeddings)
+        self.assertEqual((stats["documents"], stats["chunks"]), (30, 30))
+        self.assertTrue(os.path.exists(os.path.join(self.target, "index.faiss")))
+        self.assertFalse(os.path.exists(self.target + ".ingest"))
+
+    def test_resumes_from_checkpoint(self):
+        embed = self.embeddings.embed_documents
+        with mock.patch.object(self.embeddings, "embed_documents",
+                               side_effect=[embed(["a"] * 4)] * 5 + [RuntimeError("중단")]):
+            with self.assertRaises(RuntimeError):
+                ingest_source(self.source, self.target, batch_size=4, checkpoint_every=8, embeddings=self.embeddings)
+
+        stats = ingest_source(self.source, self.target, batch_size=4, checkpoint_every=8, embeddings=self.embeddings)
+        self.assertEqual(stats["chunks"], 30)
+        self.assertEqual(stats["new_chunks"], 14)   # 체크포인트(16개) 이후만 새로 색인
+
+
+# 작성자: 최준혁
+# 기능: 비동기 동화 생성 API - chatbot_story와 같은 인증 (토큰이 없으면 진행, 잘못된 토큰은 401)
+# 마지막 수정일: 2025-07-07
+class ChatbotStoryAsyncAuthTests(SimpleTestCase):
+    URL = "/api/v1/chat/story/async/"
+
+    def test_rejects_invalid_token(self):
+        with mock.patch("api.views.build_story_state") as build:
+            response = self.client.post(self.URL, data="{}", content_type="application/json",
+                                        HTTP_AUTHORIZATION="Bearer not-a-token")
+        self.assertEqual(response.status_code, 401)
+        build.assert_not_called()
+
+    def test_allows_request_without_token(self):
+        with mock.patch("api.views.build_story_state", side_effect=ValueError("user_id")) as build:
+            response = self.client.post(self.URL, data="{}", content_type="application/json")
+        self.assertEqual(response.status_code, 500)
+        build.assert_called_once_with({})
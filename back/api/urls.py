@@ -1,10 +1,22 @@
 from django.urls import path
 from . import views
-from .views import chatbot_story, list_story, story_illustration, story_storyParagraph, story_paragraphQA, story_story, list_story_by_status, search_stories, get_user_in_progress_story, get_random_published_titles
+from .views import chatbot_story, chatbot_story_async, chatbot_story_stream, list_story, story_illustration, story_storyParagraph, story_paragraphQA, story_story, list_story_by_status, search_stories, get_user_in_progress_story, get_random_published_titles
 
 urlpatterns = [
     path('', views.index, name='api_index'),
+    # 작성자 : 최준혁
+    # 마지막 수정일 : 2025-07-05
+    # 기능 : 서버 상태 확인 (챗봇 코퍼스 로드 상태)
+    path('health/', views.health, name='api_health'),
     path('v1/chat/story/', chatbot_story, name='api_chatbot_story'),
+    # 작성자 : 최준혁
+    # 마지막 수정일 : 2025-06-27
+    # 기능 : 동화 생성 비동기 버전 (ASGI 서버에서 사용)
+    path('v1/chat/story/async/', chatbot_story_async, name='api_chatbot_story_async'),
+    # 작성자 : 최준혁
+    # 마지막 수정일 : 2025-06-27
+    # 기능 : 동화 생성 스트리밍 버전 (SSE, 문단을 생성되는 대로 전송)
+    path('v1/chat/story/stream/', chatbot_story_stream, name='api_chatbot_story_stream'),
     path('v1/main/story/', list_story, name='api_list_story'),
 
     # 작성자 : 최재우
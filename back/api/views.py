@@ -2,26 +2,26 @@ import json
 from django.shortcuts import render
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
 from api.models import Story, User
 from django.db import connection
 from django.utils import timezone
 
 
 # Langgraph용
-from api.services.langgraph.story_flow import story_flow
+from api.services.langgraph.story_flow import story_flow, story_flow_async
+from api.services.langgraph.story_stream import stream_story_turn
 from api.models import User , Illustration, Storyparagraph, Paragraphqa
-# from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
 
 # 라이브러리 불러오기
 # AI 라이브러리 연동
-from api.services.chatbot_gemini_lib import vectordb_load, chat_query
+from api.services.chatbot_gemini_lib import chat_query, is_ready, corpus_status, DEFAULT_CORPUS
 
-
-if vectordb_load('rain') == False:
-    print('VectorDB 로드 실패')
-    exit()
+# 챗봇 벡터DB는 처음 질문할 때 로드합니다. (CHATBOT_PREWARM에 적은 코퍼스는 서버 프로세스에서만 미리 로드, api/apps.py)
 
 # @csrf_exempt
 @api_view(['GET']) # csrf_exempt 자동 적용됨
@@ -29,6 +29,17 @@ def index(request):
     return Response({"message": "DongHwa Backend API is running."})
 
 
+# 작성자: 최준혁
+# 기능: 서버 상태 확인 - 챗봇 코퍼스 로드 상태 포함 (서버는 코퍼스 로드와 상관없이 요청을 받음)
+# 마지막 수정일: 2025-07-05
+@api_view(['GET'])
+def health(request):
+    return Response({
+        "status": "ok",
+        "chatbot": {"ready": is_ready(), "default_corpus": DEFAULT_CORPUS, "corpora": corpus_status()},
+    })
+
+
 
 # # 예제 코드 : 챗봇
 # @api_view(['GET', 'POST'])
@@ -494,6 +505,7 @@ def list_story_by_status(request):
 
 # LangGraph 실행 객체 초기화
 flow = story_flow()
+async_flow = story_flow_async()
 
 # 작성자 : 최준혁
 # 기능 : story_id 생성
@@ -505,67 +517,115 @@ def get_next_story_id():
         return (row[0] or 0) + 1
 
 
+# 작성자 : 최준혁
+# 기능 : 첫 문단이면 설문 답변(answers)으로 동화 생성 요청 문장 구성
+# 마지막 수정일 : 2025-06-03
+def build_story_user_input(paragraph_no, answers, user_input):
+    if paragraph_no == "1" and answers:
+        # answers에서 개별 항목 추출
+        fairy_tale = answers.get("0")
+        theme = answers.get("1")
+        mood = answers.get("2")
+        character_name = answers.get("3")
+        character_gender = answers.get("4")
+        return f"'{fairy_tale}'풍의 이야기, Theme: {theme}, Mood: {mood}, 주인공 이름: '{character_name}', 주인공의 성별: '{character_gender}'로 동화를 만들고싶어."
+    return user_input or ""
+
+
+# 작성자 : 최준혁
+# 기능 : 요청 데이터로 LangGraph 초기 상태 구성 (story_id가 없으면 Story 새로 생성)
+#        chatbot_story / chatbot_story_async / chatbot_story_stream 공용
+# 마지막 수정일 : 2025-06-27
+def build_story_state(data):
+    user_id = data.get("user_id")
+    story_id = data.get("story_id")
+    paragraph_id = data.get("paragraph_id")
+    mode = data.get("mode", "create")
+    user_input = build_story_user_input(data.get("paragraph_no"), data.get("answers"), data.get("user_input"))
+
+    user = User.objects.get(user_id=user_id)
+
+    # story_id가 없다면 새로 생성
+    if not story_id:
+        story_id = get_next_story_id()
+        Story.objects.create(
+            story_id=story_id,
+            author_user=user,
+            title="제목 없음",
+            created_at=timezone.now(),
+            updated_at=timezone.now(),
+            status="in_progress",
+            author_name=user.nickname,
+            age=user.age
+        )
+
+    # LangGraph 초기 상태
+    initial_state = {
+        "input": user_input,
+        "user_id": user_id,
+        "story_id": story_id,
+        "age": user.age,
+        "mode": mode,
+    }
+    if mode == "edit" and paragraph_id:
+        initial_state["paragraph_id"] = paragraph_id
+    return initial_state
+
+
 # 작성자 : 최준혁
 # 기능 : news 페이지에서 호출하는 LangGraph 기반 동화 생성 API
 # 마지막 수정일 : 2025-06-03
 @api_view(['POST'])
 def chatbot_story(request):
     try:
-        user_id = request.data.get("user_id")
-        story_id = request.data.get("story_id")
-        paragraph_id = request.data.get("paragraph_id")
-        mode = request.data.get("mode", "create")
-        user_input = request.data.get("user_input")
-        paragraph_no = request.data.get("paragraph_no")
-        answers = request.data.get("answers")
-
-        # 필요한 추가 처리 로직 예시 (input 구성 등)
-        if paragraph_no == "1" and answers:
-            answers = request.data.get("answers")
-            # answers에서 개별 항목 추출
-            fairy_tale = answers.get("0")
-            theme = answers.get("1")
-            mood = answers.get("2")
-            character_name = answers.get("3")
-            character_gender = answers.get("4")
-            user_input = f"'{fairy_tale}'풍의 이야기, Theme: {theme}, Mood: {mood}, 주인공 이름: '{character_name}', 주인공의 성별: '{character_gender}'로 동화를 만들고싶어."
-        elif not user_input:
-            user_input = ""
-            
-
+        initial_state = build_story_state(request.data)
+        result = flow.invoke(initial_state)
 
-        user = User.objects.get(user_id=user_id)
+        return Response({
+            "story_id": initial_state["story_id"],
+            "paragraph": result.get("paragraph_text"),
+            "paragraph_no": result.get("paragraph_no"),
+            "version_no": result.get("version_no"),
+            "paragraph_id": result.get("paragraph_id")
+        })
 
-        # story_id가 없다면 새로 생성
-        if not story_id:
-            story_id = get_next_story_id()
-            Story.objects.create(
-                story_id=story_id,
-                author_user=user,
-                title="제목 없음",
-                created_at=timezone.now(),
-                updated_at=timezone.now(),
-                status="in_progress",
-                author_name=user.nickname,
-                age=user.age
-            )
-
-        # LangGraph 초기 상태
-        initial_state = {
-            "input": user_input,
-            "user_id": user_id,
-            "story_id": story_id,
-            "age": user.age,
-            "mode": mode,
-        }
-        if mode == "edit" and paragraph_id:
-            initial_state["paragraph_id"] = paragraph_id
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return Response({"error": str(e)}, status=500)
 
-        result = flow.invoke(initial_state)
 
+def _authenticate(request):
+    """
+    DRF 뷰와 같은 인증(DEFAULT_AUTHENTICATION_CLASSES)을 일반 Django 뷰에서 수행합니다.
+    헤더가 없으면 (None, None), 토큰이 잘못되었으면 AuthenticationFailed.
+    """
+    for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authenticator().authenticate(request)
+        if result is not None:
+            return result
+    return None, None
+
+
+# 기능 : chatbot_story의 비동기 버전 (ASGI 서버에서 실행)
+#        LLM 응답을 기다리는 동안 워커를 점유하지 않아 한 프로세스에서 여러 턴을 동시에 처리합니다.
+#        실행: uvicorn pelworld.asgi:application --port 8000
+#        요청/응답 형식과 인증은 chatbot_story와 같습니다. (DRF 뷰가 아니므로 같은 인증 클래스를 직접 실행,
+#        토큰이 없으면 그대로 진행하고 잘못된 토큰은 401)
+async def chatbot_story_async(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "POST만 지원합니다."}, status=405)
+    try:
+        request.user, request.auth = await sync_to_async(_authenticate)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({"detail": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+    try:
+        data = json.loads(request.body or b"{}")
+        initial_state = await sync_to_async(build_story_state)(data)
+        result = await async_flow.ainvoke(initial_state)
 
-        return Response({
-            "story_id": story_id,
+        return JsonResponse({
+            "story_id": initial_state["story_id"],
             "paragraph": result.get("paragraph_text"),
             "paragraph_no": result.get("paragraph_no"),
             "version_no": result.get("version_no"),
@@ -575,4 +635,44 @@ def chatbot_story(request):
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return Response({"error": str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({"error": str(e)}, status=500)
+
+# Django 4.2의 csrf_exempt 데코레이터는 동기 함수로 감싸 비동기 뷰가 깨지므로 속성만 지정
+chatbot_story_async.csrf_exempt = True
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# 기능 : chatbot_story의 스트리밍 버전 (Server-Sent Events)
+#        요청 형식은 chatbot_story와 같고, 응답으로 아래 이벤트를 차례로 보냅니다.
+#          token    {"text"}       [문장] 본문 조각 (생성되는 대로, 이어 붙이면 문단)
+#          question {"text"}       [질문] 구역이 끝나면
+#          choices  {"choices"}    [행동] 구역이 끝나면
+#          saved    {story_id, paragraph, question, choices, paragraph_no, version_no, paragraph_id}
+#                   문단 저장 완료 (최종 파싱 결과, 문단만 저장된 상태)
+#          done     {qa_saved, post_process_scheduled, (error)}
+#                   QA 저장과 후처리 예약까지 끝남 (마지막 이벤트)
+#          error    {"error"}  문단 저장 전 실패 (마지막 이벤트)
+#        등장인물/요약 갱신, 이미지, 마무리는 SchedulePostProcess가 예약한 story_post_flow에서
+#        응답과 별개로 실행되며, 클라이언트 연결이 끊겨도 중단되지 않습니다.
+@api_view(['POST'])
+def chatbot_story_stream(request):
+    try:
+        initial_state = build_story_state(request.data)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return Response({"error": str(e)}, status=500)
+
+    def event_stream():
+        for event in stream_story_turn(flow, initial_state):
+            event = dict(event)
+            event_type = event.pop("type")
+            yield _sse(event_type, event)
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"   # nginx 버퍼링 방지
+    return response
@@ -0,0 +1,116 @@
+# back/bench/bench_audio_mixer.py
+# 합성 세그먼트 100개(문단 10개)로 이루어진 가상의 동화로
+# 기존 pydub 메모리 병합 방식과 스트리밍 믹서(mix_story_audio)를 비교합니다.
+#
+# 사용법 (back/ 폴더에서, ffmpeg 필요):
+#   python bench/bench_audio_mixer.py --segments 100 --paragraphs 10
+import os
+import sys
+import math
+import time
+import wave
+import array
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydub import AudioSegment
+from tts.utils.audio_mixer import mix_story_audio, SAMPLE_RATE
+
+PAUSE_MS = 900
+
+
+def write_tone_wav(path, duration_sec, freq):
+    samples = array.array("h", (
+        int(8000 * math.sin(2 * math.pi * freq * i / SAMPLE_RATE))
+        for i in range(int(duration_sec * SAMPLE_RATE))
+    ))
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(samples.tobytes())
+
+
+def make_story(work_dir, n_segments, n_paragraphs):
+    """
+    세그먼트 WAV를 만들고 문단 번호별로 나눠 [(paragraph_no, [wav, ...]), ...]를 반환합니다.
+    """
+    random.seed(7)
+    per_para = math.ceil(n_segments / n_paragraphs)
+    story = []
+    for idx in range(n_segments):
+        path = os.path.join(work_dir, f"seg_{idx+1}.wav")
+        write_tone_wav(path, random.uniform(1.5, 4.0), random.choice([220, 330, 440]))
+        p_no = idx // per_para + 1
+        if not story or story[-1][0] != p_no:
+            story.append((p_no, []))
+        story[-1][1].append(path)
+    return story
+
+
+def run_pydub(story, out_dir):
+    """
+    기존 build_final_audio 5~6단계와 같은 방식 (세그먼트를 두 번 디코딩, += 반복)
+    """
+    segment_files = [p for _, paths in story for p in paths]
+    segments = [AudioSegment.from_wav(p) for p in segment_files]
+    pause = AudioSegment.silent(duration=PAUSE_MS)
+    combined = segments[0]
+    for seg in segments[1:]:
+        combined += pause + seg
+    combined.export(os.path.join(out_dir, "pydub_all.mp3"), format="mp3")
+
+    for p_no, paths in story:
+        combined_para = AudioSegment.from_wav(paths[0])
+        for p in paths[1:]:
+            combined_para += pause + AudioSegment.from_wav(p)
+        combined_para.export(os.path.join(out_dir, f"pydub_paragraph_{p_no}.mp3"), format="mp3")
+
+
+def run_streaming(story, out_dir):
+    plan = [
+        {
+            "paragraph_no": p_no,
+            "sources": paths,
+            "wav_out": os.path.join(out_dir, f"stream_paragraph_{p_no}.wav"),
+            "mp3_out": os.path.join(out_dir, f"stream_paragraph_{p_no}.mp3"),
+        }
+        for p_no, paths in story
+    ]
+    mix_story_audio(plan, os.path.join(out_dir, "stream_all.mp3"), pause_ms=PAUSE_MS)
+
+
+def measure(label, fn, *args):
+    tracemalloc.start()
+    start = time.time()
+    fn(*args)
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"➡️  {label:<10} {round(elapsed, 2):>6}초, 파이썬 최대 메모리 {round(peak / 1024 / 1024, 1)}MB")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="오디오 병합 벤치마크")
+    parser.add_argument("--segments", type=int, default=100)
+    parser.add_argument("--paragraphs", type=int, default=10)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="mixer_bench_")
+    try:
+        story = make_story(work_dir, args.segments, args.paragraphs)
+        total_sec = sum(
+            wave.open(p).getnframes() / SAMPLE_RATE for _, paths in story for p in paths
+        )
+        print(f"🧪 세그먼트 {args.segments}개 / 문단 {len(story)}개 / 음성 길이 {round(total_sec, 1)}초")
+        pydub_sec = measure("pydub", run_pydub, story, work_dir)
+        stream_sec = measure("streaming", run_streaming, story, work_dir)
+        print(f"📊 속도 향상: {round(pydub_sec / stream_sec, 2)}배")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,67 @@
+# back/bench/bench_tts_synthesis.py
+# Clova 스텁 서버를 상대로 문장 합성 처리량을 워커 수별로 측정합니다.
+#
+# 사용법 (back/ 폴더에서):
+#   python bench/bench_tts_synthesis.py --sentences 60 --latency 0.4 --workers 1 4 8
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clova_stub import start_stub_server
+
+
+def make_configs(n):
+    return [
+        {
+            "sentence": f"토끼는 숲속에서 {i}번째 친구를 만났어요.",
+            "speaker": "vgoeun",
+            "emotion": 0,
+            "emotion_strength": 1,
+            "pitch": 0,
+            "speed": 0,
+            "volume": 0,
+        }
+        for i in range(n)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TTS 동시 합성 벤치마크")
+    parser.add_argument("--sentences", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.4)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=0.0, help="초당 최대 요청 수 (0이면 제한 없음)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    server, url = start_stub_server(0, args.latency, args.jitter, args.fail_rate)
+
+    # 스텁 주소는 clova_tts import 전에 지정해야 합니다.
+    os.environ["CLOVA_TTS_URL"] = url
+    from tts.utils.synthesis_pool import synthesize_segments
+
+    configs = make_configs(args.sentences)
+    print(f"🧪 스텁: {url} (지연 {args.latency}±{args.jitter}초, 실패율 {args.fail_rate})")
+
+    for workers in args.workers:
+        temp_dir = tempfile.mkdtemp(prefix="tts_bench_")
+        start = time.time()
+        synthesize_segments(
+            configs,
+            temp_dir=temp_dir,
+            client_id="stub",
+            client_secret="stub",
+            max_workers=workers,
+            rate_per_sec=args.rate
+        )
+        elapsed = time.time() - start
+        print(f"➡️  워커 {workers}개: {round(elapsed, 2)}초, {round(len(configs) / elapsed, 2)} 문장/초\n")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    server.shutdown()
@@ -0,0 +1,106 @@
+# back/bench/clova_stub.py
+# 오프라인 벤치마크용 Clova TTS 스텁 서버
+# 실제 Clova API와 같은 경로/폼 파라미터를 받아, 지정한 지연 후 무음 WAV(24kHz, mono, 16bit)를 돌려줍니다.
+#
+# 사용법 (back/ 폴더에서):
+#   python bench/clova_stub.py --port 8765 --latency 0.4 --jitter 0.2 --fail-rate 0.05
+#   CLOVA_TTS_URL=http://127.0.0.1:8765/tts-premium/v1/tts python run_server.py
+import io
+import time
+import wave
+import random
+import argparse
+import threading
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_RATE = 24000
+TTS_PATH = "/tts-premium/v1/tts"
+
+
+def make_silent_wav(duration_sec, sample_rate=SAMPLE_RATE):
+    """
+    지정 길이의 무음 WAV 바이트를 생성합니다.
+    """
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(b"\x00\x00" * int(duration_sec * sample_rate))
+    return buf.getvalue()
+
+
+class ClovaStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive 지원 (클라이언트 커넥션 재사용 측정용)
+    latency = 0.4       # 기본 응답 지연(초)
+    jitter = 0.0        # 지연 편차(초)
+    fail_rate = 0.0     # 5xx 응답 비율 (재시도 동작 확인용)
+    request_count = 0
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        if self.path != TTS_PATH:
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        text = form.get("text", [""])[0]
+        audio_format = form.get("format", ["mp3"])[0]
+
+        with ClovaStubHandler._lock:
+            ClovaStubHandler.request_count += 1
+
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        if random.random() < self.fail_rate:
+            body = b'{"error": "stub transient failure"}'
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        # 글자 수에 비례한 길이의 무음 (실제 발화 길이와 비슷하게)
+        body = make_silent_wav(0.3 + 0.08 * len(text))
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/wav" if audio_format == "wav" else "audio/mpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0, latency=0.4, jitter=0.0, fail_rate=0.0):
+    """
+    스텁 서버를 백그라운드 스레드로 띄우고 (server, url)을 반환합니다.
+    port=0이면 빈 포트를 자동으로 사용합니다.
+    """
+    ClovaStubHandler.latency = latency
+    ClovaStubHandler.jitter = jitter
+    ClovaStubHandler.fail_rate = fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), ClovaStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}{TTS_PATH}"
+    return server, url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clova TTS 스텁 서버")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.4)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.latency, args.jitter, args.fail_rate)
+    print(f"🧪 Clova 스텁 서버 실행 중: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
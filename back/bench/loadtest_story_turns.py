@@ -0,0 +1,84 @@
+# back/bench/loadtest_story_turns.py
+# 동화 생성 API에 동시 요청을 보내 처리량과 지연을 측정합니다. (동기 vs 비동기 엔드포인트 비교용)
+#
+# 사용법 (서버를 띄운 뒤, back/ 폴더에서):
+#   python manage.py runserver 8000
+#   python bench/loadtest_story_turns.py --url http://127.0.0.1:8000/api/v1/chat/story/ --user-id 1
+#
+#   uvicorn pelworld.asgi:application --port 8001
+#   python bench/loadtest_story_turns.py --url http://127.0.0.1:8001/api/v1/chat/story/async/ --user-id 1
+#
+# 각 동시 사용자는 새 이야기를 만들고(story_id 없음) 이어서 --turns 만큼 문단을 생성합니다.
+import json
+import time
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+
+def post_json(url, payload, timeout):
+    body = json.dumps(payload).encode("utf-8")
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=timeout) as res:
+        return json.loads(res.read().decode("utf-8"))
+
+
+def run_user(url, user_id, turns, timeout, latencies, errors, lock):
+    story_id = None
+    for turn in range(turns):
+        payload = {"user_id": user_id, "mode": "create", "user_input": "토끼가 숲으로 모험을 떠나는 이야기"}
+        if story_id:
+            payload["story_id"] = story_id
+            payload["user_input"] = "1"
+        start = time.monotonic()
+        try:
+            data = post_json(url, payload, timeout)
+            story_id = data.get("story_id") or story_id
+            ok = "error" not in data
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            data, ok = {"error": str(e)}, False
+        elapsed = time.monotonic() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(data.get("error"))
+        if not ok:
+            break
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(len(values) * p)) - 1)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="동화 생성 API 부하 테스트")
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--concurrency", type=int, default=8, help="동시 사용자 수")
+    parser.add_argument("--turns", type=int, default=3, help="사용자당 생성할 문단 수")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    print(f"🚀 {args.url} – 동시 {args.concurrency}명 × {args.turns}턴")
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for _ in range(args.concurrency):
+            executor.submit(run_user, args.url, args.user_id, args.turns, args.timeout, latencies, errors, lock)
+    total = time.monotonic() - start
+
+    print(f"✅ 성공 {len(latencies)}건 / ❌ 실패 {len(errors)}건, 전체 {round(total, 2)}초")
+    if latencies:
+        print(f"  처리량: {round(len(latencies) / total, 2)} 턴/초")
+        print(f"  지연: p50 {round(percentile(latencies, 0.5), 2)}초, "
+              f"p95 {round(percentile(latencies, 0.95), 2)}초, 최대 {round(max(latencies), 2)}초")
+    for err in errors[:5]:
+        print(f"  ⚠️ {err}")
@@ -5,12 +5,17 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+실행 (back/ 폴더에서):
+    uvicorn pelworld.asgi:application --port 8000
 """
 
 import os
+from dotenv import load_dotenv
 
 from django.core.asgi import get_asgi_application
 
+load_dotenv()  # .env 파일 로드 (GOOGLE_API_KEY 등)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pelworld.settings')
 
 application = get_asgi_application()
@@ -0,0 +1,280 @@
+# back/tts/jobs.py
+# 오디오북 생성 백그라운드 작업 큐 (파일 기반)
+#
+# MEDIA_ROOT/tts/_jobs/
+#   queued/<job_id>.json   대기 중
+#   running/<job_id>.json  워커가 처리 중 (os.rename으로 원자적으로 가져감)
+#   done/<job_id>.json     완료 (result에 생성된 파일 경로)
+#   failed/<job_id>.json   실패 (error에 사유)
+#   story_<story_id>.lock  스토리별 진행 중 작업 id (중복 요청 방지)
+import os
+import json
+import time
+import uuid
+from django.conf import settings
+from django.utils import timezone
+
+JOBS_ROOT = os.path.join(settings.MEDIA_ROOT, "tts", "_jobs")
+JOB_STATES = ("queued", "running", "done", "failed")
+ACTIVE_STATES = ("queued", "running")
+STALE_RUNNING_SECONDS = 15 * 60   # 이 시간 동안 진행률 갱신이 없으면 워커가 죽은 것으로 보고 다시 대기열로
+
+
+def _state_dir(state):
+    path = os.path.join(JOBS_ROOT, state)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _job_path(state, job_id):
+    return os.path.join(_state_dir(state), f"{job_id}.json")
+
+
+def _lock_path(story_id):
+    os.makedirs(JOBS_ROOT, exist_ok=True)
+    return os.path.join(JOBS_ROOT, f"story_{story_id}.lock")
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def get_job(job_id):
+    """
+    job_id로 작업을 찾아 반환합니다. 없으면 None.
+    """
+    if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+        return None
+    for state in JOB_STATES:
+        job = _read_json(_job_path(state, job_id))
+        if job:
+            return job
+    # 등록 직후(잠금은 생겼지만 대기열에 올라가기 전)인 작업
+    return _read_json(_job_path("queued", job_id) + ".new")
+
+
+def enqueue_story_audio_job(user_id, story_id):
+    """
+    스토리 오디오 생성 작업을 대기열에 넣습니다.
+    같은 스토리의 작업이 이미 대기/진행 중이면 새로 만들지 않고 기존 작업을 반환합니다.
+    반환: (job, created)
+    """
+    lock_path = _lock_path(story_id)
+    for _ in range(3):
+        job_id = uuid.uuid4().hex
+        now = timezone.now().isoformat()
+        job = {
+            "job_id": job_id,
+            "story_id": story_id,
+            "user_id": user_id,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0,
+            "created_at": now,
+            "updated_at": now,
+            "ready_paragraphs": {},   # 먼저 완성된 문단 오디오 (문단 번호 → MEDIA_ROOT 기준 경로)
+            "result": None,
+            "error": None,
+        }
+        # 작업 파일(.new, 워커가 무시함)을 먼저 쓰고, 잠금은 os.link로 원자적으로 생성
+        pending_path = _job_path("queued", job_id) + ".new"
+        _write_json(pending_path, job)
+        lock_tmp = f"{lock_path}.{job_id}"
+        with open(lock_tmp, "w", encoding="utf-8") as f:
+            f.write(job_id)
+        try:
+            os.link(lock_tmp, lock_path)
+        except FileExistsError:
+            os.remove(pending_path)
+            try:
+                with open(lock_path, "r", encoding="utf-8") as f:
+                    owner = f.read().strip()
+            except FileNotFoundError:
+                continue   # 그 사이 잠금이 풀림
+            existing = get_job(owner)
+            if existing and existing["status"] in ACTIVE_STATES:
+                return existing, False
+            # 끝난 작업의 잠금이 남아 있으면 정리 후 다시 시도
+            _remove_stale_lock(lock_path, owner)
+            continue
+        finally:
+            os.remove(lock_tmp)
+
+        os.replace(pending_path, _job_path("queued", job_id))
+        return job, True
+
+    raise RuntimeError(f"작업 등록 실패: story_id={story_id}")
+
+
+def _remove_stale_lock(lock_path, stale_job_id):
+    """
+    잠금이 아직 끝난 작업(stale_job_id)을 가리킬 때만 지웁니다.
+    읽은 뒤 다른 요청이 잠금을 정리하고 새 작업으로 다시 잡았을 수 있으므로, 먼저 고유한 이름으로 옮겨(원자적)
+    옮긴 파일의 내용을 확인하고, 다른 작업의 잠금이면 되돌려 놓습니다.
+    """
+    tombstone = f"{lock_path}.stale-{uuid.uuid4().hex}"
+    try:
+        os.rename(lock_path, tombstone)
+    except OSError:
+        return   # 다른 요청이 이미 정리함
+    try:
+        with open(tombstone, "r", encoding="utf-8") as f:
+            owner = f.read().strip()
+        if owner != stale_job_id:
+            try:
+                os.link(tombstone, lock_path)
+            except FileExistsError:
+                print(f"⚠️ 스토리 잠금 복구 실패: {lock_path} (작업 {owner})")
+    finally:
+        os.remove(tombstone)
+
+
+def claim_next_job():
+    """
+    가장 오래된 대기 작업을 running으로 옮겨 가져옵니다. 다른 워커가 먼저 가져가면 다음 작업을 시도합니다.
+    """
+    queued_dir = _state_dir("queued")
+    entries = sorted(
+        (entry for entry in os.scandir(queued_dir) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in entries:
+        running_path = os.path.join(_state_dir("running"), entry.name)
+        try:
+            os.rename(entry.path, running_path)
+        except OSError:
+            continue
+        job = _read_json(running_path)
+        if job is None:
+            continue
+        return update_job(job, status="running", stage="prepare", ready_paragraphs={}, worker_pid=os.getpid())
+    return None
+
+
+def update_job(job, **fields):
+    """
+    진행 중 작업의 상태/진행률을 갱신합니다.
+    """
+    job.update(fields)
+    job["updated_at"] = timezone.now().isoformat()
+    _write_json(_job_path(job["status"], job["job_id"]), job)
+    return job
+
+
+def finish_job(job, result=None, error=None):
+    """
+    작업을 done/failed로 옮기고 스토리 잠금을 해제합니다.
+    """
+    running_path = _job_path("running", job["job_id"])
+    job["status"] = "failed" if error else "done"
+    job["stage"] = job["status"]
+    job["result"] = result
+    job["error"] = error
+    if not error:
+        job["progress"] = 100
+    update_job(job)
+    try:
+        os.remove(running_path)
+    except OSError:
+        pass
+
+    lock_path = _lock_path(job["story_id"])
+    try:
+        with open(lock_path, "r", encoding="utf-8") as f:
+            owner = f.read().strip()
+        if owner == job["job_id"]:
+            os.remove(lock_path)
+    except OSError:
+        pass
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    진행률 갱신이 오래 멈춘 running 작업(워커 비정상 종료)을 다시 대기열로 돌립니다.
+    """
+    count = 0
+    now = time.time()
+    for entry in os.scandir(_state_dir("running")):
+        if not entry.name.endswith(".json"):
+            continue
+        if now - entry.stat().st_mtime < STALE_RUNNING_SECONDS:
+            continue
+        job = _read_json(entry.path)
+        if job is None:
+            continue
+        job.update(status="queued", stage="queued", progress=0)
+        _write_json(_job_path("queued", job["job_id"]), job)
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+        count += 1
+    return count
+
+
+def run_story_audio_job(job):
+    """
+    작업 하나를 실행합니다: 스토리 문단을 읽어 build_final_audio를 호출하고 진행률과 완성된 문단을 기록합니다.
+    """
+    from decouple import config
+    from api.models import Story, Storyparagraph
+    from tts.main import build_final_audio
+
+    story = Story.objects.get(story_id=job["story_id"])
+    paragraphs = Storyparagraph.objects.filter(
+        story=story, paragraph_no__gte=1, paragraph_no__lte=10
+    ).order_by("paragraph_no")
+    text_blocks = [p.content_text for p in paragraphs]
+    if not text_blocks:
+        raise RuntimeError("문단 1~10을 찾을 수 없습니다.")
+
+    folder = f"tts_user{job['user_id']}_story{story.story_id}"
+    save_dir = os.path.join(settings.MEDIA_ROOT, "tts", folder)
+    os.makedirs(save_dir, exist_ok=True)
+
+    last_report = {"stage": None, "progress": -1}
+
+    def on_progress(stage, percent):
+        # 같은 단계에서 진행률이 바뀔 때만 기록
+        if stage == last_report["stage"] and percent == last_report["progress"]:
+            return
+        last_report.update(stage=stage, progress=percent)
+        update_job(job, stage=stage, progress=percent)
+
+    def on_paragraph_ready(p_no, p_path):
+        # 문단이 완성될 때마다 기록 → 스트리밍 API가 바로 내보냄
+        ready = dict(job.get("ready_paragraphs") or {})
+        ready[str(p_no)] = f"tts/{folder}/{os.path.basename(p_path)}"
+        update_job(job, ready_paragraphs=ready)
+
+    full_audio_path, paragraph_paths = build_final_audio(
+        text="\n".join(text_blocks),
+        save_path=os.path.join(save_dir, f"{folder}_all.mp3"),
+        gemini_api_key=config('GEMINI_TTS_API_KEY'),
+        clova_client_id=config('CSS_API_CLIENT_ID'),
+        clova_client_secret=config('CSS_API_CLIENT_SECRET'),
+        character_list=story.characters,
+        progress_callback=on_progress,
+        on_paragraph_ready=on_paragraph_ready
+    )
+
+    # 결과는 MEDIA_ROOT 기준 상대 경로로 저장 (URL은 상태 조회 시 생성)
+    return {
+        "full_audio": f"tts/{folder}/{os.path.basename(full_audio_path)}",
+        "paragraphs": {
+            str(p_no): f"tts/{folder}/{os.path.basename(p_path)}"
+            for p_no, p_path in paragraph_paths.items()
+        },
+    }
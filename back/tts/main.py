@@ -1,18 +1,94 @@
 # back/tts/main.py
 import os
+import json
 import time
+import shutil
+import hashlib
 from collections import defaultdict
-from .utils.text_processor import split_text_into_sentences
+from .utils.text_processor import split_texts_into_sentences
 from .utils.text_ana_gen import analyze_texts_with_gemini
-from .utils.clova_tts import synthesize_clova_tts
-from pydub import AudioSegment
+from .utils.synthesis_pool import synthesize_segments
+from .utils.segment_cache import get_segment_cache
+from .utils.audio_mixer import mix_story_audio, mix_paragraph_audio
 
-def build_final_audio(text, save_path, gemini_api_key, clova_client_id, clova_client_secret, character_list=""):
+# 문단 산출물 형식이 바뀌면 올려서 기존 산출물을 무효화합니다.
+PARAGRAPH_ARTIFACT_VERSION = 1
+PAUSE_MS = 900  # 세그먼트 사이 지연
+
+
+def voice_fingerprint(character_list):
+    """
+    화자/음성 배정에 쓰이는 등장인물 목록의 지문. 줄 앞뒤 공백과 빈 줄은 무시합니다.
+    """
+    lines = [line.strip() for line in (character_list or "").splitlines() if line.strip()]
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def paragraph_fingerprint(paragraph_text, character_list=""):
+    """
+    문단 텍스트와 등장인물 목록의 지문(sha256). 둘 다 같으면 기존 문단 오디오를 재사용합니다.
+    (등장인물 이름/성별이 바뀌면 화자 배정이 달라지므로 다시 만듦)
+    """
+    raw = f"v{PARAGRAPH_ARTIFACT_VERSION}\n{voice_fingerprint(character_list)}\n{paragraph_text.strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def story_fingerprint(entries):
+    """
+    문단 번호 순서대로 문단 지문을 이어 만든 전체 오디오 지문.
+    """
+    joined = "".join(entries[p_no]["fingerprint"] for p_no in sorted(entries, key=int))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"paragraphs": {}}
+
+
+def save_manifest(manifest_path, manifest):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+# 진행률 계산용 단계별 비중 (합계 100)
+PROGRESS_STAGES = [("prepare", 5), ("analyze", 25), ("synthesize", 50), ("mix", 15), ("finalize", 5)]
+
+
+def make_progress_reporter(progress_callback):
     """
-    전체 텍스트 입력 → 문단별 문장 분리(매핑) → 감정 분석 → TTS 생성
-    → 전체 오디오 병합(지연 포함) → 문단별 오디오 병합(매핑 기반) → 임시파일 삭제 후 반환
+    단계 이름과 단계 내 진행 비율(0~1)을 전체 진행률(%)로 바꿔 progress_callback(stage, percent)에 전달합니다.
+    """
+    offsets, acc = {}, 0
+    for stage, weight in PROGRESS_STAGES:
+        offsets[stage] = (acc, weight)
+        acc += weight
+
+    def report(stage, fraction=0.0):
+        if progress_callback is None:
+            return
+        start, weight = offsets[stage]
+        progress_callback(stage, int(start + weight * min(max(fraction, 0.0), 1.0)))
+    return report
+
+
+def build_final_audio(text, save_path, gemini_api_key, clova_client_id, clova_client_secret, character_list="", max_workers=None, cache_dir=None, progress_callback=None, on_paragraph_ready=None):
+    """
+    전체 텍스트 입력 → 문단별 지문(텍스트 + 등장인물 목록) 비교 → (변경된 문단만) 문장 분리 → 감정 분석 → TTS 생성
+    → 문단별 오디오 병합(세그먼트가 준비되는 대로) → 전체 오디오 스트리밍 병합(지연 포함) → 임시파일 삭제 후 반환
+    문단 오디오와 지문은 {prefix}_manifest.json에 기록되어, 문단 하나만 수정되면 그 문단만 다시 만듭니다.
+    문장 세그먼트는 cache_dir(기본: 저장 폴더 옆 _segment_cache)에 캐시되어, 같은 문장+음성 설정은 다시 합성하지 않습니다.
+    progress_callback(stage, percent)가 주어지면 단계별 진행률을 알려줍니다. (백그라운드 작업 상태 표시용)
+    on_paragraph_ready(paragraph_no, mp3 경로)가 주어지면 문단 오디오가 완성되는 즉시 문단 순서대로 알려줍니다.
     """
     total_start = time.time()
+    report = make_progress_reporter(progress_callback)
+    report("prepare")
 
     # 사용자 및 스토리 ID 추출
     base_dir = os.path.dirname(save_path)
@@ -20,109 +96,212 @@ def build_final_audio(text, save_path, gemini_api_key, clova_client_id, clova_cl
     file_prefix = filename if not filename.endswith("_all") else filename[:-4]
 
     all_audio_path = os.path.join(base_dir, f"{file_prefix}_all.mp3")
+    manifest_path = os.path.join(base_dir, f"{file_prefix}_manifest.json")
+    pcm_dir = os.path.join(base_dir, "_paragraphs")   # 재결합용 무손실 문단 오디오
 
-    # 이미 생성된 전체 파일이 있다면 기존 문단별 파일 재사용
-    if os.path.exists(all_audio_path):
-        print(f"⚠️ 이미 존재하는 파일: {all_audio_path} → 재사용")
-        paragraph_paths = {}
-        for i in range(1, 11):
-            para_path = os.path.join(base_dir, f"{file_prefix}_paragraph_{i}.mp3")
-            if os.path.exists(para_path):
-                paragraph_paths[i] = para_path
-        return all_audio_path, paragraph_paths
-
-    # 1. 문단별 텍스트 분리
+    # 1. 문단별 텍스트 분리 및 지문 비교
     raw_paras = text.strip().split("\n")
     paragraphs = [p for p in raw_paras if p.strip()]
 
-    # 2. 문장-문단 매핑
+    manifest = load_manifest(manifest_path)
+    old_entries = manifest.get("paragraphs", {})
+    new_entries = {}
+    changed_paras = []  # [(paragraph_no, text), ...]
+    for para_no, para in enumerate(paragraphs, start=1):
+        fingerprint = paragraph_fingerprint(para, character_list)
+        entry = old_entries.get(str(para_no))
+        if (
+            entry and entry.get("fingerprint") == fingerprint
+            and os.path.exists(os.path.join(base_dir, entry["mp3"]))
+            and os.path.exists(os.path.join(pcm_dir, entry["wav"]))
+        ):
+            new_entries[str(para_no)] = entry
+        else:
+            changed_paras.append((para_no, para))
+            new_entries[str(para_no)] = {
+                "fingerprint": fingerprint,
+                "mp3": f"{file_prefix}_paragraph_{para_no}.mp3",
+                "wav": f"{file_prefix}_paragraph_{para_no}.wav",
+            }
+
+    paragraph_paths = {
+        int(p_no): os.path.join(base_dir, entry["mp3"])
+        for p_no, entry in new_entries.items()
+    }
+
+    # 모든 문단이 그대로이고 전체 파일도 있다면 재사용
+    if not changed_paras and manifest.get("full_fingerprint") == story_fingerprint(new_entries) and os.path.exists(all_audio_path):
+        print(f"⚠️ 변경된 문단 없음: {all_audio_path} → 재사용")
+        if on_paragraph_ready:
+            for p_no in sorted(paragraph_paths):
+                on_paragraph_ready(p_no, paragraph_paths[p_no])
+        report("finalize", 1.0)
+        return all_audio_path, paragraph_paths
+    print(f"📝 다시 만들 문단: {[p_no for p_no, _ in changed_paras]} / 재사용 문단: {len(paragraphs) - len(changed_paras)}개")
+
+    # 2. 문장-문단 매핑 (변경된 문단만, 저장 시점에 미리 분리해 둔 결과가 있으면 재사용)
     sentence_paragraph_map = []  # [(sentence, paragraph_no), ...]
     all_sentences = []
-    for para_no, para in enumerate(paragraphs, start=1):
-        sents = split_text_into_sentences(para)
+    split_results = split_texts_into_sentences([para for _, para in changed_paras])
+    for (para_no, _), sents in zip(changed_paras, split_results):
         for sent in sents:
             sentence_paragraph_map.append((sent, para_no))
             all_sentences.append(sent)
-    print(f"✅ 전체 문장 수: {len(all_sentences)}")
+    print(f"✅ 분석할 문장 수: {len(all_sentences)}")
 
     # 3. 감정 및 화자 설정 생성
-    print("🔍 감정 분석 중...")
-    configs = analyze_texts_with_gemini(
-        all_sentences,
-        api_key=gemini_api_key,
-        characters=character_list
-    )
-    if len(configs) != len(all_sentences):
-        raise RuntimeError(
-            f"Gemini 설정 개수 불일치: {len(configs)} vs {len(all_sentences)}"
+    report("analyze")
+    configs = []
+    if all_sentences:
+        print("🔍 감정 분석 중...")
+        configs = analyze_texts_with_gemini(
+            all_sentences,
+            api_key=gemini_api_key,
+            characters=character_list
         )
+        if len(configs) != len(all_sentences):
+            raise RuntimeError(
+                f"Gemini 설정 개수 불일치: {len(configs)} vs {len(all_sentences)}"
+            )
 
-    # 4. 개별 WAV 세그먼트 생성
+    # 4. 개별 WAV 세그먼트 준비 (캐시 적중분은 재사용, 누락분만 동시 합성)
+    #    문단의 세그먼트가 모두 준비되면 합성이 끝나기를 기다리지 않고 그 문단 오디오부터 만들어 내보냅니다.
+    report("synthesize")
     print("🎙️ TTS 합성 시작...")
     temp_dir = os.path.join(base_dir, "_segments")
-    os.makedirs(temp_dir, exist_ok=True)
-    segment_files = []
-
-    for idx, cfg in enumerate(configs):
-        wav_path = os.path.join(temp_dir, f"seg_{idx+1}.wav")
-        print(f"   - [{idx+1}] speaker={cfg['speaker']}, emotion={cfg['emotion']}")
-        success = synthesize_clova_tts(
-            text=cfg["sentence"],
-            speaker=cfg["speaker"],
-            emotion=cfg["emotion"],
-            emotion_strength=cfg["emotion_strength"],
-            pitch=cfg["pitch"],
-            speed=cfg["speed"],
-            volume=cfg["volume"],
-            output_path=wav_path,
-            client_id=clova_client_id,
-            client_secret=clova_client_secret
-        )
-        if not success:
-            raise RuntimeError(f"TTS 합성 실패: 문장 #{idx+1} – {cfg['sentence']}")
-        segment_files.append(wav_path)
-
-    # 5. 전체 오디오 병합 및 저장 (지연 포함)
-    print("🎧 전체 오디오 병합 중 (지연 포함)...")
-    segments = [AudioSegment.from_wav(p) for p in segment_files]
-    pause = AudioSegment.silent(duration=900)  # 500ms pause between segments
-    combined = segments[0]
-    for seg in segments[1:]:
-        combined += pause + seg
-    combined.export(all_audio_path, format="mp3")
-    print(f"✅ 전체 오디오 저장: {all_audio_path}")
-
-    # 6. 문단별 오디오 병합 (매핑 기반, 지연 포함)
-    print("🔗 문단별 오디오 생성 중 (지연 포함)...")
-    paragraph_to_idxs = defaultdict(list)
-    for i, (_, p_no) in enumerate(sentence_paragraph_map):
-        paragraph_to_idxs[p_no].append(i)
-
-    paragraph_paths = {}
-    for p_no, idxs in paragraph_to_idxs.items():
-        if not idxs:
-            continue
-        para_path = os.path.join(base_dir, f"{file_prefix}_paragraph_{p_no}.mp3")
-        # 첫 번째 세그먼트 로드
-        combined_para = AudioSegment.from_wav(segment_files[idxs[0]])
-        # 나머지 세그먼트 병합 (pause 추가)
-        for i in idxs[1:]:
-            combined_para += pause + AudioSegment.from_wav(segment_files[i])
-        combined_para.export(para_path, format="mp3")
-        paragraph_paths[p_no] = para_path
-        print(f"  - 문단 {p_no} 저장: {para_path}")
-
-    # 7. 임시 파일 삭제
-    for f in segment_files:
-        try:
-            os.remove(f)
-        except OSError:
-            pass
+    retry_dir = os.path.join(base_dir, "_segments_retry")
+    cache = get_segment_cache(cache_dir or os.path.join(os.path.dirname(base_dir), "_segment_cache"))
+    cache_keys = [cache.make_key(cfg) for cfg in configs]
+    cache.pin(cache_keys)
     try:
-        os.rmdir(temp_dir)
-    except OSError:
-        pass
+        segment_files = [cache.get(key) for key in cache_keys]
+        os.makedirs(pcm_dir, exist_ok=True)
+
+        paragraph_to_idxs = defaultdict(list)
+        for i, (_, p_no) in enumerate(sentence_paragraph_map):
+            paragraph_to_idxs[p_no].append(i)
+
+        changed_nos = {p_no for p_no, _ in changed_paras}
+        for p_no in changed_nos:
+            if not paragraph_to_idxs.get(p_no):
+                # 문장이 없는 문단은 산출물 없이 건너뜀
+                new_entries.pop(str(p_no))
+                paragraph_paths.pop(p_no)
+        if not paragraph_paths:
+            raise RuntimeError("합성할 문장이 없습니다.")
+
+        para_order = sorted(paragraph_paths)
+        next_para = 0
+
+        def resynthesize_missing(idxs):
+            """
+            병합 직전에 세그먼트를 다시 확인해, 다른 프로세스의 캐시 정리로 지워진 세그먼트는 다시 합성합니다.
+            """
+            missing = defaultdict(list)
+            for i in idxs:
+                if cache.refresh(cache_keys[i]) is None:
+                    missing[cache_keys[i]].append(i)
+            if not missing:
+                return
+            print(f"♻️ 지워진 세그먼트 다시 합성: {len(missing)}건")
+            keys = list(missing)
+            files, _ = synthesize_segments(
+                [configs[missing[key][0]] for key in keys],
+                temp_dir=retry_dir,
+                client_id=clova_client_id,
+                client_secret=clova_client_secret,
+                max_workers=max_workers
+            )
+            for key, path in zip(keys, files):
+                cached_path = cache.put(key, path)
+                for i in missing[key]:
+                    segment_files[i] = cached_path
+
+        def flush_ready_paragraphs():
+            """
+            앞 문단부터 순서대로, 세그먼트가 모두 준비된 문단을 병합하고 on_paragraph_ready로 알립니다.
+            """
+            nonlocal next_para
+            while next_para < len(para_order):
+                p_no = para_order[next_para]
+                if p_no in changed_nos:
+                    if any(segment_files[i] is None for i in paragraph_to_idxs[p_no]):
+                        return
+                    resynthesize_missing(paragraph_to_idxs[p_no])
+                    duration = mix_paragraph_audio(
+                        [segment_files[i] for i in paragraph_to_idxs[p_no]],
+                        wav_out=os.path.join(pcm_dir, new_entries[str(p_no)]["wav"]),
+                        mp3_out=paragraph_paths[p_no],
+                        pause_ms=PAUSE_MS
+                    )
+                    print(f"  - 문단 {p_no} 저장: {paragraph_paths[p_no]} ({round(duration, 1)}초)")
+                next_para += 1
+                if on_paragraph_ready:
+                    on_paragraph_ready(p_no, paragraph_paths[p_no])
+
+        # 같은 문장+설정이 여러 번 나오면 한 번만 합성
+        key_to_idxs = defaultdict(list)
+        for idx, path in enumerate(segment_files):
+            if path is None:
+                key_to_idxs[cache_keys[idx]].append(idx)
+        print(f"🗃️ 세그먼트 캐시: 적중 {len(configs) - sum(p is None for p in segment_files)}건 / 합성 필요 {len(key_to_idxs)}건")
+
+        # 재사용 문단과 캐시만으로 완성되는 앞 문단은 바로 내보냄
+        flush_ready_paragraphs()
+
+        if key_to_idxs:
+            miss_keys = list(key_to_idxs)
+
+            def on_segment_ready(miss_idx, path):
+                key = miss_keys[miss_idx]
+                cached_path = cache.put(key, path)
+                for i in key_to_idxs[key]:
+                    segment_files[i] = cached_path
+                flush_ready_paragraphs()
+
+            synthesize_segments(
+                [configs[key_to_idxs[key][0]] for key in miss_keys],
+                temp_dir=temp_dir,
+                client_id=clova_client_id,
+                client_secret=clova_client_secret,
+                max_workers=max_workers,
+                on_progress=lambda done, total: report("synthesize", done / total),
+                on_segment_ready=on_segment_ready
+            )
+
+        # 5. 문단 WAV(재사용 + 새로 만든 문단)를 지연과 함께 이어 전체 트랙 생성
+        report("mix")
+        print("🎧 전체 오디오 스트리밍 병합 중 (지연 포함)...")
+        mix_plan = [
+            {"paragraph_no": p_no, "sources": [os.path.join(pcm_dir, new_entries[str(p_no)]["wav"])]}
+            for p_no in para_order
+        ]
+        duration = mix_story_audio(mix_plan, all_audio_path, pause_ms=PAUSE_MS)
+        print(f"✅ 전체 오디오 저장: {all_audio_path} ({round(duration, 1)}초)")
+    finally:
+        # 임시 폴더 정리 및 캐시 용량 관리 (세그먼트 자체는 캐시에 남김)
+        cache.unpin(cache_keys)
+        cache.evict()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        shutil.rmtree(retry_dir, ignore_errors=True)
+        print(f"📊 세그먼트 캐시 통계: {cache.stats()}")
+
+    # 6. 더 이상 없는 문단의 산출물 삭제 후 매니페스트 기록
+    report("finalize")
+    for p_no, entry in old_entries.items():
+        if p_no not in new_entries:
+            for path in (os.path.join(base_dir, entry["mp3"]), os.path.join(pcm_dir, entry["wav"])):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    manifest = {
+        "paragraphs": new_entries,
+        "full_fingerprint": story_fingerprint(new_entries),
+    }
+    save_manifest(manifest_path, manifest)
 
+    report("finalize", 1.0)
     total_end = time.time()
     print(f"⏱️ 총 소요 시간: {round(total_end - total_start, 2)}초")
 
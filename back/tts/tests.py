@@ -1,3 +1,428 @@
-from django.test import TestCase
+import os
+import time
+import wave
+import shutil
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, SimpleTestCase
+
+from api.services import llm_cache, llm_gateway
+from tts import jobs
+from tts.main import build_final_audio, load_manifest
+from tts.utils.qa_audio import ranged_file_response
+from tts.utils.text_ana_gen import analyze_texts_with_gemini
+from tts.utils.synthesis_pool import RateLimiter, synthesize_segments
+from tts.utils.segment_cache import SegmentCache
+from tts.utils.audio_mixer import SAMPLE_RATE, CHANNELS, SAMPLE_WIDTH
+
+
+def write_wav(path, frames=240):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(CHANNELS)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(b"\x00" * frames * SAMPLE_WIDTH * CHANNELS)
+    return path
+
+
+# 작성자: 최준혁
+# 기능: 문장 동시 합성 - 완료 순서와 상관없이 결과가 문장 순서대로인지, 완료 콜백은 호출 스레드에서 한 번씩 오는지,
+#       동시 요청 수와 요청 간격이 제한되는지 확인 (Clova 요청은 가짜로 바꿈)
+# 마지막 수정일: 2025-07-07
+class SynthesisPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.failing = set()
+
+        patches = [
+            mock.patch("tts.utils.synthesis_pool.synthesize_clova_tts", side_effect=self._fake_tts),
+            mock.patch("tts.utils.synthesis_pool.get_clova_client"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _fake_tts(self, text, output_path, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01 * (5 - int(text)))   # 앞 문장일수록 늦게 끝남
+        with self.lock:
+            self.active -= 1
+        if text in self.failing:
+            return False
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return True
+
+    def _configs(self, count):
+        return [
+            {"sentence": str(i), "speaker": "nara", "emotion": 0, "emotion_strength": 1,
+             "pitch": 0, "speed": 0, "volume": 0}
+            for i in range(count)
+        ]
+
+    def test_results_keep_sentence_order(self):
+        ready, progress = [], []
+        caller = threading.get_ident()
+
+        def on_segment_ready(idx, path):
+            self.assertEqual(threading.get_ident(), caller)
+            ready.append(idx)
+
+        files, latencies = synthesize_segments(
+            self._configs(5), self.temp_dir, "id", "secret", max_workers=2, rate_per_sec=0,
+            on_progress=lambda done, total: progress.append((done, total)),
+            on_segment_ready=on_segment_ready,
+        )
+
+        for i, path in enumerate(files):
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), str(i))
+        self.assertEqual([item["index"] for item in latencies], [1, 2, 3, 4, 5])
+        self.assertEqual(sorted(ready), [0, 1, 2, 3, 4])
+        self.assertNotEqual(ready, [0, 1, 2, 3, 4])   # 끝난 순서대로 넘겨줌
+        self.assertEqual(progress, [(n, 5) for n in range(1, 6)])
+        self.assertLessEqual(self.max_active, 2)
+
+    def test_failure_raises_and_skips_callback(self):
+        self.failing = {"1"}
+        ready = []
+        with self.assertRaises(RuntimeError):
+            synthesize_segments(
+                self._configs(3), self.temp_dir, "id", "secret", max_workers=1, rate_per_sec=0,
+                on_segment_ready=lambda idx, path: ready.append(idx),
+            )
+        self.assertNotIn(1, ready)
+
+    def test_rate_limiter_spaces_requests(self):
+        limiter = RateLimiter(20)   # 0.05초 간격
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - started, 0.14)
+        self.assertEqual(RateLimiter(0).interval, 0.0)
+
+
+# 작성자: 최준혁
+# 기능: 문장 세그먼트 캐시 - 적중/누락, 고정된 항목과 다른 프로세스가 최근 사용한 항목은 삭제하지 않는지 확인
+# 마지막 수정일: 2025-07-07
+class SegmentCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        self.cache = SegmentCache(self.cache_dir, max_bytes=10, grace_seconds=600)
+
+    def _put(self, cache, key, size=8):
+        src = os.path.join(self.cache_dir, f"src_{key}")
+        with open(src, "wb") as f:
+            f.write(b"x" * size)
+        return cache.put(key, src)
+
+    def _age(self, key, seconds=3600):
+        old = time.time() - seconds
+        os.utime(self.cache.path_for(key), (old, old))
+
+    def test_miss_then_hit(self):
+        cfg = {"sentence": " 토끼가 웃었어요. ", "speaker": "nara", "speed": 0}
+        key = SegmentCache.make_key(cfg)
+        self.assertEqual(key, SegmentCache.make_key({**cfg, "sentence": "토끼가 웃었어요."}))
+        self.assertNotEqual(key, SegmentCache.make_key({**cfg, "speaker": "vgoeun"}))
+
+        self.assertIsNone(self.cache.get(key))
+        path = self._put(self.cache, key)
+        self.assertEqual(self.cache.get(key), path)
+        self.assertEqual((self.cache.stats()["hits"], self.cache.stats()["misses"]), (1, 1))
+
+    def test_evict_skips_pinned(self):
+        self._put(self.cache, "aa1")
+        self._put(self.cache, "bb2")
+        self._age("aa1")
+        self._age("bb2")
+        self.cache.pin(["aa1"])
+
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertTrue(os.path.exists(self.cache.path_for("aa1")))
+        self.assertFalse(os.path.exists(self.cache.path_for("bb2")))
+
+    def test_evict_skips_segment_used_by_other_process(self):
+        self._put(self.cache, "aa1")
+        self._put(self.cache, "bb2")
+        self._age("aa1")
+        self._age("bb2")
+        # 다른 프로세스(인스턴스)가 aa1을 고정 → mtime 갱신
+        SegmentCache(self.cache_dir, max_bytes=10, grace_seconds=600).pin(["aa1"])
+
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertTrue(os.path.exists(self.cache.path_for("aa1")))
+        self.assertIsNone(self.cache.refresh("bb2"))
+        self.assertIsNotNone(self.cache.refresh("aa1"))
+
+
+# 작성자: 최준혁
+# 기능: 오디오북 생성 - 문단 지문(매니페스트)이 같은 문단은 재사용하고 바뀐 문단만 다시 만드는지 확인
+#       (등장인물 목록이 바뀌면 문단 텍스트가 같아도 다시 만듦)
+#       (문장 분리/감정 분석/Clova 합성은 가짜로 바꾸고, 병합은 실제 WAV로 실행)
+# 마지막 수정일: 2025-07-07
+class BuildFinalAudioTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.save_path = os.path.join(self.root, "story", "tts_story_all.mp3")
+        os.makedirs(os.path.dirname(self.save_path))
+        self.synthesized = []
+
+        def synthesize(configs, temp_dir, on_segment_ready=None, **kwargs):
+            files = []
+            for idx, cfg in enumerate(configs):
+                self.synthesized.append(cfg["sentence"])
+                files.append(write_wav(os.path.join(temp_dir, f"seg_{idx + 1}.wav")))
+                if on_segment_ready:
+                    on_segment_ready(idx, files[-1])
+            return files, [None] * len(configs)
+
+        patches = [
+            mock.patch("tts.main.split_texts_into_sentences", side_effect=lambda texts: [[t] for t in texts]),
+            mock.patch("tts.main.analyze_texts_with_gemini",
+                       side_effect=lambda sentences, **kwargs: [{"sentence": s, "speaker": "nara"} for s in sentences]),
+            mock.patch("tts.main.synthesize_segments", side_effect=synthesize),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _build(self, paragraphs, character_list="1. 메리 : 여자, 토끼"):
+        ready = []
+        _, paths = build_final_audio(
+            "\n".join(paragraphs), self.save_path, "gemini", "id", "secret", character_list=character_list,
+            cache_dir=os.path.join(self.root, "_segment_cache"),
+            on_paragraph_ready=lambda p_no, path: ready.append(p_no),
+        )
+        return paths, ready
+
+    def test_rebuilds_only_changed_paragraph(self):
+        paths, ready = self._build(["메리가 웃어요.", "여우가 와요.", "둘이 놀아요."])
+        self.assertEqual(sorted(paths), [1, 2, 3])
+        self.assertEqual(ready, [1, 2, 3])
+        self.assertEqual(len(self.synthesized), 3)
+        first_manifest = load_manifest(os.path.join(self.root, "story", "tts_story_manifest.json"))
+
+        self.synthesized.clear()
+        _, ready = self._build(["메리가 웃어요.", "여우가 도망가요.", "둘이 놀아요."])
+        self.assertEqual(self.synthesized, ["여우가 도망가요."])
+        self.assertEqual(ready, [1, 2, 3])
+        manifest = load_manifest(os.path.join(self.root, "story", "tts_story_manifest.json"))
+        self.assertEqual(manifest["paragraphs"]["1"], first_manifest["paragraphs"]["1"])
+        self.assertNotEqual(manifest["paragraphs"]["2"], first_manifest["paragraphs"]["2"])
+
+    def test_character_change_rebuilds_paragraphs(self):
+        self._build(["메리가 웃어요.", "여우가 와요."])
+        self.synthesized.clear()
+
+        # 문단 텍스트는 그대로, 등장인물만 바뀜 (메리가 남자로) → 화자 배정이 달라질 수 있어 다시 분석
+        analyze = mock.patch("tts.main.analyze_texts_with_gemini",
+                             side_effect=lambda sentences, **kwargs: [{"sentence": s, "speaker": "vdaeseong"} for s in sentences])
+        with analyze as analyzed:
+            _, ready = self._build(["메리가 웃어요.", "여우가 와요."], character_list="1. 메리 : 남자, 토끼")
+        self.assertEqual(analyzed.call_args.kwargs["characters"], "1. 메리 : 남자, 토끼")
+        self.assertEqual(sorted(self.synthesized), ["메리가 웃어요.", "여우가 와요."])
+        self.assertEqual(ready, [1, 2])
+
+        # 줄 앞뒤 공백만 다르면 재사용
+        self.synthesized.clear()
+        self._build(["메리가 웃어요.", "여우가 와요."], character_list="  1. 메리 : 남자, 토끼  \n")
+        self.assertEqual(self.synthesized, [])
+
+    def test_unchanged_story_reuses_full_audio(self):
+        self._build(["메리가 웃어요.", "여우가 와요."])
+        self.synthesized.clear()
+        with mock.patch("tts.main.analyze_texts_with_gemini") as analyze:
+            _, ready = self._build(["메리가 웃어요.", "여우가 와요."])
+        analyze.assert_not_called()
+        self.assertEqual(self.synthesized, [])
+        self.assertEqual(ready, [1, 2])
+
+    def test_resynthesizes_segment_removed_by_other_process(self):
+        self._build(["메리가 웃어요."])
+        cache = SegmentCache(os.path.join(self.root, "_segment_cache"), max_bytes=1024 * 1024)
+        key = SegmentCache.make_key({"sentence": "메리가 웃어요.", "speaker": "nara"})
+
+        # 캐시 적중 뒤 병합 전에 다른 프로세스가 세그먼트를 지운 경우
+        real_get = SegmentCache.get
+
+        def get_then_remove(cache_self, k):
+            path = real_get(cache_self, k)
+            if path:
+                os.remove(path)
+            return path
+
+        self.synthesized.clear()
+        with mock.patch.object(SegmentCache, "get", get_then_remove):
+            # 문단 2의 문장은 처음 빌드한 문단 1과 같아 캐시에 있음
+            paths, _ = self._build(["여우가 와요.", "메리가 웃어요."])
+        self.assertEqual(sorted(self.synthesized), ["메리가 웃어요.", "여우가 와요."])
+        self.assertTrue(os.path.exists(cache.path_for(key)))
+        self.assertTrue(os.path.exists(paths[2]))
+
+
+# 작성자: 최준혁
+# 기능: 오디오북 작업 큐 - queued → running → done/failed 상태 변경, 스토리별 중복 등록 방지(끝난 잠금을 동시에 정리하는 경우 포함),
+#       멈춘 작업 재등록
+# 마지막 수정일: 2025-07-07
+class StoryAudioJobTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        patcher = mock.patch.object(jobs, "JOBS_ROOT", root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queued_running_done(self):
+        job, created = jobs.enqueue_story_audio_job(user_id=1, story_id=7)
+        self.assertTrue(created)
+        self.assertEqual(jobs.get_job(job["job_id"])["status"], "queued")
+
+        same, created = jobs.enqueue_story_audio_job(user_id=1, story_id=7)
+        self.assertFalse(created)
+        self.assertEqual(same["job_id"], job["job_id"])
+
+        running = jobs.claim_next_job()
+        self.assertEqual((running["job_id"], running["status"]), (job["job_id"], "running"))
+        self.assertIsNone(jobs.claim_next_job())
+
+        jobs.finish_job(running, result={"full_audio": "tts/a.mp3"})
+        done = jobs.get_job(job["job_id"])
+        self.assertEqual((done["status"], done["progress"]), ("done", 100))
+
+        # 끝난 뒤에는 같은 스토리도 새 작업으로 등록
+        _, created = jobs.enqueue_story_audio_job(user_id=1, story_id=7)
+        self.assertTrue(created)
+
+    def test_concurrent_enqueue_against_finished_lock(self):
+        # 끝난 작업의 잠금이 남아 있는 상태에서 두 요청이 동시에 들어온 경우
+        finished, _ = jobs.enqueue_story_audio_job(user_id=1, story_id=7)
+        jobs.finish_job(jobs.claim_next_job(), result={})
+        with open(jobs._lock_path(7), "w", encoding="utf-8") as f:
+            f.write(finished["job_id"])
+
+        # 두 번째 요청이 끝난 작업을 읽은 직후, 첫 번째 요청이 잠금을 정리하고 새 작업을 등록
+        real_get_job = jobs.get_job
+        first = {}
+
+        def get_job_then_other_request(job_id):
+            job = real_get_job(job_id)
+            if job_id == finished["job_id"] and "started" not in first:
+                first["started"] = True   # 첫 번째 요청 안에서 다시 끼어들지 않도록
+                first["result"] = jobs.enqueue_story_audio_job(user_id=2, story_id=7)
+            return job
+
+        with mock.patch.object(jobs, "get_job", side_effect=get_job_then_other_request):
+            second, created = jobs.enqueue_story_audio_job(user_id=1, story_id=7)
+
+        first_job, first_created = first["result"]
+        self.assertTrue(first_created)
+        self.assertFalse(created)
+        self.assertEqual(second["job_id"], first_job["job_id"])
+        with open(jobs._lock_path(7), encoding="utf-8") as f:
+            self.assertEqual(f.read(), first_job["job_id"])
+        self.assertEqual(len(os.listdir(jobs._state_dir("queued"))), 1)
+
+    def test_failed(self):
+        job, _ = jobs.enqueue_story_audio_job(user_id=1, story_id=8)
+        jobs.finish_job(jobs.claim_next_job(), error="Clova 오류")
+        failed = jobs.get_job(job["job_id"])
+        self.assertEqual((failed["status"], failed["error"]), ("failed", "Clova 오류"))
+
+    def test_requeue_stale_running_job(self):
+        job, _ = jobs.enqueue_story_audio_job(user_id=1, story_id=9)
+        jobs.claim_next_job()
+        old = time.time() - jobs.STALE_RUNNING_SECONDS - 1
+        os.utime(jobs._job_path("running", job["job_id"]), (old, old))
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        self.assertEqual(jobs.get_job(job["job_id"])["status"], "queued")
+
+
+# 작성자: 최준혁
+# 기능: 음성 연출 분석 - 형식이 깨진 응답은 LLM 캐시에 남지 않고, 재시도는 캐시를 건너뛰어 새 응답으로 성공하는지 확인
+# 마지막 수정일: 2025-07-07
+class VoiceAnalysisRetryTests(SimpleTestCase):
+    MALFORMED = '[{"index": 1, "speaker": "vdain", "emotion": 2'
+    VALID = '[{"index": 1, "speaker": "vdain", "emotion": 2}]'
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        self.model = mock.Mock()
+        patches = [
+            mock.patch.object(llm_cache, "LLM_CACHE_BACKEND", "sqlite"),
+            mock.patch.object(llm_cache, "_cache", llm_cache.SQLiteCache(os.path.join(tmp, "llm.sqlite3"))),
+            mock.patch.object(llm_gateway, "get_model", return_value=self.model),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _analyze(self):
+        return analyze_texts_with_gemini(["메리가 웃었어요."], api_key=None, characters="1. 메리 : 여자", max_workers=1)
+
+    def test_retry_after_malformed_response(self):
+        self.model.generate_content.side_effect = [SimpleNamespace(text=self.MALFORMED), SimpleNamespace(text=self.VALID)]
+
+        configs = self._analyze()
+        self.assertEqual((configs[0]["speaker"], configs[0]["emotion"]), ("vdain", 2))   # 기본값이 아님
+        self.assertEqual(self.model.generate_content.call_count, 2)
+
+        # 다음 빌드는 캐시된 (파싱되는) 응답을 사용
+        configs = self._analyze()
+        self.assertEqual(configs[0]["speaker"], "vdain")
+        self.assertEqual(self.model.generate_content.call_count, 2)
+
+
+# 작성자: 최준혁
+# 기능: 오디오 Range 응답 - 전체(200), 구간(206), 범위 밖(416)
+# 마지막 수정일: 2025-07-07
+class RangedFileResponseTests(SimpleTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".mp3")
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"0123456789")
+        self.addCleanup(os.remove, self.path)
+        self.factory = RequestFactory()
+
+    def _get(self, range_header=None):
+        extra = {"HTTP_RANGE": range_header} if range_header else {}
+        response = ranged_file_response(self.factory.get("/", **extra), self.path)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_full_file(self):
+        response, body = self._get()
+        self.assertEqual((response.status_code, body), (200, b"0123456789"))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_partial(self):
+        response, body = self._get("bytes=2-5")
+        self.assertEqual((response.status_code, body), (206, b"2345"))
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(response["Content-Length"], "4")
+
+        response, body = self._get("bytes=-3")
+        self.assertEqual((response.status_code, body), (206, b"789"))
+
+        response, body = self._get("bytes=8-")
+        self.assertEqual((response.status_code, body), (206, b"89"))
+
+    def test_unsatisfiable(self):
+        response, _ = self._get("bytes=10-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
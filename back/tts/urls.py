@@ -1,9 +1,11 @@
 # back/tts/urls.py
 from django.urls import path
-from .views import generate_story_audio, stream_qa_audio
+from .views import generate_story_audio, story_audio_status, stream_story_audio, stream_qa_audio
 
 urlpatterns = [
     path("generate/", generate_story_audio, name="generate_story_audio"),
+    path("status/<str:job_id>/", story_audio_status, name="story_audio_status"),
+    path("stream/<str:job_id>/", stream_story_audio, name="stream_story_audio"),
     path("qa-audio/<int:qa_id>/", stream_qa_audio, name="stream-qa-audio"),
 ]
 
@@ -0,0 +1,174 @@
+# back/tts/utils/audio_mixer.py
+import os
+import wave
+import subprocess
+from pydub import AudioSegment
+
+# Clova 세그먼트 형식 (synthesize_clova_tts의 sampling-rate와 일치해야 함)
+SAMPLE_RATE = 24000
+CHANNELS = 1
+SAMPLE_WIDTH = 2                  # 16bit PCM
+CHUNK_FRAMES = SAMPLE_RATE        # 한 번에 읽는 프레임 수 (약 1초 분량)
+
+
+def silence_pcm(duration_ms):
+    """
+    지정 길이의 무음 PCM 바이트.
+    """
+    frames = int(SAMPLE_RATE * duration_ms / 1000)
+    return b"\x00" * (frames * SAMPLE_WIDTH * CHANNELS)
+
+
+def iter_wav_pcm(path, chunk_frames=CHUNK_FRAMES):
+    """
+    WAV 파일을 한 번만 열어 PCM 데이터를 청크 단위로 읽습니다.
+    형식이 다르면(24kHz/mono/16bit가 아니면) 잘못 이어 붙이지 않도록 예외를 발생시킵니다.
+    """
+    with wave.open(path, "rb") as wf:
+        params = (wf.getframerate(), wf.getnchannels(), wf.getsampwidth())
+        if params != (SAMPLE_RATE, CHANNELS, SAMPLE_WIDTH):
+            raise RuntimeError(f"지원하지 않는 세그먼트 형식: {path} (rate/channels/width={params})")
+        while True:
+            data = wf.readframes(chunk_frames)
+            if not data:
+                break
+            yield data
+
+
+class WavStreamWriter:
+    """
+    PCM을 받는 즉시 WAV 파일에 기록합니다. (완료 시 임시 파일을 원래 이름으로 교체)
+    """
+    def __init__(self, path):
+        self.path = path
+        self._tmp_path = path + ".part"
+        self._wf = wave.open(self._tmp_path, "wb")
+        self._wf.setnchannels(CHANNELS)
+        self._wf.setsampwidth(SAMPLE_WIDTH)
+        self._wf.setframerate(SAMPLE_RATE)
+
+    def write(self, pcm):
+        self._wf.writeframesraw(pcm)
+
+    def close(self):
+        self._wf.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._wf.close()
+        _remove_quietly(self._tmp_path)
+
+
+class Mp3StreamEncoder:
+    """
+    ffmpeg 프로세스의 stdin으로 PCM을 흘려보내 MP3를 점진적으로 인코딩합니다.
+    pydub과 같은 ffmpeg 실행 파일(AudioSegment.converter)을 사용합니다.
+    """
+    def __init__(self, path, bitrate="128k"):
+        self.path = path
+        self._tmp_path = path + ".part"
+        self._proc = subprocess.Popen(
+            [
+                AudioSegment.converter, "-hide_banner", "-loglevel", "error", "-y",
+                "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "-i", "pipe:0",
+                "-f", "mp3", "-b:a", bitrate, self._tmp_path,
+            ],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def write(self, pcm):
+        self._proc.stdin.write(pcm)
+
+    def close(self):
+        self._proc.stdin.close()
+        stderr = self._proc.stderr.read()
+        if self._proc.wait() != 0:
+            _remove_quietly(self._tmp_path)
+            raise RuntimeError(f"MP3 인코딩 실패: {self.path} – {stderr.decode(errors='ignore')}")
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        self._proc.kill()
+        self._proc.wait()
+        _remove_quietly(self._tmp_path)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def mix_story_audio(paragraph_plan, full_mp3_path, pause_ms=900):
+    """
+    세그먼트 WAV들을 한 번씩만 읽으면서 전체 트랙과 문단별 트랙을 동시에 만듭니다.
+    메모리에는 청크 하나만 올라가고, MP3는 ffmpeg로 점진 인코딩됩니다.
+    full_mp3_path가 None이면 문단 트랙만 기록합니다.
+
+    paragraph_plan: 문단 순서대로 정렬된 리스트
+      [{"paragraph_no": 1, "sources": [wav, ...], "wav_out": 경로 또는 None, "mp3_out": 경로 또는 None}, ...]
+      - sources 사이에는 pause_ms 무음이 들어갑니다. (문단 사이도 동일)
+      - wav_out/mp3_out이 있으면 해당 문단 트랙도 같은 패스에서 기록합니다.
+        재사용 문단은 sources=[기존 문단 WAV], 출력 None으로 넘기면 전체 트랙에만 들어갑니다.
+    반환: 전체 트랙 길이(초)
+    """
+    pause = silence_pcm(pause_ms)
+    full = Mp3StreamEncoder(full_mp3_path) if full_mp3_path else None
+    full_writers = [full] if full else []
+    open_writers = list(full_writers)
+    total_bytes = 0
+    try:
+        for p_idx, para in enumerate(paragraph_plan):
+            para_writers = []
+            if para.get("wav_out"):
+                para_writers.append(WavStreamWriter(para["wav_out"]))
+            if para.get("mp3_out"):
+                para_writers.append(Mp3StreamEncoder(para["mp3_out"]))
+            open_writers.extend(para_writers)
+
+            if p_idx > 0:
+                for w in full_writers:
+                    w.write(pause)
+                total_bytes += len(pause)
+
+            for s_idx, source in enumerate(para["sources"]):
+                if s_idx > 0:
+                    for w in para_writers + full_writers:
+                        w.write(pause)
+                    total_bytes += len(pause)
+                for pcm in iter_wav_pcm(source):
+                    for w in para_writers + full_writers:
+                        w.write(pcm)
+                    total_bytes += len(pcm)
+
+            for w in para_writers:
+                w.close()
+                open_writers.remove(w)
+
+        for w in full_writers:
+            w.close()
+            open_writers.remove(w)
+    except BaseException:
+        for w in open_writers:
+            w.abort()
+        raise
+
+    return total_bytes / (SAMPLE_RATE * SAMPLE_WIDTH * CHANNELS)
+
+
+def mix_paragraph_audio(sources, wav_out, mp3_out, pause_ms=900):
+    """
+    문단 하나의 세그먼트들을 이어 문단 WAV/MP3만 만듭니다. (문단이 준비되는 대로 먼저 내보낼 때 사용)
+    반환: 문단 길이(초)
+    """
+    return mix_story_audio(
+        [{"paragraph_no": None, "sources": sources, "wav_out": wav_out, "mp3_out": mp3_out}],
+        None,
+        pause_ms=pause_ms
+    )
@@ -0,0 +1,249 @@
+# back/tts/utils/clova_client.py
+# 프로세스 전역 Clova TTS HTTP 클라이언트
+#
+# - requests.Session + HTTPAdapter 커넥션 풀로 keep-alive 재사용 (문장마다 TCP/TLS 핸드셰이크 반복 방지)
+# - 연결/응답 타임아웃 분리
+# - 429/5xx/네트워크 오류는 지터가 섞인 지수 백오프로 재시도 (429는 Retry-After 우선)
+# - 연속 실패가 쌓이면 회로 차단기(circuit breaker)를 열어 일정 시간 즉시 실패
+# - 요청 지연/재시도/커넥션 재사용률 카운터 (stats())
+import time
+import random
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from decouple import config
+
+# 로컬 스텁 서버로 벤치마크할 때는 CLOVA_TTS_URL 환경변수로 주소를 바꿉니다.
+CLOVA_TTS_URL = config('CLOVA_TTS_URL', default="https://naveropenapi.apigw.ntruss.com/tts-premium/v1/tts")
+CLOVA_POOL_SIZE = config('CLOVA_POOL_SIZE', default=16, cast=int)                    # 유지할 keep-alive 연결 수
+CLOVA_CONNECT_TIMEOUT = config('CLOVA_CONNECT_TIMEOUT', default=3.05, cast=float)    # 연결 타임아웃(초)
+CLOVA_READ_TIMEOUT = config('CLOVA_READ_TIMEOUT', default=30.0, cast=float)          # 응답 타임아웃(초)
+CLOVA_MAX_RETRIES = config('CLOVA_MAX_RETRIES', default=2, cast=int)                 # 요청별 재시도 횟수
+CLOVA_RETRY_BACKOFF = config('CLOVA_RETRY_BACKOFF', default=0.5, cast=float)         # 재시도 대기 기본값(초), 시도마다 2배 + 지터
+CLOVA_BREAKER_THRESHOLD = config('CLOVA_BREAKER_THRESHOLD', default=5, cast=int)     # 이 횟수만큼 연속 실패하면 차단
+CLOVA_BREAKER_COOLDOWN = config('CLOVA_BREAKER_COOLDOWN', default=30.0, cast=float)  # 차단 유지 시간(초)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 10.0   # Retry-After가 너무 길면 이 값까지만 대기
+
+
+class ClovaTTSError(RuntimeError):
+    """
+    Clova 요청 실패 (재시도 후에도 실패했거나 재시도할 수 없는 응답)
+    """
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(ClovaTTSError):
+    """
+    회로 차단기가 열려 요청을 보내지 않고 바로 실패
+    """
+
+
+class CircuitBreaker:
+    """
+    연속 실패 threshold회 → open (cooldown 동안 즉시 실패) → half-open (시험 요청 1건) → 성공 시 closed
+    """
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.open_count = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or (self._opened_at is None and self._failures >= self.threshold):
+                if self._opened_at is None:
+                    self.open_count += 1
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class ClovaTTSClient:
+    """
+    Clova TTS 요청 클라이언트. 스레드 안전하며 프로세스당 하나(get_clova_client())를 공유합니다.
+    """
+    def __init__(
+        self,
+        url=CLOVA_TTS_URL,
+        pool_size=CLOVA_POOL_SIZE,
+        connect_timeout=CLOVA_CONNECT_TIMEOUT,
+        read_timeout=CLOVA_READ_TIMEOUT,
+        max_retries=CLOVA_MAX_RETRIES,
+        backoff=CLOVA_RETRY_BACKOFF,
+        breaker_threshold=CLOVA_BREAKER_THRESHOLD,
+        breaker_cooldown=CLOVA_BREAKER_COOLDOWN
+    ):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)   # 최근 요청 지연(초)
+        self._counters = {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "rejected": 0}
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._counters[name] += n
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None and response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                return min(float(retry_after), MAX_RETRY_AFTER)
+            except (TypeError, ValueError):
+                pass
+        # full jitter: 0 ~ backoff * 2^(attempt-1)
+        return random.uniform(0, self.backoff * (2 ** (attempt - 1)))
+
+    def synthesize(self, data, client_id, client_secret, stream=False, timeout=None):
+        """
+        Clova TTS에 합성을 요청하고 200 응답(requests.Response)을 반환합니다.
+        stream=True면 본문을 읽기 전에 반환하므로 호출한 쪽에서 iter_content로 읽고 닫아야 합니다.
+        실패 시 ClovaTTSError (회로 차단 중이면 CircuitOpenError)
+        """
+        headers = {
+            "X-NCP-APIGW-API-KEY-ID": client_id,
+            "X-NCP-APIGW-API-KEY": client_secret,
+        }
+        attempt = 0
+        while True:
+            attempt += 1
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError("Clova TTS 회로 차단 중 (연속 실패로 잠시 요청을 보내지 않습니다)")
+
+            self._count("requests")
+            start = time.monotonic()
+            response = None
+            error = None
+            try:
+                response = self.session.post(
+                    self.url, headers=headers, data=data, stream=stream, timeout=timeout or self.timeout
+                )
+            except requests.RequestException as e:
+                error = e
+            finally:
+                with self._stats_lock:
+                    self._latencies.append(time.monotonic() - start)
+
+            if response is not None and response.status_code == 200:
+                self.breaker.record_success()
+                self._count("succeeded")
+                return response
+
+            retryable = response is None or response.status_code in RETRY_STATUS
+            if response is not None:
+                message = f"Clova TTS 실패: {response.status_code} - {response.text[:200]}"
+                status_code = response.status_code
+                response.close()
+            else:
+                message = f"Clova TTS 요청 오류: {error}"
+                status_code = None
+
+            if not retryable:
+                # 4xx(인증/파라미터 오류)는 서버 장애가 아니므로 차단기에 반영하지 않음
+                self.breaker.record_success()
+                self._count("failed")
+                raise ClovaTTSError(message, status_code)
+
+            self.breaker.record_failure()
+            if attempt > self.max_retries:
+                self._count("failed")
+                raise ClovaTTSError(message, status_code)
+
+            self._count("retries")
+            delay = self._retry_delay(attempt, response)
+            print(f"⚠️ {message} → {round(delay, 2)}초 후 재시도 ({attempt}/{self.max_retries})")
+            time.sleep(delay)
+
+    def stats(self):
+        """
+        요청 수/재시도/실패, 지연(평균·p95·최대), 커넥션 재사용률, 차단기 상태
+        """
+        with self._stats_lock:
+            counters = dict(self._counters)
+            values = sorted(self._latencies)
+
+        # urllib3 커넥션 풀: num_connections(새 연결 수) / num_requests(보낸 요청 수)
+        new_connections = sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                new_connections += pool.num_connections
+                sent += pool.num_requests
+
+        latency = {}
+        if values:
+            latency = {
+                "avg": round(sum(values) / len(values), 3),
+                "p95": round(values[min(len(values) - 1, int(round(len(values) * 0.95)) - 1)], 3),
+                "max": round(values[-1], 3),
+            }
+        return {
+            **counters,
+            "latency": latency,
+            "connections": new_connections,
+            "reuse_rate": round(1 - new_connections / sent, 3) if sent else 0.0,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.open_count,
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_clova_client():
+    """
+    프로세스 전역 Clova 클라이언트 (처음 호출 시 생성)
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ClovaTTSClient()
+    return _client
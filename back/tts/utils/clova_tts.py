@@ -1,5 +1,5 @@
 # back/tts/utils/clova_tts.py
-import requests
+from .clova_client import get_clova_client, ClovaTTSError
 
 def synthesize_clova_tts(
     text,
@@ -11,18 +11,13 @@ def synthesize_clova_tts(
     volume=0,
     output_path="output.wav",
     client_id=None,
-    client_secret=None
+    client_secret=None,
+    timeout=None
 ):
     """
     Clova TTS API를 호출하여 음성 합성 결과를 output_path로 저장합니다.
+    공유 클라이언트(get_clova_client)의 커넥션 풀을 사용하며, 429/5xx 재시도는 클라이언트가 처리합니다.
     """
-    url = "https://naveropenapi.apigw.ntruss.com/tts-premium/v1/tts"
-
-    headers = {
-        "X-NCP-APIGW-API-KEY-ID": client_id,
-        "X-NCP-APIGW-API-KEY": client_secret
-    }
-
     data = {
         "speaker": speaker,
         "text": text,
@@ -35,12 +30,12 @@ def synthesize_clova_tts(
         "sampling-rate": 24000
     }
 
-    response = requests.post(url, headers=headers, data=data)
-
-    if response.status_code == 200:
-        with open(output_path, "wb") as f:
-            f.write(response.content)
-        return True
-    else:
-        print(f"❌ Clova TTS 실패: {response.status_code} - {response.text}")
+    try:
+        response = get_clova_client().synthesize(data, client_id, client_secret, timeout=timeout)
+    except ClovaTTSError as e:
+        print(f"❌ {e}")
         return False
+
+    with open(output_path, "wb") as f:
+        f.write(response.content)
+    return True
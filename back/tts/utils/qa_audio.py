@@ -0,0 +1,156 @@
+# back/tts/utils/qa_audio.py
+# AI 질문(Paragraphqa.ai_question) 음성 캐시
+#
+# MEDIA_ROOT/tts/_qa/qa_<qa_id>_<텍스트 해시>.mp3 로 저장합니다.
+# 질문 텍스트(또는 화자)가 바뀌면 해시가 달라져 새로 합성하고, 같은 qa_id의 이전 파일은 지웁니다.
+import os
+import re
+import glob
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decouple import config
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from .clova_client import get_clova_client
+
+QA_AUDIO_DIR = os.path.join(settings.MEDIA_ROOT, "tts", "_qa")
+QA_SPEAKER = "vgoeun"
+QA_PREWARM_WORKERS = config('QA_PREWARM_WORKERS', default=2, cast=int)   # 백그라운드 미리 합성 동시 실행 수
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+_prewarm_executor = None
+
+
+def qa_audio_path(qa_id, text, speaker=QA_SPEAKER):
+    text_hash = hashlib.sha256(f"{speaker}\n{text.strip()}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(QA_AUDIO_DIR, f"qa_{qa_id}_{text_hash}.mp3")
+
+
+def _lock_for(path):
+    with _key_locks_guard:
+        return _key_locks.setdefault(path, threading.Lock())
+
+
+def ensure_qa_audio(qa_id, text, client_id=None, client_secret=None, speaker=QA_SPEAKER, timeout=None):
+    """
+    질문 음성 MP3 경로를 반환합니다. 캐시에 없으면 Clova로 합성해 저장합니다.
+    같은 질문을 동시에 요청해도 한 번만 합성합니다. (프로세스 내)
+    실패 시 ClovaTTSError
+    """
+    path = qa_audio_path(qa_id, text, speaker)
+    if os.path.exists(path):
+        return path
+
+    with _lock_for(path):
+        if os.path.exists(path):
+            return path
+
+        os.makedirs(QA_AUDIO_DIR, exist_ok=True)
+        response = get_clova_client().synthesize(
+            {"speaker": speaker, "text": text, "format": "mp3"},
+            client_id or config('CSS_API_CLIENT_ID'),
+            client_secret or config('CSS_API_CLIENT_SECRET'),
+            stream=True,
+            timeout=timeout
+        )
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            response.close()
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        # 같은 qa_id의 이전 텍스트 음성 정리
+        for old_path in glob.glob(os.path.join(QA_AUDIO_DIR, f"qa_{qa_id}_*.mp3")):
+            if old_path != path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        return path
+
+
+def prewarm_qa_audio(qa_id, text):
+    """
+    질문 음성을 백그라운드에서 미리 합성합니다. (첫 재생 대기 제거용, 실패해도 재생 시 다시 시도)
+    """
+    global _prewarm_executor
+    if not text or not text.strip():
+        return None
+    with _key_locks_guard:
+        if _prewarm_executor is None:
+            _prewarm_executor = ThreadPoolExecutor(max_workers=QA_PREWARM_WORKERS, thread_name_prefix="qa-audio")
+
+    def run():
+        try:
+            path = ensure_qa_audio(qa_id, text)
+            print(f"🔊 질문 음성 미리 합성 완료: qa_id={qa_id} → {os.path.basename(path)}")
+        except Exception as e:
+            print(f"⚠️ 질문 음성 미리 합성 실패: qa_id={qa_id} – {e}")
+
+    return _prewarm_executor.submit(run)
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def ranged_file_response(request, path, content_type="audio/mpeg"):
+    """
+    파일을 Range 요청(bytes=start-end, 단일 구간)을 지원하여 응답합니다.
+    Range가 없거나 해석할 수 없으면 전체 파일(200), 범위를 벗어나면 416.
+    """
+    size = os.path.getsize(path)
+    range_header = request.META.get("HTTP_RANGE", "").strip()
+    match = _RANGE_RE.match(range_header) if range_header else None
+
+    if not match or (not match.group(1) and not match.group(2)):
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+        response["Content-Length"] = str(size)
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # bytes=-N : 마지막 N바이트
+        start = max(size - int(last), 0)
+        end = size - 1
+
+    if start >= size or start > end:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    length = end - start + 1
+    f = open(path, "rb")
+    f.seek(start)
+
+    def file_range(chunk_size=8192):
+        remaining = length
+        try:
+            while remaining > 0:
+                data = f.read(min(chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+        finally:
+            f.close()
+
+    response = StreamingHttpResponse(file_range(), status=206, content_type=content_type)
+    response["Content-Length"] = str(length)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
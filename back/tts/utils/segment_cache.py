@@ -0,0 +1,208 @@
+# back/tts/utils/segment_cache.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from decouple import config
+
+# 세그먼트 캐시 최대 크기 (MB)
+TTS_SEGMENT_CACHE_MAX_MB = config('TTS_SEGMENT_CACHE_MAX_MB', default=512, cast=int)
+# 마지막 사용(mtime) 후 이 시간(초)이 지나지 않은 세그먼트는 용량을 넘어도 삭제하지 않음
+TTS_SEGMENT_CACHE_GRACE_SECONDS = config('TTS_SEGMENT_CACHE_GRACE_SECONDS', default=600, cast=int)
+
+# 캐시 키에 포함되는 음성 설정 (같은 문장이라도 하나라도 다르면 다른 세그먼트)
+VOICE_KEYS = ("speaker", "emotion", "emotion_strength", "pitch", "speed", "volume")
+SEGMENT_FORMAT = {"format": "wav", "sampling-rate": 24000}
+
+
+class SegmentCache:
+    """
+    문장 텍스트 + 음성 설정의 해시를 키로 하는 디스크 기반 WAV 세그먼트 캐시.
+    - 파일은 cache_dir/<키 앞 2자리>/<키>.wav 로 저장되어 프로세스 재시작 후에도 재사용됩니다.
+    - 전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다(LRU).
+    - 빌드 중인 세그먼트는 pin()으로 고정해 두면 삭제되지 않습니다.
+    - 고정과 LRU 순서는 프로세스마다 따로지만 폴더는 웹 프로세스와 TTS 워커가 같이 씁니다.
+      그래서 사용할 때마다 파일 mtime을 갱신하고, 삭제 직전에 mtime을 다시 확인해
+      grace_seconds 안에 (어느 프로세스에서든) 사용된 세그먼트는 지우지 않습니다.
+      그래도 빌드가 길어 세그먼트가 지워지면 refresh()가 None을 반환하므로 호출하는 쪽에서 다시 합성합니다.
+    """
+    def __init__(self, cache_dir, max_bytes, grace_seconds=TTS_SEGMENT_CACHE_GRACE_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> 파일 크기 (앞쪽일수록 오래 사용 안 함)
+        self._pins = {}                 # key -> 고정 횟수
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(cfg):
+        """
+        문장과 음성 설정으로 캐시 키(sha256)를 만듭니다.
+        """
+        payload = {"text": cfg["sentence"].strip(), **SEGMENT_FORMAT}
+        for k in VOICE_KEYS:
+            payload[k] = cfg.get(k)
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.wav")
+
+    def _load_index(self):
+        """
+        디스크에 남아 있는 세그먼트를 마지막 사용 시각(mtime) 순으로 인덱스에 올립니다.
+        """
+        found = []
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".wav"):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+
+    def get(self, key):
+        """
+        캐시에 있으면 세그먼트 경로를, 없으면 None을 반환합니다.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self.path_for(key)
+            if not os.path.exists(path):
+                # 외부에서 삭제된 경우 인덱스만 정리
+                self.total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path)  # 재시작 후에도 LRU 순서를 유지하기 위해 mtime 갱신
+        except OSError:
+            pass
+        return path
+
+    def put(self, key, src_path):
+        """
+        새로 합성한 세그먼트를 캐시로 옮기고 캐시 경로를 반환합니다.
+        """
+        dst = self.path_for(key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.move(src_path, dst)
+        os.utime(dst)
+        size = os.path.getsize(dst)
+        with self._lock:
+            self.total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+        return dst
+
+    def refresh(self, key):
+        """
+        사용 직전에 호출: 세그먼트가 아직 있으면 mtime을 갱신하고 경로를, 다른 프로세스가 지웠으면 None을 반환합니다.
+        (적중/누락 통계에는 넣지 않음)
+        """
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.total_bytes -= self._entries.pop(key, 0)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return path
+
+    def pin(self, keys):
+        with self._lock:
+            for key in keys:
+                self._pins[key] = self._pins.get(key, 0) + 1
+        # 다른 프로세스의 evict()가 볼 수 있도록 이미 있는 세그먼트의 mtime도 갱신
+        for key in set(keys):
+            try:
+                os.utime(self.path_for(key))
+            except OSError:
+                pass
+
+    def unpin(self, keys):
+        with self._lock:
+            for key in keys:
+                count = self._pins.get(key, 0) - 1
+                if count > 0:
+                    self._pins[key] = count
+                else:
+                    self._pins.pop(key, None)
+
+    def evict(self):
+        """
+        최대 크기를 넘은 만큼 오래된 세그먼트부터 삭제합니다.
+        이 프로세스에서 고정한 항목과, 최근 grace_seconds 안에 다른 프로세스가 사용한 항목(mtime)은 건너뜁니다.
+        """
+        removed = []
+        cutoff = time.time() - self.grace_seconds
+        with self._lock:
+            for key in list(self._entries):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                if key in self._pins:
+                    continue
+                try:
+                    mtime = os.stat(self.path_for(key)).st_mtime
+                except OSError:
+                    # 다른 프로세스가 이미 삭제
+                    self.total_bytes -= self._entries.pop(key)
+                    continue
+                if mtime >= cutoff:
+                    self._entries.move_to_end(key)
+                    continue
+                self.total_bytes -= self._entries.pop(key)
+                self.evictions += 1
+                removed.append(key)
+        for key in removed:
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+        return len(removed)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_segment_cache(cache_dir, max_mb=None):
+    """
+    캐시 디렉터리별로 프로세스 전역에서 하나의 SegmentCache를 공유합니다.
+    """
+    cache_dir = os.path.abspath(cache_dir)
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            max_bytes = (max_mb or TTS_SEGMENT_CACHE_MAX_MB) * 1024 * 1024
+            cache = _caches[cache_dir] = SegmentCache(cache_dir, max_bytes)
+        return cache
@@ -0,0 +1,142 @@
+# back/tts/utils/synthesis_pool.py
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decouple import config
+from .clova_tts import synthesize_clova_tts
+from .clova_client import get_clova_client
+
+# 동시 합성 설정 (환경변수로 조정 가능)
+TTS_MAX_WORKERS = config('TTS_MAX_WORKERS', default=4, cast=int)        # 동시에 진행할 Clova 요청 수
+TTS_RATE_PER_SEC = config('TTS_RATE_PER_SEC', default=8.0, cast=float)  # 초당 최대 요청 수 (0 이하면 제한 없음)
+
+
+class RateLimiter:
+    """
+    요청 시작 간격을 1/rate_per_sec 이상으로 벌려주는 스레드 안전 리미터.
+    """
+    def __init__(self, rate_per_sec):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec and rate_per_sec > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(self._next_at, now)
+            self._next_at = start_at + self.interval
+        delay = start_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _synthesize_one(idx, cfg, wav_path, client_id, client_secret, limiter):
+    """
+    문장 하나를 합성하고 (성공 여부, 소요 시간)을 반환합니다.
+    429/5xx/네트워크 오류 재시도는 공유 Clova 클라이언트가 처리합니다.
+    """
+    start = time.time()
+    limiter.wait()
+    try:
+        success = synthesize_clova_tts(
+            text=cfg["sentence"],
+            speaker=cfg["speaker"],
+            emotion=cfg["emotion"],
+            emotion_strength=cfg["emotion_strength"],
+            pitch=cfg["pitch"],
+            speed=cfg["speed"],
+            volume=cfg["volume"],
+            output_path=wav_path,
+            client_id=client_id,
+            client_secret=client_secret
+        )
+    except Exception as e:
+        print(f"⚠️ [{idx+1}] TTS 요청 오류: {e}")
+        success = False
+    return success, time.time() - start
+
+
+def synthesize_segments(
+    configs,
+    temp_dir,
+    client_id,
+    client_secret,
+    max_workers=None,
+    rate_per_sec=None,
+    on_progress=None,
+    on_segment_ready=None
+):
+    """
+    문장별 음성 설정(configs)을 제한된 워커 풀에서 동시에 합성합니다.
+    결과 파일 순서는 configs 순서와 같으므로 문장-문단 매핑이 그대로 유지됩니다.
+    on_progress(완료 수, 전체 수)가 주어지면 문장 하나가 끝날 때마다 호출합니다.
+    on_segment_ready(인덱스, wav 경로)가 주어지면 완료된 문장을 바로 넘겨줍니다. (호출 스레드에서 실행되며,
+    예외가 나면 남은 합성을 취소하고 그대로 전달합니다)
+
+    반환: (segment_files, latencies)
+      - segment_files: [wav 경로, ...] (configs와 같은 순서)
+      - latencies: [{"index", "latency"}, ...] (configs와 같은 순서)
+    """
+    max_workers = max_workers or TTS_MAX_WORKERS
+    rate_per_sec = TTS_RATE_PER_SEC if rate_per_sec is None else rate_per_sec
+
+    os.makedirs(temp_dir, exist_ok=True)
+    limiter = RateLimiter(rate_per_sec)
+    segment_files = [os.path.join(temp_dir, f"seg_{idx+1}.wav") for idx in range(len(configs))]
+    latencies = [None] * len(configs)
+
+    stage_start = time.time()
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clova-tts") as executor:
+        futures = {
+            executor.submit(
+                _synthesize_one, idx, cfg, segment_files[idx],
+                client_id, client_secret, limiter
+            ): idx
+            for idx, cfg in enumerate(configs)
+        }
+        try:
+            for future in as_completed(futures):
+                idx = futures[future]
+                success, latency = future.result()
+                if not success:
+                    raise RuntimeError(f"TTS 합성 실패: 문장 #{idx+1} – {configs[idx]['sentence']}")
+                latencies[idx] = {"index": idx + 1, "latency": latency}
+                cfg = configs[idx]
+                print(f"   - [{idx+1}] speaker={cfg['speaker']}, emotion={cfg['emotion']} "
+                      f"({round(latency, 2)}초)")
+                done += 1
+                if on_segment_ready:
+                    on_segment_ready(idx, segment_files[idx])
+                if on_progress:
+                    on_progress(done, len(configs))
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    elapsed = time.time() - stage_start
+    report_latencies(latencies, elapsed, max_workers)
+    return segment_files, latencies
+
+
+def report_latencies(latencies, elapsed, max_workers):
+    """
+    문장별 합성 지연 시간과 Clova 클라이언트 통계(재시도, 커넥션 재사용률)를 요약 출력합니다.
+    """
+    values = sorted(item["latency"] for item in latencies if item)
+    if not values:
+        return
+    p95 = values[min(len(values) - 1, int(round(len(values) * 0.95)) - 1)]
+    client_stats = get_clova_client().stats()
+    print(
+        f"📊 TTS 합성 {len(values)}문장 / 워커 {max_workers}개 / 총 {round(elapsed, 2)}초 "
+        f"(평균 {round(sum(values) / len(values), 2)}초, p95 {round(p95, 2)}초, 최대 {round(values[-1], 2)}초)"
+    )
+    print(
+        f"📡 Clova 클라이언트: 요청 {client_stats['requests']}건, 재시도 {client_stats['retries']}건, "
+        f"실패 {client_stats['failed']}건, 새 연결 {client_stats['connections']}개 "
+        f"(재사용률 {client_stats['reuse_rate']}), 차단기 {client_stats['breaker']}"
+    )
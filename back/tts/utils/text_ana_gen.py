@@ -2,8 +2,11 @@
 
 import re
 import json
+import time
 import difflib
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
+from decouple import config
+from api.services import llm_gateway
 
 # 허용된 화자 목록
 VALID_SPEAKERS = {"vara", "vmikyung", "vdain", "vyuna", "vgoeun", "vdaeseong"}
@@ -13,25 +16,19 @@ def get_closest_valid_speaker(speaker_name):
     matches = difflib.get_close_matches(speaker_name, VALID_SPEAKERS, n=1)
     return matches[0] if matches else "vgoeun"
 
-def analyze_texts_with_gemini(sentences, api_key, characters=""):
-    """
-    Gemini를 호출하여 문장별 음성 연출 설정을 생성합니다.
-    """
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
-
-    # 디버깅 로그
-    print("\n" + "="*50)
-    print("🤖 [analyze_texts_with_gemini] 디버깅 시작 🤖")
-    print(f"[디버그] 전달받은 캐릭터 목록:\n{characters if characters else '캐릭터 정보 없음'}")
-    print("="*50)
+# 구간(window) 분석 설정 (환경변수로 조정 가능)
+TTS_ANALYSIS_WINDOW = config('TTS_ANALYSIS_WINDOW', default=20, cast=int)    # 한 번에 분석할 문장 수
+TTS_ANALYSIS_CONTEXT = config('TTS_ANALYSIS_CONTEXT', default=3, cast=int)   # 앞 구간과 겹쳐 보여줄 문맥 문장 수
+TTS_ANALYSIS_WORKERS = config('TTS_ANALYSIS_WORKERS', default=4, cast=int)   # 동시에 진행할 Gemini 요청 수
+TTS_ANALYSIS_RETRIES = config('TTS_ANALYSIS_RETRIES', default=1, cast=int)   # 구간별 재시도 횟수 (응답 형식 오류, 호출 재시도는 llm_gateway)
+TTS_ANALYSIS_MODEL = "models/gemini-1.5-flash"
 
-    prompt = f"""
+PROMPT_TEMPLATE = """
 You are an expert voice director for a children's story speech synthesis.
-For each sentence below, analyze it within the context of the story and assign the most appropriate voice parameters based on the Clova Voice API.
+For each numbered sentence below, analyze it within the context of the story and assign the most appropriate voice parameters based on the Clova Voice API.
 
 Character List:
-{characters if characters else "No character information available."}
+{characters}
 
 🎙️ Speaker Guidelines:
 - Use calm adult voices (e.g., "vmikyung", "vgoeun") for narration.
@@ -51,11 +48,13 @@ Character List:
 
 **Rules:**
 - Do NOT merge or combine any input sentences.
-- Generate exactly one JSON entry per input sentence, preserving the original order.
+- Generate exactly one JSON entry per numbered sentence, preserving the original order and its "index".
+- The preceding context is for reference only (keep speakers consistent with it). Do NOT output entries for it.
 
 📦 JSON array format:
 [
   {{
+    "index": 1,
     "sentence": "text",
     "speaker": "vgoeun",
     "emotion": 0,
@@ -67,78 +66,157 @@ Character List:
   ...
 ]
 
+Preceding context (do not analyze):
+{context}
+
 Now analyze the following sentences and return the JSON array ONLY:
 {sentences}
 """
 
-    try:
-        response = model.generate_content(prompt)
-        response_text = response.text
-
-        print("\n📤 Gemini 응답 원문:")
-        print(response_text)
-
-        # JSON 블록 추출
-        json_str = None
-        if "```json" in response_text:
-            match = re.search(r"```json\s*([\s\S]*?)\s*```", response_text)
-            if match:
-                json_str = match.group(1)
-        else:
-            match = re.search(r"(\[[\s\S]*\])", response_text)
-            if match:
-                json_str = match.group(1)
-
-        if not json_str:
-            raise ValueError("No valid JSON array found in Gemini response.")
-
-        parsed = json.loads(json_str)
-
-        # 부족분 기본값으로 채워서 길이 맞추기
-        if len(parsed) != len(sentences):
-            print(f"⚠️ 반환된 설정 개수({len(parsed)})가 문장 수({len(sentences)})와 다릅니다. 부족분을 기본값으로 채웁니다.")
-            # 부족한 항목 추가
-            for idx in range(len(parsed), len(sentences)):
-                parsed.append({
-                    "sentence": sentences[idx],
-                    "speaker": "vgoeun",
-                    "emotion": 0,
-                    "emotion_strength": 1,
-                    "pitch": 0,
-                    "speed": 0,
-                    "volume": 0
-                })
-            # 과도한 항목은 잘라내기
-            if len(parsed) > len(sentences):
-                parsed = parsed[:len(sentences)]
-
-        # 결과 디버깅 및 화자 교정
-        print("\n🔎 분석된 결과:")
-        for cfg in parsed:
-            sp = cfg.get("speaker", "vgoeun")
-            if sp not in VALID_SPEAKERS:
-                corrected = get_closest_valid_speaker(sp)
-                print(f"⚠️ 잘못된 화자 이름: {sp} → {corrected}")
-                cfg["speaker"] = corrected
-            print(f"📌 '{cfg.get('sentence')}' → speaker: {cfg['speaker']}, emotion: {cfg.get('emotion')}, pitch: {cfg.get('pitch')}")
-
-        return parsed
-
-    except Exception as e:
-        print(f"❌ Gemini 오류: {e}")
-        print("⚠️ 기본값으로 모든 문장을 처리합니다.")
-        # fallback 생성
-        fallback = []
-        for s in sentences:
-            fallback.append({
-                "sentence": s,
-                "speaker": "vgoeun",
-                "emotion": 0,
-                "emotion_strength": 1,
-                "pitch": 0,
-                "speed": 0,
-                "volume": 0
-            })
-        for cfg in fallback:
-            print(f"⚠️ 기본값: '{cfg['sentence']}' → speaker: {cfg['speaker']}")
-        return fallback
+
+def default_voice_config(sentence):
+    """
+    분석 실패 시 사용할 기본 음성 설정
+    """
+    return {
+        "sentence": sentence,
+        "speaker": "vgoeun",
+        "emotion": 0,
+        "emotion_strength": 1,
+        "pitch": 0,
+        "speed": 0,
+        "volume": 0
+    }
+
+
+def build_windows(n_sentences, window=None, context=None):
+    """
+    문장 인덱스를 겹치는 구간으로 나눕니다.
+    반환: [(context_start, start, end), ...]
+      - [start, end)가 분석 대상, [context_start, start)는 앞 구간과 겹치는 참고용 문맥
+    """
+    window = max(1, window or TTS_ANALYSIS_WINDOW)
+    context = TTS_ANALYSIS_CONTEXT if context is None else context
+    return [
+        (max(0, start - context), start, min(start + window, n_sentences))
+        for start in range(0, n_sentences, window)
+    ]
+
+
+def extract_json_array(response_text):
+    """
+    Gemini 응답에서 JSON 배열을 추출합니다.
+    """
+    json_str = None
+    if "```json" in response_text:
+        match = re.search(r"```json\s*([\s\S]*?)\s*```", response_text)
+        if match:
+            json_str = match.group(1)
+    else:
+        match = re.search(r"(\[[\s\S]*\])", response_text)
+        if match:
+            json_str = match.group(1)
+
+    if not json_str:
+        raise ValueError("No valid JSON array found in Gemini response.")
+    parsed = json.loads(json_str)
+    if not isinstance(parsed, list):
+        raise ValueError("Gemini response is not a JSON array.")
+    return parsed
+
+
+def _analyze_window(api_key, sentences, characters, context_start, start, end, refresh=False):
+    """
+    구간 하나를 분석해 {문장 인덱스: 설정}을 반환합니다.
+    인덱스가 빠지거나 개수가 맞지 않으면 ValueError (해당 구간만 재시도 대상)
+    파싱되는 응답만 LLM 캐시에 남고, 재시도(refresh=True)는 캐시를 건너뜁니다.
+    """
+    context_text = "\n".join(sentences[context_start:start]) or "(none – this is the beginning of the story)"
+    numbered = "\n".join(f"{idx + 1}. {sentences[idx]}" for idx in range(start, end))
+    prompt = PROMPT_TEMPLATE.format(
+        characters=characters if characters else "No character information available.",
+        context=context_text,
+        sentences=numbered
+    )
+
+    text = llm_gateway.generate(
+        prompt, node="VoiceAnalysis", model=TTS_ANALYSIS_MODEL, api_key=api_key,
+        validate=lambda response: _parse_window(response, start, end), refresh=refresh
+    )
+    return _parse_window(text, start, end)
+
+
+def _parse_window(text, start, end):
+    """
+    응답을 {문장 인덱스: 설정}으로 바꿉니다. 형식이 깨졌거나 문장이 빠지면 ValueError
+    """
+    parsed = extract_json_array(text)
+
+    results = {}
+    for pos, cfg in enumerate(parsed):
+        if not isinstance(cfg, dict):
+            continue
+        try:
+            idx = int(cfg.get("index")) - 1
+        except (TypeError, ValueError):
+            idx = start + pos  # index가 없으면 순서로 매핑
+        if start <= idx < end and idx not in results:
+            results[idx] = cfg
+
+    missing = [idx + 1 for idx in range(start, end) if idx not in results]
+    if missing:
+        raise ValueError(f"{len(parsed)}개 반환, 누락된 문장 번호: {missing}")
+    return results
+
+
+def analyze_texts_with_gemini(sentences, api_key, characters="", window=None, context=None, max_workers=None):
+    """
+    Gemini를 호출하여 문장별 음성 연출 설정을 생성합니다.
+    문장을 겹치는 구간으로 나눠 동시에 분석하고 문장 인덱스 기준으로 합칩니다.
+    실패한 구간만 재시도하며, 그래도 실패하면 그 구간만 기본값으로 처리합니다.
+    """
+    max_workers = max_workers or TTS_ANALYSIS_WORKERS
+
+    windows = build_windows(len(sentences), window, context)
+
+    # 디버깅 로그
+    print("\n" + "="*50)
+    print("🤖 [analyze_texts_with_gemini] 디버깅 시작 🤖")
+    print(f"[디버그] 전달받은 캐릭터 목록:\n{characters if characters else '캐릭터 정보 없음'}")
+    print(f"[디버그] 문장 {len(sentences)}개 → 구간 {len(windows)}개 (동시 {max_workers}개)")
+    print("="*50)
+
+    def run_window(bounds):
+        context_start, start, end = bounds
+        for attempt in range(TTS_ANALYSIS_RETRIES + 1):
+            try:
+                return _analyze_window(api_key, sentences, characters, context_start, start, end, refresh=attempt > 0)
+            except Exception as e:
+                print(f"⚠️ 구간 {start + 1}~{end} 분석 실패 (시도 {attempt + 1}): {e}")
+        print(f"⚠️ 구간 {start + 1}~{end}은 기본값으로 처리합니다.")
+        return {idx: default_voice_config(sentences[idx]) for idx in range(start, end)}
+
+    merged = {}
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gemini-voice") as executor:
+        for results in executor.map(run_window, windows):
+            merged.update(results)
+    print(f"⏱️ 감정 분석 {round(time.time() - started, 2)}초")
+    llm_gateway.report_stats()
+
+    # 인덱스 순서로 합치고 화자 교정 (문장 텍스트는 원문 기준)
+    configs = []
+    print("\n🔎 분석된 결과:")
+    for idx, sentence in enumerate(sentences):
+        cfg = {**default_voice_config(sentence), **merged[idx]}
+        cfg.pop("index", None)
+        cfg["sentence"] = sentence
+        sp = cfg.get("speaker", "vgoeun")
+        if sp not in VALID_SPEAKERS:
+            corrected = get_closest_valid_speaker(str(sp))
+            print(f"⚠️ 잘못된 화자 이름: {sp} → {corrected}")
+            cfg["speaker"] = corrected
+        print(f"📌 '{cfg.get('sentence')}' → speaker: {cfg['speaker']}, emotion: {cfg.get('emotion')}, pitch: {cfg.get('pitch')}")
+        configs.append(cfg)
+
+    return configs
@@ -1,13 +1,80 @@
 # back/tts/utils/text_processor.py
-import kss
+import os
 import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-def split_text_into_sentences(text):
+# 분리 규칙이 바뀌면 올려서 저장된 분리 결과를 무효화합니다.
+SEGMENTER_VERSION = 1
+MEMORY_CACHE_SIZE = 512   # 프로세스 내 최근 문단 분리 결과 보관 개수
+
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+_background_executor = None
+
+
+def _kss():
+    # kss 백엔드 초기화가 무거우므로 실제로 분리할 때만 불러옵니다.
+    import kss
+    return kss
+
+
+def _cache_dir():
+    from django.conf import settings
+    return os.path.join(settings.MEDIA_ROOT, "tts", "_sentences")
+
+
+def paragraph_text_hash(text):
+    """
+    문단 텍스트의 지문(sha256). 분리 결과 캐시 키로 사용합니다.
+    """
+    raw = f"v{SEGMENTER_VERSION}\n{text.strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(_cache_dir(), key[:2], f"{key}.json")
+
+
+def _remember(key, sentences):
+    with _memory_lock:
+        _memory_cache[key] = sentences
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _load_cached(key):
+    with _memory_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return list(_memory_cache[key])
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as f:
+            sentences = json.load(f)["sentences"]
+    except (OSError, ValueError, KeyError):
+        return None
+    _remember(key, sentences)
+    return list(sentences)
+
+
+def _store_cached(key, sentences):
+    _remember(key, sentences)
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"sentences": sentences}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _refine(raw_sentences):
     """
-    입력된 텍스트를 문장 단위로 분리하되,
     큰따옴표("...") 안의 대사와 나레이션을 구분하여 분리합니다.
     """
-    raw_sentences = kss.split_sentences(text)
     refined = []
 
     for sentence in raw_sentences:
@@ -19,3 +86,51 @@ def split_text_into_sentences(text):
                 refined.append(clean)
 
     return refined
+
+
+def split_texts_into_sentences(texts):
+    """
+    여러 문단을 한 번에 문장 단위로 분리합니다. (문단 순서대로 [[문장, ...], ...] 반환)
+    문단 텍스트 지문별로 결과를 캐시(메모리 + MEDIA_ROOT/tts/_sentences)하며,
+    캐시에 없는 문단만 모아 kss를 한 번 호출합니다.
+    """
+    keys = [paragraph_text_hash(text) for text in texts]
+    results = [_load_cached(key) for key in keys]
+
+    miss_idxs = [idx for idx, res in enumerate(results) if res is None]
+    if miss_idxs:
+        raw_batches = _kss().split_sentences([texts[idx] for idx in miss_idxs])
+        for idx, raw in zip(miss_idxs, raw_batches):
+            results[idx] = _refine(raw)
+            _store_cached(keys[idx], results[idx])
+
+    return results
+
+
+def split_text_into_sentences(text):
+    """
+    입력된 텍스트를 문장 단위로 분리하되,
+    큰따옴표("...") 안의 대사와 나레이션을 구분하여 분리합니다.
+    """
+    return split_texts_into_sentences([text])[0]
+
+
+def presegment_in_background(texts):
+    """
+    문단 저장 시점에 문장 분리를 미리 해 둡니다. (오디오 생성 시 분리 생략, 실패해도 생성 시 다시 분리)
+    """
+    global _background_executor
+    texts = [text for text in texts if text and text.strip()]
+    if not texts:
+        return None
+    with _memory_lock:
+        if _background_executor is None:
+            _background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kss-presegment")
+
+    def run():
+        try:
+            split_texts_into_sentences(texts)
+        except Exception as e:
+            print(f"⚠️ 문장 미리 분리 실패: {e}")
+
+    return _background_executor.submit(run)
@@ -1,17 +1,27 @@
 # back/tts/views.py
-import os
-import requests
+import json
+import time
+import asyncio
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.urls import reverse
 from django.http import StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from decouple import config
 
 from api.models import Story, Storyparagraph, Paragraphqa
-from tts.main import build_final_audio
+from tts.jobs import enqueue_story_audio_job, get_job
+from tts.utils.qa_audio import ensure_qa_audio, ranged_file_response
+from tts.utils.clova_client import ClovaTTSError
 from member.authentication import CustomJWTAuthentication
 
+SSE_POLL_INTERVAL = 0.5        # 작업 상태 확인 주기(초)
+SSE_KEEPALIVE_SECONDS = 15     # 이벤트가 없을 때 keep-alive 전송 주기(초)
+SSE_MAX_SECONDS = config('TTS_SSE_MAX_SECONDS', default=60, cast=int)   # WSGI에서 연결 하나를 유지하는 최대 시간(초)
+
 # 1. 동화 전체를 분석하여 하나의 오디오북 파일을 생성하는 API
 @api_view(['POST'])
 @authentication_classes([CustomJWTAuthentication])
@@ -33,57 +43,177 @@ def generate_story_audio(request):
 
     paragraphs = Storyparagraph.objects.filter(
         story=story, paragraph_no__gte=1, paragraph_no__lte=10
-    ).order_by("paragraph_no")
+    )
 
     if not paragraphs.exists():
         return Response({"error": "문단 1~10을 찾을 수 없습니다."}, status=400)
 
-    text_blocks = [p.content_text for p in paragraphs]
-
-    gemini_api_key = config('GEMINI_TTS_API_KEY')
-    clova_id = config('CSS_API_CLIENT_ID')
-    clova_secret = config('CSS_API_CLIENT_SECRET')
-
-    # 파일 저장 디렉터리
-    save_dir = os.path.join(settings.MEDIA_ROOT, "tts", f"tts_user{user.user_id}_story{story.story_id}")
-    os.makedirs(save_dir, exist_ok=True)
-
-    # 실제 오디오 생성
-    full_audio_path, paragraph_paths = build_final_audio(
-        text="\n".join(text_blocks),
-        save_path=os.path.join(
-            save_dir,
-            f"tts_user{user.user_id}_story{story.story_id}_all.mp3"
-        ),
-        gemini_api_key=gemini_api_key,
-        clova_client_id=clova_id,
-        clova_client_secret=clova_secret,
-        character_list=story.characters
-    )
+    # 실제 오디오 생성은 워커(python -m tts.worker)가 처리 — 작업 id만 바로 반환
+    job, created = enqueue_story_audio_job(user.user_id, story.story_id)
 
-    # URL 생성 — 파일명과 일치하도록 basename 사용
-    folder = f"tts_user{user.user_id}_story{story.story_id}"
-    full_filename = os.path.basename(full_audio_path)   # e.g. "tts_user768_story2202_all.mp3"
-    paragraph_filenames = {
-        p_no: os.path.basename(p_path)
-        for p_no, p_path in paragraph_paths.items()
-    }
+    # stream=true면 같은 연결로 문단 오디오가 완성되는 대로 이벤트 스트림(SSE) 전송
+    if str(request.data.get("stream", "")).lower() in ("1", "true"):
+        return story_audio_event_response(request, job["job_id"])
 
     return Response({
-        "message": "TTS 생성 완료",
-        "full_audio": request.build_absolute_uri(
-            f"{settings.MEDIA_URL}tts/{folder}/{full_filename}"
-        ),
-        "paragraphs": {
-            str(p_no): request.build_absolute_uri(
-                f"{settings.MEDIA_URL}tts/{folder}/{filename}"
-            )
-            for p_no, filename in paragraph_filenames.items()
+        "message": "TTS 생성 작업이 등록되었습니다." if created else "이미 진행 중인 TTS 생성 작업이 있습니다.",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "status_url": request.build_absolute_uri(reverse("story_audio_status", args=[job["job_id"]])),
+        "stream_url": request.build_absolute_uri(reverse("stream_story_audio", args=[job["job_id"]])),
+    }, status=202)
+
+
+# 1-1. 오디오북 생성 작업 상태 조회 API
+@api_view(['GET'])
+@authentication_classes([CustomJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def story_audio_status(request, job_id):
+    job = get_job(job_id)
+    if job is None or job["user_id"] != request.user.user_id:
+        return Response({"error": "해당 작업을 찾을 수 없습니다."}, status=404)
+
+    data = {
+        "job_id": job["job_id"],
+        "story_id": job["story_id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "updated_at": job["updated_at"],
+        "ready_paragraphs": {
+            p_no: request.build_absolute_uri(f"{settings.MEDIA_URL}{path}")
+            for p_no, path in (job.get("ready_paragraphs") or {}).items()
+        },
+    }
+
+    if job["status"] == "done":
+        result = job["result"]
+        data["message"] = "TTS 생성 완료"
+        data["full_audio"] = request.build_absolute_uri(f"{settings.MEDIA_URL}{result['full_audio']}")
+        data["paragraphs"] = {
+            p_no: request.build_absolute_uri(f"{settings.MEDIA_URL}{path}")
+            for p_no, path in result["paragraphs"].items()
         }
-    })
+    elif job["status"] == "failed":
+        data["error"] = job["error"]
 
+    return Response(data)
 
-# 2. AI의 질문(ai_question)을 실시간 스트리밍으로 읽어주는 API
+
+# 1-2. 오디오북 생성 작업을 문단 단위로 스트리밍하는 API (Server-Sent Events)
+@api_view(['GET'])
+@authentication_classes([CustomJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def stream_story_audio(request, job_id):
+    job = get_job(job_id)
+    if job is None or job["user_id"] != request.user.user_id:
+        return Response({"error": "해당 작업을 찾을 수 없습니다."}, status=404)
+    return story_audio_event_response(request, job_id)
+
+
+def _sse(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def story_audio_event_response(request, job_id):
+    """
+    작업 파일을 주기적으로 확인하며 이벤트를 내보냅니다.
+      - progress:  {"stage", "progress"}  (값이 바뀔 때)
+      - paragraph: {"paragraph_no", "url"}  (문단 오디오가 완성될 때마다, 문단 순서대로)
+      - done:      {"full_audio", "paragraphs"}  /  error: {"error"}
+      - reconnect: {"stream_url"}  (WSGI에서 SSE_MAX_SECONDS가 지나면 보내고 연결 종료)
+    이벤트 id는 보낸 문단 번호 목록("1,2,3")이며, 다시 연결할 때 Last-Event-ID로 주면 그 문단은 건너뜁니다.
+    ASGI에서는 비동기 제너레이터(asyncio.sleep)로 보내 워커를 잡지 않고,
+    WSGI에서는 워커 하나를 계속 잡지 않도록 SSE_MAX_SECONDS마다 끊고 클라이언트가 다시 연결합니다.
+    """
+    def media_url(path):
+        return request.build_absolute_uri(f"{settings.MEDIA_URL}{path}")
+
+    last_event_id = request.META.get("HTTP_LAST_EVENT_ID", "")
+    sent_paragraphs = {p_no.strip() for p_no in last_event_id.split(",") if p_no.strip().isdigit()}
+    state = {"progress": None, "started": time.monotonic(), "last_sent_at": time.monotonic()}
+
+    def event_id():
+        return ",".join(sorted(sent_paragraphs, key=int))
+
+    def poll(job):
+        """
+        작업 상태 한 번으로 보낼 이벤트들 [(문자열)], 종료 여부
+        """
+        if job is None:
+            return [_sse("error", {"error": "해당 작업을 찾을 수 없습니다."})], True
+
+        events = []
+        ready = job.get("ready_paragraphs") or {}
+        if job["status"] == "done":
+            ready = {**ready, **job["result"]["paragraphs"]}
+        for p_no in sorted(ready, key=int):
+            if str(p_no) not in sent_paragraphs:
+                sent_paragraphs.add(str(p_no))
+                events.append(_sse("paragraph", {"paragraph_no": int(p_no), "url": media_url(ready[p_no])}, event_id()))
+
+        progress = (job["stage"], job["progress"])
+        if progress != state["progress"]:
+            state["progress"] = progress
+            events.append(_sse("progress", {"stage": job["stage"], "progress": job["progress"]}, event_id()))
+
+        if job["status"] == "done":
+            events.append(_sse("done", {
+                "full_audio": media_url(job["result"]["full_audio"]),
+                "paragraphs": {p_no: media_url(path) for p_no, path in job["result"]["paragraphs"].items()},
+            }, event_id()))
+            return events, True
+        if job["status"] == "failed":
+            events.append(_sse("error", {"error": job["error"]}, event_id()))
+            return events, True
+
+        now = time.monotonic()
+        if events:
+            state["last_sent_at"] = now
+        elif now - state["last_sent_at"] > SSE_KEEPALIVE_SECONDS:
+            # 프록시가 연결을 끊지 않도록 주기적으로 주석 전송
+            state["last_sent_at"] = now
+            events.append(": keep-alive\n\n")
+        return events, False
+
+    def reconnect_event():
+        stream_url = request.build_absolute_uri(reverse("stream_story_audio", args=[job_id]))
+        return "retry: 1000\n" + _sse("reconnect", {"stream_url": stream_url}, event_id())
+
+    def event_stream():
+        while True:
+            events, finished = poll(get_job(job_id))
+            yield from events
+            if finished:
+                return
+            if time.monotonic() - state["started"] > SSE_MAX_SECONDS:
+                yield reconnect_event()
+                return
+            time.sleep(SSE_POLL_INTERVAL)
+
+    async def async_event_stream():
+        aget_job = sync_to_async(get_job, thread_sensitive=False)
+        while True:
+            events, finished = poll(await aget_job(job_id))
+            for event in events:
+                yield event
+            if finished:
+                return
+            await asyncio.sleep(SSE_POLL_INTERVAL)
+
+    is_asgi = isinstance(getattr(request, "_request", request), ASGIRequest)
+    response = StreamingHttpResponse(
+        async_event_stream() if is_asgi else event_stream(), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"   # nginx 버퍼링 방지
+    return response
+
+
+# 2. AI의 질문(ai_question)을 읽어주는 API (질문별 MP3 캐시, Range 요청 지원)
 @api_view(['GET'])
 @authentication_classes([CustomJWTAuthentication])
 @permission_classes([IsAuthenticated])
@@ -98,31 +228,20 @@ def stream_qa_audio(request, qa_id):
         if not text_to_speak or not text_to_speak.strip():
             return Response({"error": "음성으로 변환할 질문 텍스트가 없습니다."}, status=400)
 
-        clova_id = config('CSS_API_CLIENT_ID')
-        clova_secret = config('CSS_API_CLIENT_SECRET')
-
-        url = "https://naveropenapi.apigw.ntruss.com/tts-premium/v1/tts"
-        headers = {
-            "X-NCP-APIGW-API-KEY-ID": clova_id,
-            "X-NCP-APIGW-API-KEY": clova_secret,
-        }
-        data = {
-            "speaker": "vgoeun",
-            "text": text_to_speak,
-            "format": "mp3",
-        }
-        
-        response_from_clova = requests.post(url, headers=headers, data=data, stream=True)
-
-        if response_from_clova.status_code == 200:
-            return StreamingHttpResponse(
-                response_from_clova.iter_content(chunk_size=4096),
-                content_type=response_from_clova.headers['Content-Type']
+        # 캐시(qa_id + 질문 텍스트 해시)에 있으면 디스크에서 바로, 없으면 합성 후 저장하여 응답
+        try:
+            audio_path = ensure_qa_audio(
+                qa_instance.qa_id,
+                text_to_speak,
+                client_id=config('CSS_API_CLIENT_ID'),
+                client_secret=config('CSS_API_CLIENT_SECRET')
             )
-        else:
-            print(f"❌ Clova API Error: {response_from_clova.status_code} - {response_from_clova.text}")
+        except ClovaTTSError as e:
+            print(f"❌ Clova API Error: {e}")
             return Response({"error": "음성 합성 서버에서 오류가 발생했습니다."}, status=502)
 
+        return ranged_file_response(request, audio_path, content_type="audio/mpeg")
+
     except Paragraphqa.DoesNotExist:
         return Response({"error": "해당 질문을 찾을 수 없습니다."}, status=404)
     except Exception as e:
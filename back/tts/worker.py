@@ -0,0 +1,62 @@
+# back/tts/worker.py
+# 오디오북 생성 작업 워커 프로세스
+#
+# 사용법 (back/ 폴더에서, 웹 서버와 별도 프로세스로 실행):
+#   python -m tts.worker            # 계속 대기하며 작업 처리
+#   python -m tts.worker --once     # 대기 중인 작업만 처리하고 종료
+import os
+import time
+import argparse
+import traceback
+import django
+from dotenv import load_dotenv
+
+load_dotenv()  # .env 파일 로드
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pelworld.settings')
+django.setup()
+
+from django.db import close_old_connections
+from tts.jobs import claim_next_job, finish_job, requeue_stale_jobs, run_story_audio_job
+
+POLL_INTERVAL = 2.0  # 대기열이 비었을 때 확인 주기(초)
+
+
+def process_one():
+    """
+    대기 중인 작업 하나를 처리합니다. 처리할 작업이 없으면 False.
+    """
+    job = claim_next_job()
+    if job is None:
+        return False
+
+    print(f"🎬 작업 시작: {job['job_id']} (story_id={job['story_id']})")
+    close_old_connections()
+    try:
+        result = run_story_audio_job(job)
+        finish_job(job, result=result)
+        print(f"✅ 작업 완료: {job['job_id']}")
+    except Exception as e:
+        traceback.print_exc()
+        finish_job(job, error=str(e))
+        print(f"❌ 작업 실패: {job['job_id']} – {e}")
+    finally:
+        close_old_connections()
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="오디오북 생성 작업 워커")
+    parser.add_argument("--once", action="store_true", help="대기 중인 작업만 처리하고 종료")
+    args = parser.parse_args()
+
+    requeued = requeue_stale_jobs()
+    if requeued:
+        print(f"♻️ 멈춘 작업 {requeued}건을 다시 대기열에 넣었습니다.")
+
+    print("👷 TTS 작업 워커 실행 중...")
+    while True:
+        if process_one():
+            continue
+        if args.once:
+            break
+        time.sleep(POLL_INTERVAL)